@@ -2,6 +2,7 @@ from fastapi import APIRouter, Request, Depends, status
 from typing import List
 from app.services.category_service import CategoryService
 from app.dependencies.auth import get_current_user
+from app.utils.etag import etag_matches, json_response, not_modified
 from app.dto.category_dto import CategoryDTO, UpdateCategoryDTO
 
 router = APIRouter(
@@ -12,27 +13,30 @@ router = APIRouter(
 category_service = CategoryService()
 
 @router.get("/categories", response_model=List[str])
-def list_categories(request: Request):
+async def list_categories(request: Request):
     user_id = request.session["user"]["id"]
-    return category_service.list_categories(user_id)
+    etag = category_service.etag(user_id)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return json_response(request, await category_service.list_categories(user_id), etag)
 
 
 @router.post("/categories", status_code=status.HTTP_201_CREATED)
-def add_category(category: CategoryDTO, request: Request):
+async def add_category(category: CategoryDTO, request: Request):
     user_id = request.session["user"]["id"]
-    return category_service.add_category(user_id, category.name)
+    return await category_service.add_category(user_id, category.name)
 
 
 @router.delete("/categories", status_code=status.HTTP_204_NO_CONTENT)
-def delete_category(category: CategoryDTO, request: Request):
+async def delete_category(category: CategoryDTO, request: Request):
     user_id = request.session["user"]["id"]
-    category_service.delete_category(user_id, category.name)
+    await category_service.delete_category(user_id, category.name)
     return
 
 
 
 @router.put("/categories", status_code=status.HTTP_204_NO_CONTENT)
-def update_category(dto: UpdateCategoryDTO, request: Request):
+async def update_category(dto: UpdateCategoryDTO, request: Request):
     user_id = request.session["user"]["id"]
-    category_service.update_category(user_id, dto.old_name, dto.new_name)
+    await category_service.update_category(user_id, dto.old_name, dto.new_name)
     return
@@ -1,9 +1,19 @@
 from enum import StrEnum
-from fastapi import APIRouter, HTTPException, Request, Depends, UploadFile
-from typing import Annotated, List
-from app.dto.expense_dto import ExpenseDTO
+from fastapi import APIRouter, HTTPException, Request, Depends, Query, UploadFile
+from fastapi.responses import StreamingResponse
+from datetime import date
+from typing import Annotated, List, Optional
+from app.dto.expense_dto import (
+    ExpenseDTO,
+    ExpenseQueryDTO,
+    ExpenseSummaryDTO,
+    ExpenseSearchHitDTO,
+    ExpenseBatchDTO,
+    ExpenseBatchResponseDTO,
+)
 from app.services.expense_service import ExpenseService
 from app.dependencies.auth import get_current_user
+from app.utils.etag import CACHE_CONTROL, etag_matches, json_response, not_modified
 from app.services.file_transfer.file_transfer_factory import FileType, file_transfer_factory
 
 router = APIRouter(
@@ -14,52 +24,108 @@ router = APIRouter(
 ExpenseServiceDep = Annotated[ExpenseService, Depends(ExpenseService)]
 
 @router.post("/", response_model=ExpenseDTO)
-def add_expense(\
+async def add_expense(\
     expense: ExpenseDTO,
     expense_service: ExpenseServiceDep,
     request: Request
 ):
     user_id = request.session["user"]["id"]
-    return expense_service.add_expense(user_id, expense)
+    return await expense_service.add_expense(user_id, expense)
 
-@router.get("", response_model=List[ExpenseDTO])
-def list_expenses(
+@router.post("/batch", response_model=ExpenseBatchResponseDTO)
+async def apply_expense_batch(
+    batch: ExpenseBatchDTO,
     expense_service: ExpenseServiceDep,
     request: Request
 ):
+    """Apply queued create/update/delete operations in one request; results are per operation."""
+    user_id = request.session["user"]["id"]
+    return await expense_service.apply_batch(user_id, batch)
+
+@router.get("", response_model=List[ExpenseDTO])
+async def list_expenses(
+    expense_service: ExpenseServiceDep,
+    request: Request,
+    query: Annotated[ExpenseQueryDTO, Query()],
+):
+    """
+    List expenses filtered by date range, category and amount range. With `limit`
+    set, the next page's cursor is returned in the X-Next-Cursor header. With
+    `stream` set, every match is streamed in stored order.
+    """
+    user_id = request.session["user"]["id"]
+    etag = expense_service.listing_etag(user_id, query)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    if query.stream:
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL} if etag else None
+        return StreamingResponse(
+            expense_service.stream_expenses_json(user_id, query),
+            media_type="application/json",
+            headers=headers,
+        )
+
+    # Stored rows were validated on write: send them pre-encoded instead of
+    # revalidating every row against response_model
+    body, next_cursor = await expense_service.list_expenses_json(user_id, query)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return json_response(request, body=body, etag=etag, headers=headers)
+
+@router.get("/search", response_model=List[ExpenseSearchHitDTO])
+async def search_expenses(
+    expense_service: ExpenseServiceDep,
+    request: Request,
+    q: Annotated[str, Query(min_length=1, max_length=200)],
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+):
+    """Search descriptions and categories; every word must match, as a whole word or a prefix."""
+    user_id = request.session["user"]["id"]
+    return await expense_service.search_expenses(user_id, q, limit)
+
+@router.get("/summary", response_model=ExpenseSummaryDTO)
+async def summarize_expenses(
+    expense_service: ExpenseServiceDep,
+    request: Request,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+):
+    """Totals, counts, min/max and averages by category, day, ISO week and month."""
     user_id = request.session["user"]["id"]
-    return expense_service.list_expenses(user_id)
+    return await expense_service.summarize_expenses(user_id, start_date, end_date)
 
 @router.put("/{expense_id}", response_model=ExpenseDTO)
-def update_expense(
+async def update_expense(
     expense_id: int, 
     expense: ExpenseDTO,
     expense_service: ExpenseServiceDep,
     request: Request
 ):
     user_id = request.session["user"]["id"]
-    return expense_service.update_expense(user_id, expense_id, expense)
+    return await expense_service.update_expense(user_id, expense_id, expense)
 
 @router.delete("/{expense_id}")
-def delete_expense(
+async def delete_expense(
     expense_id: int,
     expense_service: ExpenseServiceDep,
     request: Request
 ):
     user_id = request.session["user"]["id"]
-    expense_service.delete_expense(user_id, expense_id)
+    await expense_service.delete_expense(user_id, expense_id)
     return {"message": "Expense deleted"}
 
 @router.get("/export/{user_id}")
-def export_expenses(
+async def export_expenses(
     user_id: int,
-    file_type: FileType
+    file_type: FileType,
+    start_date: Optional[date] = Query(None, description="Only expenses on or after this date"),
+    end_date: Optional[date] = Query(None, description="Only expenses on or before this date"),
 ):
     file_transfer = file_transfer_factory(file_type)
-    return file_transfer.export_file(user_id)
+    return await file_transfer.export_file(user_id, start_date, end_date)
 
 @router.post('/import/{user_id}')
-def import_expenses(
+async def import_expenses(
     user_id: int,
     import_file: UploadFile
 ):
@@ -102,7 +168,7 @@ def import_expenses(
                 )
         
         # Import the file using the factory pattern
-        file_transfer_factory(file_type).import_file(user_id, import_file)
+        await file_transfer_factory(file_type).import_file(user_id, import_file)
         
         return {
             "message": "File imported successfully",
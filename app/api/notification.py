@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
-from typing import Annotated, List
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Annotated, List, Optional
 from app.dependencies.auth import get_current_user
 from app.services.notification_service import NotificationService
+from app.utils.etag import etag_matches, json_response, not_modified
 
 router = APIRouter(
     prefix="/notifications", 
@@ -13,21 +15,76 @@ NotificationServiceDep = Annotated[NotificationService, Depends(NotificationServ
 
 
 @router.get("", response_model=List[dict])
-def get_notifications(
+async def get_notifications(
+    notification_service: NotificationServiceDep,
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=100, description="Page size; all notifications when omitted"),
+    cursor: Optional[int] = Query(None, ge=1, description="X-Next-Cursor from the previous page"),
+):
+    """
+    Get the current user's notifications, newest first. With `limit` set, the
+    next page's cursor is returned in the X-Next-Cursor header.
+    """
+    user_id = int(request.session["user"]["id"])
+    etag = notification_service.etag(user_id, limit, cursor)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    notifications, next_cursor = await notification_service.list_notifications(user_id, limit, cursor)
+    headers = {"X-Next-Cursor": str(next_cursor)} if next_cursor else None
+    return json_response(request, notifications, etag, headers=headers)
+
+
+@router.get("/unread-count")
+async def get_unread_count(
     notification_service: NotificationServiceDep,
     request: Request
 ):
-    """Get all notifications for the current user only."""
+    """Number of unread notifications, for the badge. Cheap to poll with If-None-Match."""
+    user_id = int(request.session["user"]["id"])
+    etag = notification_service.unread_etag(user_id)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return json_response(request, {"unread": await notification_service.unread_count(user_id)}, etag)
+
+
+@router.get("/stream")
+async def stream_notifications(
+    notification_service: NotificationServiceDep,
+    request: Request,
+    last_event_id: Optional[int] = Header(None, ge=0, alias="Last-Event-ID"),
+):
+    """
+    Push new notifications as Server-Sent Events instead of polling. Browsers
+    reconnect with Last-Event-ID, and the missed notifications are sent first.
+    """
     user_id = int(request.session["user"]["id"])
-    return notification_service.get_notifications(user_id)
+    return StreamingResponse(
+        notification_service.stream_events(user_id, last_event_id),
+        media_type="text/event-stream",
+        # Keep proxies from buffering or caching the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.post("/mark-all-as-read")
-def mark_all_notifications_as_read(
+async def mark_all_notifications_as_read(
     notification_service: NotificationServiceDep,
     request: Request   
 ):
     """Mark all notifications as read for the current user."""
     user_id = request.session["user"]["id"]
-    count = notification_service.mark_all_as_read(user_id)
+    count = await notification_service.mark_all_as_read(user_id)
     return {"updated": count}
+
+
+@router.post("/{notification_id}/read")
+async def mark_notification_as_read(
+    notification_id: str,
+    notification_service: NotificationServiceDep,
+    request: Request
+):
+    """Mark a single notification as read for the current user."""
+    user_id = int(request.session["user"]["id"])
+    if not await notification_service.mark_as_read(user_id, notification_id):
+        raise HTTPException(status_code=404, detail="Notification not found")
+    return {"updated": 1}
@@ -3,6 +3,7 @@ from fastapi import APIRouter, Request, Depends
 from app.dto.settings_dto import BudgetLimitsDTO, SettingsDTO
 from app.services.settings_service import SettingsService
 from app.dependencies.auth import get_current_user
+from app.utils.etag import etag_matches, json_response, not_modified
 
 router = APIRouter(
     prefix="/settings",
@@ -12,18 +13,21 @@ router = APIRouter(
 SettingsServiceDep = Annotated[SettingsService, Depends(SettingsService)]
 
 @router.get("")
-def get_settings(
+async def get_settings(
     request: Request,
     settings_service: SettingsServiceDep
 ):
     user_id = request.session["user"]["id"]
-    return settings_service.get_user_settings(user_id)
+    etag = settings_service.etag(user_id)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return json_response(request, await settings_service.get_user_settings(user_id), etag)
 
 @router.put("")
-def update_settings(
+async def update_settings(
     dto: BudgetLimitsDTO,
     request: Request,
     settings_service: SettingsServiceDep
 ):
     user_id = request.session["user"]["id"]
-    return settings_service.update_user_settings(user_id, dto.dict())
+    return await settings_service.update_user_settings(user_id, dto.dict())
@@ -0,0 +1,150 @@
+"""
+Evaluate every user's budget limits and notify about breaches that no write
+triggered, e.g. a monthly budget crossed by a CSV import.
+
+Usage:
+    python -m app.commands.limit_sweep            # every user
+    python -m app.commands.limit_sweep 12 57      # selected user ids
+
+Users are split into chunks of LIMIT_SWEEP_CHUNK_SIZE ids and checked in a
+pool of LIMIT_SWEEP_WORKERS processes. Each check holds the user's file lock,
+the same one API workers take for writes, and reads storage without the
+document cache, so a sweep can run while the API is serving traffic; it
+notifies at most once per limit and period. The API also runs it every
+LIMIT_SWEEP_INTERVAL_SECONDS.
+"""
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, close_db
+from app.core.logger import logger
+from app.models import User
+from app.services.storage.storage_factory import close_storage, init_storage
+from app.services.storage.user_locks import user_locks
+
+try:
+    import fcntl
+except ImportError:  # Windows: sweeps from several processes are not kept apart
+    fcntl = None
+
+
+async def _all_user_ids() -> list[int]:
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(User.id).where(User.is_active.is_not(False)).order_by(User.id))
+        return list(result.scalars())
+
+
+async def _check_users(user_ids: list[int]) -> tuple[int, int, int]:
+    # Imported here so pool processes build their own storage and database connections.
+    # Each user is read once, so storage is uncached: no copy can go stale under a write.
+    await init_storage(cached=False)
+    from app.services.expense_service import ExpenseService
+
+    service = ExpenseService()
+    notified = failed = 0
+    try:
+        for user_id in user_ids:
+            try:
+                # Serialized with API writes to the user's notifications and alert index
+                async with user_locks.lock(user_id):
+                    breaches = await service.check_limits(user_id)
+                if breaches:
+                    notified += 1
+            except Exception as e:
+                failed += 1
+                logger.error(f"Limit sweep failed for user {user_id}: {e}")
+    finally:
+        await close_storage()
+        await close_db()
+    return len(user_ids), notified, failed
+
+
+def _sweep_chunk(user_ids: list[int]) -> tuple[int, int, int]:
+    """Runs in a pool process: check one chunk of users. Returns (checked, notified, failed)."""
+    return asyncio.run(_check_users(user_ids))
+
+
+@contextmanager
+def _sweep_lock():
+    """Yield True if no other process is sweeping, holding the sweep lock until exit."""
+    if fcntl is None:
+        yield True
+        return
+    lock_dir = Path(settings.USER_LOCK_DIR)
+    lock_dir.mkdir(parents=True, exist_ok=True)
+    fd = os.open(lock_dir / "limit_sweep.lock", os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+async def sweep_limits(user_ids: list[int] | None = None) -> dict | None:
+    """Check limits for the given users (default: all). Returns run stats, or None if a sweep is already running."""
+    with _sweep_lock() as acquired:
+        if not acquired:
+            logger.info("Limit sweep already running in another process; skipping")
+            return None
+
+        user_ids = user_ids or await _all_user_ids()
+        chunk_size = max(settings.LIMIT_SWEEP_CHUNK_SIZE, 1)
+        chunks = [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+        workers = min(settings.LIMIT_SWEEP_WORKERS or os.cpu_count() or 1, len(chunks) or 1)
+
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        # Spawned workers start clean instead of inheriting this process's event loop and connections
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results = await asyncio.gather(*(loop.run_in_executor(pool, _sweep_chunk, chunk) for chunk in chunks))
+        elapsed = time.perf_counter() - started
+
+    checked, notified, failed = (sum(column) for column in zip(*results)) if results else (0, 0, 0)
+    stats = {
+        "users": checked,
+        "notified": notified,
+        "failed": failed,
+        "workers": workers,
+        "seconds": round(elapsed, 3),
+        "users_per_second": round(checked / elapsed, 1) if elapsed else 0.0,
+    }
+    logger.info(f"Limit sweep finished: {stats}")
+    return stats
+
+
+async def run_scheduled_sweeps(interval: float):
+    """Sweep every `interval` seconds until cancelled (started from the app lifespan)."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await sweep_limits()
+        except Exception as e:
+            logger.error(f"Scheduled limit sweep failed: {e}")
+
+
+async def main(argv: list[str]):
+    try:
+        await sweep_limits([int(arg) for arg in argv] or None)
+    finally:
+        await close_storage()
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
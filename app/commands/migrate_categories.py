@@ -0,0 +1,138 @@
+"""
+Move stored expenses from category names to category ids.
+
+Usage:
+    python -m app.commands.migrate_categories            # every user in storage
+    python -m app.commands.migrate_categories 12 57      # selected user ids (document backends)
+
+On the SQL backend the schema is migrated in one transaction: the categories
+table gains per-user ids and a hidden flag, expenses.category is replaced by
+expenses.category_id, and every name used on an expense gets an id. Databases
+created after the change already have the new schema and are left alone.
+
+On the document backends each user's categories.json becomes an id table and
+expenses still carrying a name are rewritten through the expense log, which
+is then compacted. Names only used on expenses become hidden categories.
+Running it again is a no-op; until it has run, old rows keep resolving
+through their stored name.
+"""
+import asyncio
+import sys
+import time
+
+from sqlalchemy import inspect, text
+
+from app.core.database import close_db, engine
+from app.core.logger import logger
+from app.models import Category, Expense
+from app.services.category_service import CATEGORIES_FILE, CategoryService
+from app.services.category_table import DEFAULT_TABLE, CategoryTable, with_category_id
+from app.services.storage.expense_log import ExpenseLog
+from app.services.storage.storage_base import ExpenseQueryStorage
+from app.services.storage.storage_factory import close_storage, storage_factory
+from app.services.storage.user_locks import user_locks
+
+
+def _legacy_schema(connection) -> bool:
+    schema = inspect(connection)
+    if not schema.has_table("expenses"):
+        return False
+    return "category_id" not in {column["name"] for column in schema.get_columns("expenses")}
+
+
+async def migrate_sql() -> dict:
+    """Migrate the expenses and categories tables. Returns run stats."""
+    async with engine.begin() as conn:
+        if not await conn.run_sync(_legacy_schema):
+            logger.info("Expenses already reference categories by id; nothing to migrate")
+            return {"users": 0, "categories": 0, "expenses": 0}
+
+        listed = (await conn.execute(text("SELECT user_id, name FROM categories ORDER BY id"))).all()
+        used = (await conn.execute(text(
+            "SELECT DISTINCT user_id, category FROM expenses WHERE category IS NOT NULL"
+        ))).all()
+
+        names: dict[int, list[str]] = {}
+        for user_id, name in listed:
+            names.setdefault(user_id, []).append(name)
+        # Users who never stored categories were shown the defaults
+        tables = {user_id: CategoryTable(rows) for user_id, rows in names.items()}
+        for user_id, name in used:
+            tables[user_id] = tables.get(user_id, DEFAULT_TABLE).ensure([name])
+
+        await conn.execute(text("DROP TABLE categories"))
+        await conn.run_sync(Category.__table__.create)
+        await conn.execute(text("DROP INDEX IF EXISTS ix_expenses_user_category"))
+        await conn.execute(text("ALTER TABLE expenses ADD COLUMN category_id INTEGER"))
+
+        rows = [{"user_id": user_id, **row} for user_id, table in tables.items() for row in table.to_rows()]
+        if rows:
+            await conn.execute(Category.__table__.insert(), [{"hidden": False, **row} for row in rows])
+        updated = 0
+        for user_id, name in used:
+            result = await conn.execute(
+                text("UPDATE expenses SET category_id = :category_id WHERE user_id = :user_id AND category = :name"),
+                {"category_id": tables[user_id].ids[name], "user_id": user_id, "name": name},
+            )
+            updated += result.rowcount
+
+        await conn.execute(text("ALTER TABLE expenses DROP COLUMN category"))
+        for index in Expense.__table__.indexes:
+            if index.name == "ix_expenses_user_category_id":
+                await conn.run_sync(index.create)
+
+    stats = {"users": len(tables), "categories": len(rows), "expenses": updated}
+    logger.info(f"Category migration finished: {stats}")
+    return stats
+
+
+async def migrate_documents(user_ids: list[int] | None = None) -> dict:
+    """Migrate each user's category table and expense rows. Returns run stats."""
+    storage = storage_factory()
+    expense_log = ExpenseLog(storage)
+    categories = CategoryService()
+    user_ids = user_ids or await storage.list_user_ids()
+    migrated = expenses = 0
+
+    started = time.perf_counter()
+    for user_id in user_ids:
+        async with user_locks.lock(user_id):
+            stored = await storage.load_file(user_id, CATEGORIES_FILE)
+            if any(isinstance(row, str) for row in stored):
+                await storage.save_file(user_id, CATEGORIES_FILE, CategoryTable(stored).to_rows())
+
+            legacy = [row for row in await expense_log.load(user_id) if "category_id" not in row]
+            if not legacy:
+                continue
+            table = await categories.ensure_categories(user_id, [row.get("category") for row in legacy])
+            records = [{"op": "update", "expense": with_category_id(row, table)} for row in legacy]
+            if not await expense_log.append(user_id, records):
+                raise IOError(f"could not rewrite expenses for user {user_id}")
+            await expense_log.compact(user_id)
+        migrated += 1
+        expenses += len(records)
+        logger.info(f"Migrated {len(records)} expenses for user {user_id}")
+
+    stats = {
+        "users": len(user_ids),
+        "migrated": migrated,
+        "expenses": expenses,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    logger.info(f"Category migration finished: {stats}")
+    return stats
+
+
+async def main(argv: list[str]):
+    try:
+        if isinstance(storage_factory(), ExpenseQueryStorage):
+            await migrate_sql()
+        else:
+            await migrate_documents([int(arg) for arg in argv] or None)
+    finally:
+        await close_storage()
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
@@ -0,0 +1,78 @@
+"""
+Apply the notification retention policy to every user's history and report
+the space reclaimed.
+
+Usage:
+    python -m app.commands.notification_compaction            # every user in storage
+    python -m app.commands.notification_compaction 12 57      # selected user ids
+
+Users are found in storage itself (the data/user_* directories, the Supabase
+bucket's user_* folders or the users table), so orphaned histories are
+compacted too. Writes already trim a user's notifications as they append; the
+sweep catches users whose notifications only aged out. The API also runs it
+every NOTIFICATION_COMPACTION_INTERVAL_SECONDS.
+"""
+import asyncio
+import sys
+import time
+
+from app.core.database import close_db
+from app.core.logger import logger
+from app.services.notification_service import NotificationService
+from app.services.storage.storage_factory import close_storage, storage_factory
+
+# Users compacted at once; each one is a few reads and writes against storage
+CONCURRENCY = 8
+
+
+async def compact_notifications(user_ids: list[int] | None = None) -> dict:
+    """Compact the given users' notifications (default: every user in storage). Returns run stats."""
+    user_ids = user_ids or await storage_factory().list_user_ids()
+    service = NotificationService()
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    failed = 0
+
+    async def compact_user(user_id: int) -> dict:
+        nonlocal failed
+        async with semaphore:
+            try:
+                return await service.compact(user_id)
+            except Exception as e:
+                failed += 1
+                logger.error(f"Notification compaction failed for user {user_id}: {e}")
+                return {'removed': 0, 'bytes_reclaimed': 0}
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(compact_user(user_id) for user_id in user_ids))
+    stats = {
+        "users": len(user_ids),
+        "compacted": sum(1 for result in results if result['removed']),
+        "failed": failed,
+        "removed": sum(result['removed'] for result in results),
+        "bytes_reclaimed": sum(result['bytes_reclaimed'] for result in results),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    logger.info(f"Notification compaction finished: {stats}")
+    return stats
+
+
+async def run_scheduled_compactions(interval: float):
+    """Compact every `interval` seconds until cancelled (started from the app lifespan)."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await compact_notifications()
+        except Exception as e:
+            logger.error(f"Scheduled notification compaction failed: {e}")
+
+
+async def main(argv: list[str]):
+    try:
+        await compact_notifications([int(arg) for arg in argv] or None)
+    finally:
+        await close_storage()
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
@@ -0,0 +1,56 @@
+"""
+Rebuild per-user spending aggregates from the stored expense history.
+
+Usage:
+    python -m app.commands.rebuild_aggregates            # every user
+    python -m app.commands.rebuild_aggregates 12 57      # selected user ids
+"""
+import asyncio
+import sys
+
+from sqlalchemy import select
+
+from app.core.database import AsyncSessionLocal, close_db
+from app.core.logger import logger
+from app.models import User
+from app.services.spending_aggregates import SpendingAggregatesStore
+from app.services.storage.expense_log import ExpenseLog
+from app.services.storage.storage_base import ExpenseQueryStorage
+from app.services.storage.storage_factory import storage_factory, close_storage
+from app.services.storage.user_locks import user_locks
+
+
+async def _all_user_ids() -> list[int]:
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(User.id).order_by(User.id))
+        return list(result.scalars())
+
+
+async def rebuild_aggregates(user_ids: list[int] | None = None) -> int:
+    storage = storage_factory()
+    if isinstance(storage, ExpenseQueryStorage):
+        logger.info("Storage backend computes totals natively; nothing to rebuild")
+        return 0
+
+    expense_log = ExpenseLog(storage)
+    store = SpendingAggregatesStore(storage)
+    user_ids = user_ids or await _all_user_ids()
+
+    for user_id in user_ids:
+        async with user_locks.lock(user_id):
+            aggregates = await store.rebuild(user_id, await expense_log.load(user_id))
+        logger.info(f"Rebuilt aggregates for user {user_id}: {len(aggregates.days)} day buckets")
+    return len(user_ids)
+
+
+async def main(argv: list[str]):
+    try:
+        count = await rebuild_aggregates([int(arg) for arg in argv] or None)
+        logger.info(f"Rebuilt spending aggregates for {count} users")
+    finally:
+        await close_storage()
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
@@ -26,11 +26,63 @@ class Settings:
     # Database url
     DATABASE_URL: str | None = os.getenv("DATABASE_URL", None)
 
+    # Storage backend for per-user documents: "filesystem", "supabase" or "sql".
+    # Defaults to supabase in production and the local file system otherwise.
+    STORAGE_BACKEND: str = os.getenv(
+        "STORAGE_BACKEND", "supabase" if APP_ENV == "production" else "filesystem").lower()
+
     # Supabase Storage settings
     SUPABASE_URL: str = str(os.getenv("SUPABASE_URL", None))
     SUPABASE_KEY: str = str(os.getenv("SUPABASE_KEY", None))
     SUPABASE_BUCKET_NAME: str = str(os.getenv("SUPABASE_BUCKET_NAME", "user-files"))    
 
+    # Supabase HTTP connection pool (shared by the whole process)
+    SUPABASE_MAX_CONNECTIONS: int = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "20"))
+    SUPABASE_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("SUPABASE_MAX_KEEPALIVE_CONNECTIONS", "10"))
+    SUPABASE_KEEPALIVE_EXPIRY: float = float(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", "30"))
+    SUPABASE_TIMEOUT: float = float(os.getenv("SUPABASE_TIMEOUT", "10"))
+    SUPABASE_CONNECT_TIMEOUT: float = float(os.getenv("SUPABASE_CONNECT_TIMEOUT", "5"))
+
+    # Storage cache settings (0 bytes disables the cache)
+    STORAGE_CACHE_MAX_BYTES: int = int(os.getenv("STORAGE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    STORAGE_CACHE_TTL_SECONDS: float = float(os.getenv("STORAGE_CACHE_TTL_SECONDS", "30"))
+
+    # Per-user write locks (cross-process locks are files in this directory)
+    USER_LOCK_DIR: str = os.getenv("USER_LOCK_DIR", "data/.locks")
+    USER_LOCK_TIMEOUT_SECONDS: float = float(os.getenv("USER_LOCK_TIMEOUT_SECONDS", "10"))
+
+    # Expense log records to accumulate before folding them into the snapshot
+    EXPENSE_LOG_COMPACT_THRESHOLD: int = int(os.getenv("EXPENSE_LOG_COMPACT_THRESHOLD", "500"))
+    # Users whose indexed expense state is kept in memory (0 disables it)
+    EXPENSE_INDEX_MAX_USERS: int = int(os.getenv("EXPENSE_INDEX_MAX_USERS", "256"))
+    # Users whose parsed category table is kept in memory (0 disables it)
+    CATEGORY_CACHE_MAX_USERS: int = int(os.getenv("CATEGORY_CACHE_MAX_USERS", "4096"))
+    # Months after which expense partitions are rolled into gzipped yearly archives (0 keeps them all monthly)
+    EXPENSE_ARCHIVE_AFTER_MONTHS: int = int(os.getenv("EXPENSE_ARCHIVE_AFTER_MONTHS", "24"))
+
+    # Background budget-limit checks: queued users, worker tasks and shutdown drain time
+    LIMIT_CHECK_QUEUE_MAX_SIZE: int = int(os.getenv("LIMIT_CHECK_QUEUE_MAX_SIZE", "1000"))
+    LIMIT_CHECK_WORKERS: int = int(os.getenv("LIMIT_CHECK_WORKERS", "2"))
+    LIMIT_CHECK_DRAIN_TIMEOUT_SECONDS: float = float(os.getenv("LIMIT_CHECK_DRAIN_TIMEOUT_SECONDS", "10"))
+
+    # Cross-user limit sweep: run interval in the API (0 disables), pool processes (0 = one per CPU), users per chunk
+    LIMIT_SWEEP_INTERVAL_SECONDS: float = float(os.getenv("LIMIT_SWEEP_INTERVAL_SECONDS", "0"))
+    LIMIT_SWEEP_WORKERS: int = int(os.getenv("LIMIT_SWEEP_WORKERS", "0"))
+    LIMIT_SWEEP_CHUNK_SIZE: int = int(os.getenv("LIMIT_SWEEP_CHUNK_SIZE", "200"))
+
+    # Notification retention (0 disables a limit); unread notifications are kept unless KEEP_UNREAD is false
+    NOTIFICATION_MAX_AGE_DAYS: int = int(os.getenv("NOTIFICATION_MAX_AGE_DAYS", "180"))
+    NOTIFICATION_MAX_COUNT: int = int(os.getenv("NOTIFICATION_MAX_COUNT", "500"))
+    NOTIFICATION_KEEP_UNREAD: bool = os.getenv("NOTIFICATION_KEEP_UNREAD", "True").lower() == "true"
+    # Compaction sweep over every user's notifications, run by the API at this interval (0 disables)
+    NOTIFICATION_COMPACTION_INTERVAL_SECONDS: float = float(os.getenv("NOTIFICATION_COMPACTION_INTERVAL_SECONDS", "0"))
+    # Notification stream (SSE): keep-alive interval and notifications buffered per connection
+    NOTIFICATION_STREAM_HEARTBEAT_SECONDS: float = float(os.getenv("NOTIFICATION_STREAM_HEARTBEAT_SECONDS", "15"))
+    NOTIFICATION_STREAM_BUFFER_SIZE: int = int(os.getenv("NOTIFICATION_STREAM_BUFFER_SIZE", "100"))
+    # Backends without document versions: how often idle streams look in storage for notifications
+    # written by other processes (the hub only carries this process's); 0 disables
+    NOTIFICATION_STREAM_CATCHUP_SECONDS: float = float(os.getenv("NOTIFICATION_STREAM_CATCHUP_SECONDS", "300"))
+
     # Logging settings
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
     LOG_FORMAT: str = os.getenv("LOG_FORMAT", "detailed")
@@ -21,6 +21,10 @@ def create_engine():
     if database_url.startswith("postgresql://"):
         database_url = database_url.replace(
             "postgresql://", "postgresql+asyncpg://", 1)
+    elif database_url.startswith("sqlite://"):
+        # Local stand-in for Postgres, e.g. sqlite:///./dev.db
+        database_url = database_url.replace(
+            "sqlite://", "sqlite+aiosqlite://", 1)
 
     engine = create_async_engine(
         database_url,
@@ -59,7 +63,7 @@ async def init_db():
     """Initialize database tables"""
     async with engine.begin() as conn:
         # Import all models here to ensure they're registered
-        from ..models import User
+        from ..models import User, Expense, Category, Notification, UserSettings
 
         # Create all tables
         await conn.run_sync(Base.metadata.create_all)
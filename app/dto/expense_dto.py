@@ -1,3 +1,4 @@
+from enum import StrEnum
 from pydantic import BaseModel, Field
 from typing import Optional
 from datetime import date
@@ -7,4 +8,89 @@ class ExpenseDTO(BaseModel):
     amount: float = Field(..., gt=0)
     description: str
     date: date
-    category: Optional[str] = None
\ No newline at end of file
+    category: Optional[str] = None
+
+class ExpenseSort(StrEnum):
+    ID = 'id'
+    ID_DESC = '-id'
+    DATE = 'date'
+    DATE_DESC = '-date'
+    AMOUNT = 'amount'
+    AMOUNT_DESC = '-amount'
+
+    @property
+    def field(self) -> str:
+        return self.value.lstrip('-')
+
+    @property
+    def descending(self) -> bool:
+        return self.value.startswith('-')
+
+
+class ExpenseQueryDTO(BaseModel):
+    start_date: Optional[date] = Field(None, description="Only expenses on or after this date")
+    end_date: Optional[date] = Field(None, description="Only expenses on or before this date")
+    category: Optional[str] = None
+    min_amount: Optional[float] = Field(None, ge=0)
+    max_amount: Optional[float] = Field(None, ge=0)
+    sort: ExpenseSort = ExpenseSort.ID
+    limit: Optional[int] = Field(None, ge=1, le=500, description="Page size; omit to return every match")
+    cursor: Optional[str] = Field(None, description="Opaque cursor from the previous page's X-Next-Cursor header")
+    stream: bool = Field(False, description="Stream every match in stored order instead of building the body in memory")
+
+
+class ExpenseSearchHitDTO(ExpenseDTO):
+    score: float = Field(..., description="Relevance; higher is better")
+
+
+class SpendingStatsDTO(BaseModel):
+    total: float
+    count: int
+    min: float
+    max: float
+    average: float
+
+
+class SpendingGroupDTO(SpendingStatsDTO):
+    key: Optional[str] = Field(None, description="Category name, YYYY-MM-DD day, YYYY-Www ISO week or YYYY-MM month")
+
+
+class ExpenseSummaryDTO(BaseModel):
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    overall: SpendingStatsDTO
+    by_category: list[SpendingGroupDTO]
+    by_day: list[SpendingGroupDTO]
+    by_week: list[SpendingGroupDTO]
+    by_month: list[SpendingGroupDTO]
+
+
+class ExpenseBatchOp(StrEnum):
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+
+
+class ExpenseBatchOperationDTO(BaseModel):
+    op: ExpenseBatchOp
+    id: Optional[int] = Field(None, description="Target expense for update and delete")
+    expense: Optional[ExpenseDTO] = Field(None, description="New values for create and update")
+
+
+class ExpenseBatchDTO(BaseModel):
+    operations: list[ExpenseBatchOperationDTO] = Field(..., min_length=1, max_length=500)
+
+
+class ExpenseBatchResultDTO(BaseModel):
+    index: int
+    op: ExpenseBatchOp
+    status: int = Field(..., description="HTTP-style status of this operation")
+    id: Optional[int] = None
+    expense: Optional[ExpenseDTO] = None
+    detail: Optional[str] = None
+
+
+class ExpenseBatchResponseDTO(BaseModel):
+    results: list[ExpenseBatchResultDTO]
+    limit_exceeded: bool = False
+    details: list[dict] = []
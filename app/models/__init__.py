@@ -1,3 +1,7 @@
 from .user import User
+from .expense import Expense
+from .category import Category
+from .notification import Notification
+from .user_settings import UserSettings
 
-__all__ = ["User"] 
\ No newline at end of file
+__all__ = ["User", "Expense", "Category", "Notification", "UserSettings"] 
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Index
+from ..core.database import Base
+
+
+class Category(Base):
+    __tablename__ = "categories"
+    __table_args__ = (
+        Index("ix_categories_user_name", "user_id", "name"),
+    )
+
+    # Category ids are allocated per user and referenced by expenses, so the key is (user_id, id)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    name = Column(String(255), nullable=False)
+    # Deleted categories, and names only used on expenses: they resolve names but are not listed
+    hidden = Column(Boolean, nullable=False, default=False)
+
+    @classmethod
+    def from_dict(cls, user_id: int, data: dict) -> "Category":
+        return cls(
+            user_id=user_id,
+            id=int(data["id"]),
+            name=data["name"],
+            hidden=bool(data.get("hidden", False)),
+        )
+
+    def to_dict(self) -> dict:
+        data = {"id": self.id, "name": self.name}
+        if self.hidden:
+            data["hidden"] = True
+        return data
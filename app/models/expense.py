@@ -0,0 +1,45 @@
+import datetime
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from ..core.database import Base
+
+
+class Expense(Base):
+    __tablename__ = "expenses"
+    __table_args__ = (
+        Index("ix_expenses_user_date", "user_id", "date"),
+        Index("ix_expenses_user_category_id", "user_id", "category_id"),
+    )
+
+    # Expense ids are allocated per user, so the key is (user_id, id)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    amount = Column(Float, nullable=False)
+    description = Column(String(500), nullable=False, default="")
+    date = Column(Date, nullable=False)
+    # Id in the user's categories table; the name lives only there
+    category_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    @classmethod
+    def from_dict(cls, user_id: int, data: dict) -> "Expense":
+        expense_date = data["date"]
+        if isinstance(expense_date, str):
+            expense_date = datetime.date.fromisoformat(expense_date)
+        return cls(
+            user_id=user_id,
+            id=int(data["id"]),
+            amount=float(data["amount"]),
+            description=data.get("description", ""),
+            date=expense_date,
+            category_id=data.get("category_id"),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "amount": self.amount,
+            "description": self.description,
+            "date": self.date.isoformat(),
+            "category_id": self.category_id,
+        }
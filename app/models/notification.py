@@ -0,0 +1,46 @@
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from ..core.database import Base
+
+
+class Notification(Base):
+    __tablename__ = "notifications"
+    __table_args__ = (
+        Index("ix_notifications_user_read", "user_id", "is_read"),
+    )
+
+    pk = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    id = Column(String(64), nullable=False)
+    title = Column(String(255), nullable=False)
+    detail = Column(Text, nullable=False, default="")
+    is_read = Column(Boolean, nullable=False, default=False)
+    # Period key the alert belongs to, e.g. 2026-10-18, 2026-W41 or 2026-10
+    date = Column(String(16), nullable=True)
+    read_at = Column(String(32), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    @classmethod
+    def from_dict(cls, user_id: int, data: dict) -> "Notification":
+        return cls(
+            user_id=user_id,
+            id=str(data["id"]),
+            title=data.get("title", ""),
+            detail=data.get("detail", ""),
+            is_read=bool(data.get("is_read", False)),
+            date=data.get("date"),
+            read_at=data.get("read_at"),
+        )
+
+    def to_dict(self) -> dict:
+        data = {
+            "id": self.id,
+            "seq": self.pk,
+            "title": self.title,
+            "detail": self.detail,
+            "is_read": self.is_read,
+            "date": self.date,
+        }
+        if self.read_at:
+            data["read_at"] = self.read_at
+        return data
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from ..core.database import Base
+
+
+class UserSettings(Base):
+    __tablename__ = "user_settings"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    daily = Column(Float, nullable=False, default=0)
+    weekly = Column(Float, nullable=False, default=0)
+    monthly = Column(Float, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    @classmethod
+    def from_dict(cls, user_id: int, data: dict) -> "UserSettings":
+        # Accept both the flat shape and the legacy {"budgetLimits": {...}} shape
+        limits = data.get("budgetLimits", data)
+        return cls(
+            user_id=user_id,
+            daily=float(limits.get("daily", 0) or 0),
+            weekly=float(limits.get("weekly", 0) or 0),
+            monthly=float(limits.get("monthly", 0) or 0),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "daily": self.daily,
+            "weekly": self.weekly,
+            "monthly": self.monthly,
+        }
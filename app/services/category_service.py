@@ -1,75 +1,165 @@
-import json
-from typing import List
+import time
+from collections import OrderedDict
+from typing import Iterable, List
 from fastapi import HTTPException
+from app.core.config import settings
+from app.core.logger import logger
+from app.services.category_table import DEFAULT_TABLE, CategoryTable
 from app.services.storage.storage_factory import storage_factory
+from app.services.storage.user_locks import user_locks
+from app.utils.etag import make_etag
+
+CATEGORIES_FILE = 'categories.json'
+
+
+class CategoryCache:
+    """
+    Process-wide LRU of parsed category tables, bounded by number of users.
+
+    Entries are revalidated against the document version on backends that
+    have one, and trusted for STORAGE_CACHE_TTL_SECONDS by plain reads on
+    those that do not; writes from this process replace the entry directly. `writes` counts
+    stored table changes: reads never write.
+    """
+
+    def __init__(self, max_users: int, ttl_seconds: float):
+        self.max_users = max_users
+        self.ttl_seconds = ttl_seconds
+        self._tables: OrderedDict[int, tuple[CategoryTable, str | None, float]] = OrderedDict()
+        self.hits = 0
+        self.loads = 0
+        self.writes = 0
+
+    def get(self, user_id: int, version: str | None) -> CategoryTable | None:
+        entry = self._tables.get(user_id)
+        if entry is not None:
+            table, cached_version, loaded_at = entry
+            if cached_version is not None:
+                fresh = cached_version == version
+            else:
+                fresh = self.ttl_seconds <= 0 or time.monotonic() - loaded_at < self.ttl_seconds
+            if fresh:
+                self._tables.move_to_end(user_id)
+                self.hits += 1
+                return table
+        return None
+
+    def put(self, user_id: int, table: CategoryTable, version: str | None):
+        if self.max_users <= 0:
+            return
+        self._tables[user_id] = (table, version, time.monotonic())
+        self._tables.move_to_end(user_id)
+        while len(self._tables) > self.max_users:
+            self._tables.popitem(last=False)
+
+    def discard(self, user_id: int):
+        self._tables.pop(user_id, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.loads
+        return {
+            "users": len(self._tables),
+            "hits": self.hits,
+            "loads": self.loads,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "writes": self.writes,
+        }
+
+
+category_cache = CategoryCache(settings.CATEGORY_CACHE_MAX_USERS, settings.STORAGE_CACHE_TTL_SECONDS)
+
+
+def log_category_cache_stats():
+    logger.info(f"Category cache stats: {category_cache.stats()}")
+
 
 class CategoryService:
 
     def __init__(self):
         self.storage = storage_factory()
 
-    def _read_categories(self, user_id: int) -> List[str]:
-        """Read expenses for a user from the configured storage."""
-        categories = self.storage.load_file(user_id, 'catrgories.json')
-        return categories if isinstance(categories, list) else [categories]
+    async def table(self, user_id: int) -> CategoryTable:
+        """
+        The user's category table, served from the cache while the stored
+        document is unchanged. Users who never changed their categories get
+        the shared DEFAULT_TABLE; nothing is written until their first change.
+
+        Under the user's lock (a read-modify-write) on backends that cannot
+        stat, cached entries are skipped and the storage reloads the document
+        from the backend instead of its TTL cache, so a change starts from what
+        other workers stored.
+        """
+        # Version before the load: a write landing in between makes the entry stale, not wrong
+        version = self.storage.document_version(user_id, CATEGORIES_FILE)
+        if self.storage.supports_stat or not user_locks.held(user_id):
+            table = category_cache.get(user_id, version)
+            if table is not None:
+                return table
+
+        category_cache.loads += 1
+        rows = await self.storage.load_file(user_id, CATEGORIES_FILE)
+        table = CategoryTable(rows) if rows else DEFAULT_TABLE
+        category_cache.put(user_id, table, version)
+        return table
 
-    def _write_categories(self, user_id: int, categories: list):
-        """Save category into categories file"""
-        return self.storage.save_file(user_id, 'categories.json', categories)
+    async def _write_table(self, user_id: int, table: CategoryTable):
+        """Save the category table, materializing the defaults on a user's first change"""
+        if not await self.storage.save_file(user_id, CATEGORIES_FILE, table.to_rows()):
+            category_cache.discard(user_id)
+            raise HTTPException(status_code=500, detail="Could not save categories")
+        category_cache.writes += 1
+        category_cache.put(user_id, table, self.storage.document_version(user_id, CATEGORIES_FILE))
 
+    def etag(self, user_id: int) -> str | None:
+        return make_etag(self.storage.document_version(user_id, CATEGORIES_FILE))
 
-    def list_categories(self, user_id: int) -> List[str]:
+    async def list_categories(self, user_id: int) -> List[str]:
         """List all categories for the user."""
-        categories =  self._read_categories(user_id)
-
-        default_categories = [
-            "Food & Dining",
-            "Transportation",
-            "Shopping",
-            "Entertainment",
-            "Bills & Utilities",
-            "Healthcare",
-            "Travel",
-            "Education",
-            "Personal Care",
-        ]
-
-        if len(categories) == 0:
-            self._write_categories(user_id, default_categories)
-            return default_categories
-        
-        else:
-            return categories
-
-    def add_category(self, user_id: int, category: str) -> List[str]:
+        return (await self.table(user_id)).listed()
+
+    async def ensure_categories(self, user_id: int, names: Iterable[str | None]) -> CategoryTable:
+        """
+        The user's category table with an id for every given name, for storing
+        expenses. Names not in the table yet are added hidden, in one write.
+        """
+        async with user_locks.lock(user_id):
+            table = await self.table(user_id)
+            ensured = table.ensure(names)
+            if ensured is not table:
+                await self._write_table(user_id, ensured)
+            return ensured
+
+    async def add_category(self, user_id: int, category: str) -> List[str]:
         """Add a new category and return updated list."""
-        categories = self._read_categories(user_id)
-        if category in categories:
-            raise HTTPException(status_code=400, detail="Category already exists")
-        
-        categories.append(category)
-        self._write_categories(user_id, categories)
-        return categories 
-
-    def delete_category(self, user_id: int, category: str) -> List[str]:
-        """Delete a category and return updated list."""
-        categories = self._read_categories(user_id)
-        if category not in categories:
-            raise HTTPException(status_code=404, detail="Category not found")
-        
-        categories.remove(category)
-        self._write_categories(user_id, categories)
-        return categories 
-
-    def update_category(self, user_id: int, old_name: str, new_name: str):
-        categories = self._read_categories(user_id)
-
-        if old_name not in categories:
-            raise HTTPException(status_code=404, detail="Original category not found")
-
-        if new_name in categories:
-            raise HTTPException(status_code=400, detail="New category name already exists")
-
-        index = categories.index(old_name)
-        categories[index] = new_name
-        self._write_categories(user_id, categories)
+        async with user_locks.lock(user_id):
+            table = await self.table(user_id)
+            if table.is_listed(category):
+                raise HTTPException(status_code=400, detail="Category already exists")
+
+            table = table.add(category)
+            await self._write_table(user_id, table)
+            return table.listed()
+
+    async def delete_category(self, user_id: int, category: str) -> List[str]:
+        """Delete a category and return updated list. Its expenses keep showing the name."""
+        async with user_locks.lock(user_id):
+            table = await self.table(user_id)
+            if not table.is_listed(category):
+                raise HTTPException(status_code=404, detail="Category not found")
+
+            table = table.hide(category)
+            await self._write_table(user_id, table)
+            return table.listed()
+
+    async def update_category(self, user_id: int, old_name: str, new_name: str):
+        """Rename a category; its expenses follow through their category id."""
+        async with user_locks.lock(user_id):
+            table = await self.table(user_id)
+
+            if not table.is_listed(old_name):
+                raise HTTPException(status_code=404, detail="Original category not found")
+
+            if table.is_listed(new_name):
+                raise HTTPException(status_code=400, detail="New category name already exists")
+
+            await self._write_table(user_id, table.rename(old_name, new_name))
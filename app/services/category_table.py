@@ -0,0 +1,98 @@
+from typing import Iterable
+
+DEFAULT_CATEGORIES = (
+    "Food & Dining",
+    "Transportation",
+    "Shopping",
+    "Entertainment",
+    "Bills & Utilities",
+    "Healthcare",
+    "Travel",
+    "Education",
+    "Personal Care",
+)
+
+
+def category_name(expense: dict, names: dict) -> str | None:
+    """An expense's category name. Rows stored before category ids carry the name itself."""
+    if "category_id" in expense:
+        return names.get(expense["category_id"])
+    return expense.get("category")
+
+
+def with_category_id(expense: dict, table: "CategoryTable") -> dict:
+    """The stored form of an expense given by category name: the name is replaced by its id."""
+    row = {key: value for key, value in expense.items() if key != "category"}
+    name = expense.get("category")
+    row["category_id"] = table.ids[name] if name is not None else None
+    return row
+
+
+class CategoryTable:
+    """
+    A user's categories as an id -> name table, stored as
+    [{"id": 1, "name": "Food & Dining"}, ...]. Expenses store the id, so a
+    rename or delete rewrites only this table.
+
+    Hidden entries resolve names for expenses but are not listed: deleted
+    categories, and names only ever used on expenses. `ids` is the hash index
+    on name; a listed category wins over hidden ones of the same name.
+
+    Tables are never changed in place: every change returns a new table, so one
+    instance can be shared by all readers (the category cache, DEFAULT_TABLE).
+    """
+
+    def __init__(self, rows: Iterable):
+        self.rows: dict[int, dict] = {}
+        for position, row in enumerate(rows, start=1):
+            if isinstance(row, str):
+                # Stored as a bare list of names before category ids
+                row = {"id": position, "name": row}
+            self.rows[row["id"]] = row
+        self.names = {category_id: row["name"] for category_id, row in self.rows.items()}
+        self.ids: dict[str, int] = {}
+        for category_id, row in self.rows.items():
+            if not row.get("hidden") or row["name"] not in self.ids:
+                self.ids[row["name"]] = category_id
+        self._listed = tuple(row["name"] for row in self.rows.values() if not row.get("hidden"))
+
+    def _with(self, row: dict) -> "CategoryTable":
+        return CategoryTable({**self.rows, row["id"]: row}.values())
+
+    def _next_id(self) -> int:
+        return max(self.rows, default=0) + 1
+
+    def is_listed(self, name: str) -> bool:
+        category_id = self.ids.get(name)
+        return category_id is not None and not self.rows[category_id].get("hidden")
+
+    def listed(self) -> list[str]:
+        return list(self._listed)
+
+    def to_rows(self) -> list[dict]:
+        return list(self.rows.values())
+
+    def add(self, name: str) -> "CategoryTable":
+        """List `name`, bringing back a hidden category of that name (and its expenses) if there is one."""
+        category_id = self.ids.get(name)
+        return self._with({"id": self._next_id() if category_id is None else category_id, "name": name})
+
+    def hide(self, name: str) -> "CategoryTable":
+        category_id = self.ids[name]
+        return self._with({**self.rows[category_id], "hidden": True})
+
+    def rename(self, old_name: str, new_name: str) -> "CategoryTable":
+        category_id = self.ids[old_name]
+        return self._with({**self.rows[category_id], "name": new_name})
+
+    def ensure(self, names: Iterable[str | None]) -> "CategoryTable":
+        """A table with an id for every name, new ones added hidden. Returns this table if none is new."""
+        table = self
+        for name in dict.fromkeys(names):
+            if name is not None and name not in table.ids:
+                table = table._with({"id": table._next_id(), "name": name, "hidden": True})
+        return table
+
+
+# What every user sees until their first category change is stored. Shared, never written on a read.
+DEFAULT_TABLE = CategoryTable(DEFAULT_CATEGORIES)
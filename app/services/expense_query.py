@@ -0,0 +1,125 @@
+import base64
+import heapq
+import json
+from typing import AsyncIterator, Iterable, List
+
+import orjson
+from fastapi import HTTPException
+
+from app.dto.expense_dto import ExpenseQueryDTO, ExpenseSort
+from app.services.category_table import category_name
+
+
+def encode_cursor(sort: ExpenseSort, expense: dict) -> str:
+    """Opaque keyset cursor: the sort and the (value, id) of the last row on the page."""
+    payload = json.dumps([sort.value, expense.get(sort.field), expense.get("id")], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: ExpenseSort) -> tuple:
+    """Return the (value, id) position after which the next page starts."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, value, expense_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_sort != sort.value:
+        raise HTTPException(status_code=400, detail="Cursor was issued for a different sort order")
+    return value, expense_id
+
+
+def _sort_key(field: str):
+    # Missing values sort first; dates are ISO strings, so they compare in date order
+    def key(expense: dict):
+        value = expense.get(field)
+        return (value is not None, value if value is not None else 0, expense.get("id") or 0)
+    return key
+
+
+def matches(expense: dict, query: ExpenseQueryDTO, names: dict) -> bool:
+    """`names` is the user's category id -> name table, for the category filter."""
+    if query.category is not None and category_name(expense, names) != query.category:
+        return False
+    if query.start_date is not None or query.end_date is not None:
+        day = expense.get("date") or ""
+        if query.start_date is not None and day < query.start_date.isoformat():
+            return False
+        if query.end_date is not None and day > query.end_date.isoformat():
+            return False
+    if query.min_amount is not None or query.max_amount is not None:
+        amount = float(expense.get("amount") or 0)
+        if query.min_amount is not None and amount < query.min_amount:
+            return False
+        if query.max_amount is not None and amount > query.max_amount:
+            return False
+    return True
+
+
+def page_expenses(
+    expenses: Iterable[dict], query: ExpenseQueryDTO, names: dict
+) -> tuple[List[dict], str | None]:
+    """
+    Filter, order and page expenses held in memory. Only `limit + 1` rows are
+    ever kept in the selection heap, so the work beyond one filtering pass
+    scales with the page size rather than with the history length.
+    """
+    sort = query.sort
+    key = _sort_key(sort.field)
+    rows = (expense for expense in expenses if matches(expense, query, names))
+
+    if query.cursor is not None:
+        value, expense_id = decode_cursor(query.cursor, sort)
+        after = key({sort.field: value, "id": expense_id})
+        if sort.descending:
+            rows = (expense for expense in rows if key(expense) < after)
+        else:
+            rows = (expense for expense in rows if key(expense) > after)
+
+    if query.limit is None:
+        return sorted(rows, key=key, reverse=sort.descending), None
+
+    select = heapq.nlargest if sort.descending else heapq.nsmallest
+    page = select(query.limit + 1, rows, key=key)
+    if len(page) <= query.limit:
+        return page, None
+    page = page[:query.limit]
+    return page, encode_cursor(sort, page[-1])
+
+
+def project(expense: dict, names: dict) -> dict:
+    """A stored expense row as ExpenseDTO fields, with the category id resolved to its name."""
+    return {
+        "id": expense.get("id"),
+        "amount": float(expense.get("amount") or 0),
+        "description": expense.get("description"),
+        "date": expense.get("date"),
+        "category": category_name(expense, names),
+    }
+
+
+def dump_expenses(expenses: Iterable[dict], names: dict) -> bytes:
+    """
+    Encode stored expense rows as the JSON body of List[ExpenseDTO] without
+    building or revalidating DTOs. Rows were validated when they were written,
+    so only the response fields are projected, in ExpenseDTO field order.
+    """
+    return orjson.dumps([project(expense, names) for expense in expenses])
+
+
+async def stream_expenses_json(
+    expenses: AsyncIterator[dict], query: ExpenseQueryDTO, names: dict, chunk_size: int = 64 * 1024
+) -> AsyncIterator[bytes]:
+    """Encode matching rows as one JSON array, yielded in chunks of about `chunk_size` bytes."""
+    chunk = bytearray(b"[")
+    separator = b""
+    async for expense in expenses:
+        if not matches(expense, query, names):
+            continue
+        chunk += separator
+        chunk += orjson.dumps(project(expense, names))
+        separator = b","
+        if len(chunk) >= chunk_size:
+            yield bytes(chunk)
+            chunk.clear()
+    chunk += b"]"
+    yield bytes(chunk)
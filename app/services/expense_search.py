@@ -0,0 +1,124 @@
+import heapq
+import math
+import re
+from bisect import bisect_left, insort
+
+from app.services.category_table import category_name
+
+_TOKEN = re.compile(r"\w+")
+
+# Matches in the description count for more than matches in the category
+FIELD_WEIGHTS = {"description": 2.0, "category": 1.0}
+# A prefix match ("cof" -> "coffee") scores this fraction of an exact match
+PREFIX_FACTOR = 0.5
+
+
+def tokenize(text) -> list[str]:
+    return _TOKEN.findall(text.casefold()) if isinstance(text, str) else []
+
+
+class ExpenseSearchIndex:
+    """
+    Inverted index over one user's expense descriptions and categories.
+
+    `postings` maps a token to {expense id: weighted term frequency}; a sorted
+    vocabulary list serves prefix lookups by bisection. Adding, replacing or
+    removing an expense touches only that expense's tokens, so the index is
+    kept in step with every write instead of being rebuilt. Category names are
+    resolved through `names` (category id -> name) when an expense is indexed.
+    """
+
+    def __init__(self, names: dict | None = None):
+        self.postings: dict[str, dict] = {}
+        self.terms: list[str] = []
+        self._documents: dict = {}
+        self.names = names or {}
+
+    @classmethod
+    def build(cls, expenses, names: dict | None = None) -> "ExpenseSearchIndex":
+        index = cls(names)
+        for expense in expenses:
+            if expense is not None:
+                index._index(expense)
+        # Sort the vocabulary once instead of inserting every new term in order
+        index.terms = sorted(index.postings)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def add(self, expense: dict):
+        self.remove(expense.get("id"))
+        for token in self._index(expense):
+            insort(self.terms, token)
+
+    def _index(self, expense: dict) -> list[str]:
+        """Add an expense's postings; returns tokens that are new to the vocabulary."""
+        expense_id = expense.get("id")
+        weights: dict[str, float] = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            text = category_name(expense, self.names) if field == "category" else expense.get(field)
+            for token in tokenize(text):
+                weights[token] = weights.get(token, 0.0) + weight
+        if not weights:
+            return []
+
+        self._documents[expense_id] = weights
+        new_terms = []
+        for token, weight in weights.items():
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = {}
+                new_terms.append(token)
+            posting[expense_id] = weight
+        return new_terms
+
+    def remove(self, expense_id):
+        weights = self._documents.pop(expense_id, None)
+        if not weights:
+            return
+        for token in weights:
+            posting = self.postings[token]
+            posting.pop(expense_id, None)
+            if not posting:
+                del self.postings[token]
+                del self.terms[bisect_left(self.terms, token)]
+
+    def _matching_terms(self, token: str):
+        """Yield (term, factor) for the exact term and every longer term it prefixes."""
+        for position in range(bisect_left(self.terms, token), len(self.terms)):
+            term = self.terms[position]
+            if not term.startswith(token):
+                break
+            yield term, 1.0 if term == token else PREFIX_FACTOR
+
+    def search(self, query: str, limit: int) -> list[tuple]:
+        """
+        Ids of expenses matching every query token (exactly or as a prefix),
+        best first, as (expense id, score) pairs. Scores are weighted term
+        frequency times inverse document frequency.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens or not self._documents:
+            return []
+
+        total = len(self._documents)
+        scores: dict | None = None
+        # Rarest tokens first, so the candidate set shrinks as early as possible
+        for token in sorted(tokens, key=lambda t: len(self.postings.get(t, ())) or math.inf):
+            token_scores: dict = {}
+            for term, factor in self._matching_terms(token):
+                posting = self.postings[term]
+                idf = math.log(1 + total / len(posting))
+                for expense_id, weight in posting.items():
+                    if scores is not None and expense_id not in scores:
+                        continue
+                    token_scores[expense_id] = max(token_scores.get(expense_id, 0.0), weight * factor * idf)
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {expense_id: scores[expense_id] + score for expense_id, score in token_scores.items()}
+            if not scores:
+                return []
+
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
@@ -1,11 +1,39 @@
 import json
 import datetime
-from typing import List
+from typing import AsyncIterator, List
 from fastapi import HTTPException
 from fastapi.responses import JSONResponse
 
-from app.dto.expense_dto import ExpenseDTO
+from app.dto.expense_dto import (
+    ExpenseDTO,
+    ExpenseQueryDTO,
+    ExpenseSort,
+    ExpenseSummaryDTO,
+    ExpenseSearchHitDTO,
+    ExpenseBatchDTO,
+    ExpenseBatchOp,
+    ExpenseBatchResultDTO,
+    ExpenseBatchResponseDTO,
+)
+from app.services.category_service import CATEGORIES_FILE, CategoryService
+from app.services.category_table import with_category_id
+from app.services.expense_summary import ExpenseColumns, summarize
+from app.services.expense_query import (
+    decode_cursor,
+    dump_expenses,
+    encode_cursor,
+    page_expenses,
+    project,
+    stream_expenses_json,
+)
+from app.services.limit_check_queue import limit_check_queue
+from app.services.spending_aggregates import SpendingAggregates, SpendingAggregatesStore
+from app.services.storage.expense_log import ExpenseLog, LOG_FILE, SNAPSHOT_FILE
+from app.services.storage.expense_partitions import MANIFEST_FILE
+from app.services.storage.storage_base import ExpenseQueryStorage
 from app.services.storage.storage_factory import storage_factory
+from app.services.storage.user_locks import user_locks
+from app.utils.etag import make_etag
 from app.utils.expense_limit_checker import ExpenseLimitChecker
 
 
@@ -20,48 +48,40 @@ class DateTimeEncoder(json.JSONEncoder):
 class ExpenseService:
     def __init__(self):
         self.storage = storage_factory()
+        self.expense_log = ExpenseLog(self.storage)
+        self.aggregates = SpendingAggregatesStore(self.storage)
+        self.categories = CategoryService()
 
-    def _read_expenses(self, user_id: int) -> List[dict]:
-        """Read expenses for a user from the configured storage."""
-        data = self.storage.load_file(user_id, "expenses.json")
-        return data if isinstance(data, list) else []
+    async def _category_names(self, user_id: int) -> dict:
+        """The user's category id -> name table, for resolving stored expenses."""
+        return (await self.categories.table(user_id)).names
 
-    def _write_expenses(self, user_id: int, expenses: List[dict]):
-        """Overwrite all expenses for a user."""
-        self.storage.save_file(user_id, "expenses.json", expenses)
+    async def _read_expenses(self, user_id: int) -> List[dict]:
+        """Read expenses for a user by replaying the expense log over its snapshot."""
+        return await self.expense_log.load(user_id)
 
-    def add_expense(self, user_id: int, expense: ExpenseDTO):
+    async def add_expense(self, user_id: int, expense: ExpenseDTO):
         """Add a new expense for the user."""
-        expenses = self._read_expenses(user_id)
-        expense_id = (max([e["id"] for e in expenses], default=0) + 1) if expenses else 1
-        expense.id = expense_id
+        async with user_locks.lock(user_id):
+            expense.id = await self.expense_log.reserve_ids(user_id)
+            aggregates = await self._load_aggregates(user_id)
 
-        today = datetime.date.today()
-        week_start = today - datetime.timedelta(days=today.weekday())
-        month_start = today.replace(day=1)
-
-        total_today = sum(e["amount"] for e in expenses if "date" in e and datetime.date.fromisoformat(e["date"]) == today)
-        total_week = sum(e["amount"] for e in expenses if "date" in e and week_start <= datetime.date.fromisoformat(e["date"]) <= today)
-        total_month = sum(e["amount"] for e in expenses if "date" in e and month_start <= datetime.date.fromisoformat(e["date"]) <= today)
-
-        total_today += expense.amount
-        total_week += expense.amount
-        total_month += expense.amount
-
-        checker = ExpenseLimitChecker(user_id)
-        exceeded = checker.check_and_notify(total_today, total_week, total_month)
+            try:
+                expense_dict = expense.model_dump()
+            except AttributeError:
+                expense_dict = expense.dict()
 
-        try:
-            expense_dict = expense.model_dump()
-        except AttributeError:
-            expense_dict = expense.dict()
+            if "date" in expense_dict and isinstance(expense_dict["date"], (datetime.date, datetime.datetime)):
+                expense_dict["date"] = expense_dict["date"].isoformat()
 
-        if "date" in expense_dict and isinstance(expense_dict["date"], (datetime.date, datetime.datetime)):
-            expense_dict["date"] = expense_dict["date"].isoformat()
-
-        expenses.append(expense_dict)
-        self._write_expenses(user_id, expenses)
+            table = await self.categories.ensure_categories(user_id, [expense_dict.get("category")])
+            if not await self.expense_log.add(user_id, with_category_id(expense_dict, table)):
+                raise HTTPException(status_code=500, detail="Could not save expense")
+            await self._adjust_aggregates(user_id, aggregates, added=expense_dict)
 
+        # The response reports new breaches (the client shows them); the notifications are written by the queue
+        exceeded = await self.new_limit_breaches(user_id, aggregates)
+        await self.queue_limit_check(user_id)
         if exceeded:
             return JSONResponse(
                 status_code=201,
@@ -73,30 +93,288 @@ class ExpenseService:
             )
         return expense
 
-    def list_expenses(self, user_id: int) -> List[ExpenseDTO]:
-        """List all expenses for the user."""
-        expenses = self._read_expenses(user_id)
-        return [ExpenseDTO(**e) for e in expenses]
+    async def list_expenses_json(
+        self, user_id: int, query: ExpenseQueryDTO | None = None
+    ) -> tuple[bytes, str | None]:
+        """
+        List the user's expenses matching `query`, one page at a time, encoded
+        straight from the stored rows. Returns (JSON bytes, next cursor). The
+        unfiltered listing is cached as bytes on the indexed state until the
+        next write or category change.
+        """
+        query = query or ExpenseQueryDTO()
+        names = await self._category_names(user_id)
+        if query == ExpenseQueryDTO() and not isinstance(self.storage, ExpenseQueryStorage):
+            state = await self.expense_log.state(user_id)
+            cached = state.derived.get("listing_json")
+            if cached is None or cached[0] != names:
+                expenses, _ = page_expenses(state.live_rows(), query, names)
+                cached = state.derived["listing_json"] = (names, dump_expenses(expenses, names))
+            return cached[1], None
+
+        expenses, next_cursor = await self._list_rows(user_id, query, names)
+        return dump_expenses(expenses, names), next_cursor
+
+    def stream_expenses_json(self, user_id: int, query: ExpenseQueryDTO) -> AsyncIterator[bytes]:
+        """
+        Stream the listing as JSON array chunks while rows are read from storage,
+        so memory and time to first byte do not grow with the history. Rows come
+        in stored order, so sorting and paging are not available in this mode.
+        """
+        if query.sort != ExpenseSort.ID or query.limit is not None or query.cursor is not None:
+            raise HTTPException(status_code=400, detail="Streaming does not support sort, limit or cursor")
+        return self._stream_expenses_json(user_id, query)
+
+    async def _stream_expenses_json(self, user_id: int, query: ExpenseQueryDTO) -> AsyncIterator[bytes]:
+        names = await self._category_names(user_id)
+        async for chunk in stream_expenses_json(self.expense_log.stream(user_id), query, names):
+            yield chunk
+
+    def listing_etag(self, user_id: int, query: ExpenseQueryDTO | None = None) -> str | None:
+        """ETag of a listing from the expense and category documents' versions, without loading them."""
+        return make_etag(
+            self.storage.document_version(user_id, CATEGORIES_FILE),
+            self.storage.document_version(user_id, SNAPSHOT_FILE),
+            self.storage.document_version(user_id, LOG_FILE),
+            self.storage.document_version(user_id, MANIFEST_FILE),
+            (query or ExpenseQueryDTO()).model_dump_json(),
+        )
 
-    def update_expense(self, user_id: int, expense_id: int, expense: ExpenseDTO) -> ExpenseDTO:
+    async def _list_rows(
+        self, user_id: int, query: ExpenseQueryDTO, names: dict
+    ) -> tuple[List[dict], str | None]:
+        if isinstance(self.storage, ExpenseQueryStorage):
+            return await self._query_expenses(user_id, query)
+        if query.start_date is not None or query.end_date is not None:
+            # Only the month partitions overlapping the range are read
+            rows = await self.expense_log.load_range(user_id, query.start_date, query.end_date)
+            return page_expenses(rows, query, names)
+        return page_expenses(await self._read_expenses(user_id), query, names)
+
+    async def _query_expenses(self, user_id: int, query: ExpenseQueryDTO) -> tuple[List[dict], str | None]:
+        """Push filtering, ordering and the keyset seek down to the database."""
+        after = decode_cursor(query.cursor, query.sort) if query.cursor else None
+        expenses = await self.storage.query_expenses(
+            user_id,
+            start_date=query.start_date,
+            end_date=query.end_date,
+            category=query.category,
+            min_amount=query.min_amount,
+            max_amount=query.max_amount,
+            sort=query.sort,
+            after=after,
+            limit=query.limit + 1 if query.limit is not None else None,
+        )
+        if query.limit is None or len(expenses) <= query.limit:
+            return expenses, None
+        expenses = expenses[:query.limit]
+        return expenses, encode_cursor(query.sort, expenses[-1])
+
+    async def search_expenses(self, user_id: int, query: str, limit: int = 20) -> List[ExpenseSearchHitDTO]:
+        """Full-text search over descriptions and categories, best matches first."""
+        names = await self._category_names(user_id)
+        state = await self.expense_log.state(user_id)
+        return [
+            ExpenseSearchHitDTO(**project(expense, names), score=round(score, 4))
+            for expense, score in state.search(query, limit, names)
+        ]
+
+    async def summarize_expenses(
+        self, user_id: int, start_date: datetime.date | None = None, end_date: datetime.date | None = None
+    ) -> ExpenseSummaryDTO:
+        """Spending grouped by category, day, ISO week and month over an optional date range."""
+        names = await self._category_names(user_id)
+        if isinstance(self.storage, ExpenseQueryStorage):
+            columns = ExpenseColumns.build(
+                await self.storage.query_expenses(user_id, start_date=start_date, end_date=end_date), names
+            )
+        elif (start_date is not None or end_date is not None) and not self.expense_log.is_cached(user_id):
+            rows = await self.expense_log.load_range(user_id, start_date, end_date)
+            columns = ExpenseColumns.build(rows, names).between(start_date, end_date)
+        else:
+            # Columns are cached on the indexed state until the next write or category change
+            state = await self.expense_log.state(user_id)
+            cached = state.derived.get("columns")
+            if cached is None or cached[0] != names:
+                cached = state.derived["columns"] = (names, ExpenseColumns.build(state.rows, names))
+            columns = cached[1].between(start_date, end_date)
+        return ExpenseSummaryDTO(start_date=start_date, end_date=end_date, **summarize(columns))
+
+    async def update_expense(self, user_id: int, expense_id: int, expense: ExpenseDTO) -> ExpenseDTO:
         """Update an existing expense for the user."""
-        expenses = self._read_expenses(user_id)
-        for idx, e in enumerate(expenses):
-            if e["id"] == expense_id:
-                expense.id = expense_id
-                try:
-                    expense_dict = expense.model_dump()
-                except AttributeError:
-                    expense_dict = expense.dict()
-                expenses[idx] = expense_dict
-                self._write_expenses(user_id, expenses)
-                return expense
-        raise HTTPException(status_code=404, detail="Expense not found")
-
-    def delete_expense(self, user_id: int, expense_id: int):
+        async with user_locks.lock(user_id):
+            existing = await self.expense_log.get(user_id, expense_id)
+            if existing is None:
+                raise HTTPException(status_code=404, detail="Expense not found")
+
+            expense.id = expense_id
+            try:
+                expense_dict = expense.model_dump(mode="json")
+            except AttributeError:
+                expense_dict = expense.dict()
+            aggregates = await self._load_aggregates(user_id)
+            table = await self.categories.ensure_categories(user_id, [expense_dict.get("category")])
+            expense_dict = with_category_id(expense_dict, table)
+            if not await self.expense_log.update(user_id, expense_dict):
+                raise HTTPException(status_code=500, detail="Could not save expense")
+            await self._adjust_aggregates(user_id, aggregates, removed=existing, added=expense_dict)
+
+        await self.queue_limit_check(user_id)
+        return expense
+
+    async def delete_expense(self, user_id: int, expense_id: int):
         """Delete an expense for the user."""
-        expenses = self._read_expenses(user_id)
-        new_expenses = [e for e in expenses if e["id"] != expense_id]
-        if len(new_expenses) == len(expenses):
-            raise HTTPException(status_code=404, detail="Expense not found")
-        self._write_expenses(user_id, new_expenses)
+        async with user_locks.lock(user_id):
+            existing = await self.expense_log.get(user_id, expense_id)
+            if existing is None:
+                raise HTTPException(status_code=404, detail="Expense not found")
+            aggregates = await self._load_aggregates(user_id)
+            if not await self.expense_log.delete(user_id, expense_id):
+                raise HTTPException(status_code=500, detail="Could not delete expense")
+            await self._adjust_aggregates(user_id, aggregates, removed=existing)
+
+    async def apply_batch(self, user_id: int, batch: ExpenseBatchDTO) -> ExpenseBatchResponseDTO:
+        """
+        Apply a list of create/update/delete operations in order with a single
+        log append and a single aggregates save, then queue one limit check.
+        Operations that fail validation are reported and skipped; the rest apply.
+        """
+        async with user_locks.lock(user_id):
+            stored = await self.expense_log.get_many(user_id, [
+                operation.id for operation in batch.operations
+                if operation.op != ExpenseBatchOp.CREATE and operation.id is not None
+            ])
+            aggregates = await self._load_aggregates(user_id)
+
+            creates = sum(
+                1 for operation in batch.operations
+                if operation.op == ExpenseBatchOp.CREATE and operation.expense is not None
+            )
+            next_id = await self.expense_log.reserve_ids(user_id, creates) if creates else None
+            table = await self.categories.ensure_categories(user_id, [
+                operation.expense.category for operation in batch.operations if operation.expense is not None
+            ])
+
+            # Expenses as seen by later operations in the batch: id -> row, or None once deleted
+            pending: dict[int, dict | None] = {}
+            records, results = [], []
+
+            def current(expense_id: int) -> dict | None:
+                return pending[expense_id] if expense_id in pending else stored.get(expense_id)
+
+            for index, operation in enumerate(batch.operations):
+                op = operation.op
+                if op != ExpenseBatchOp.DELETE and operation.expense is None:
+                    results.append(ExpenseBatchResultDTO(index=index, op=op, status=422, detail="Missing expense"))
+                    continue
+                if op == ExpenseBatchOp.CREATE:
+                    expense_id, next_id = next_id, next_id + 1
+                else:
+                    expense_id = operation.id
+                    existing = current(expense_id) if expense_id is not None else None
+                    if existing is None:
+                        results.append(ExpenseBatchResultDTO(
+                            index=index, op=op, status=404, id=expense_id, detail="Expense not found"
+                        ))
+                        continue
+
+                if op == ExpenseBatchOp.DELETE:
+                    records.append({"op": "delete", "id": expense_id})
+                    if aggregates is not None:
+                        aggregates.remove(existing)
+                    pending[expense_id] = None
+                    results.append(ExpenseBatchResultDTO(index=index, op=op, status=200, id=expense_id))
+                    continue
+
+                expense = operation.expense.model_copy(update={"id": expense_id})
+                expense_dict = with_category_id(expense.model_dump(mode="json"), table)
+                records.append({"op": "add" if op == ExpenseBatchOp.CREATE else "update", "expense": expense_dict})
+                if aggregates is not None:
+                    if op == ExpenseBatchOp.UPDATE:
+                        aggregates.remove(existing)
+                    aggregates.add(expense_dict)
+                pending[expense_id] = expense_dict
+                results.append(ExpenseBatchResultDTO(
+                    index=index, op=op, status=201 if op == ExpenseBatchOp.CREATE else 200,
+                    id=expense_id, expense=expense,
+                ))
+
+            if not records:
+                return ExpenseBatchResponseDTO(results=results)
+
+            if not await self.expense_log.append(user_id, records):
+                raise HTTPException(status_code=500, detail="Could not save expenses")
+            if aggregates is not None:
+                await self.aggregates.save(user_id, aggregates)
+
+        exceeded = []
+        if any(record["op"] != "delete" for record in records):
+            exceeded = await self.new_limit_breaches(user_id, aggregates)
+            await self.queue_limit_check(user_id)
+        return ExpenseBatchResponseDTO(results=results, limit_exceeded=bool(exceeded), details=exceeded)
+
+    async def check_limits(self, user_id: int) -> list[dict]:
+        """Evaluate the user's budget limits against current spending and notify about new breaches."""
+        async with user_locks.lock(user_id):
+            totals = await self._period_totals(user_id, await self._load_aggregates(user_id))
+            return await ExpenseLimitChecker(user_id).check_and_notify(*totals)
+
+    async def new_limit_breaches(self, user_id: int, aggregates: SpendingAggregates | None) -> list[dict]:
+        """
+        Breaches the next limit check will notify about, without writing; adds
+        and batches report them in their response and queue the check itself.
+        """
+        totals = await self._period_totals(user_id, aggregates)
+        return await ExpenseLimitChecker(user_id).new_breaches(*totals)
+
+    async def queue_limit_check(self, user_id: int):
+        """
+        Hand the limit check to the background queue, so the alert index and
+        notification writes stay off the request path. Without a running queue
+        the check runs inline.
+        """
+        if not await limit_check_queue.submit(user_id):
+            await self.check_limits(user_id)
+
+    async def _period_totals(
+        self, user_id: int, aggregates: SpendingAggregates | None
+    ) -> tuple[float, float, float]:
+        """Spending for today, this week and this month, from the aggregates or the database."""
+        today = datetime.date.today()
+        if aggregates is not None:
+            # Period totals come from the maintained aggregates, not a rescan
+            return aggregates.period_totals(today)
+
+        week_start = today - datetime.timedelta(days=today.weekday())
+        month_start = today.replace(day=1)
+        return (
+            await self.storage.sum_expenses(user_id, today, today),
+            await self.storage.sum_expenses(user_id, week_start, today),
+            await self.storage.sum_expenses(user_id, month_start, today),
+        )
+
+    async def _load_aggregates(self, user_id: int) -> SpendingAggregates | None:
+        """
+        Load the user's spending aggregates, or None when the storage computes
+        totals itself. Load before writing the change, so a first-time build
+        reflects the history the change is applied to.
+        """
+        if isinstance(self.storage, ExpenseQueryStorage):
+            return None
+        return await self.aggregates.load(user_id, self._read_expenses)
+
+    async def _adjust_aggregates(
+        self,
+        user_id: int,
+        aggregates: SpendingAggregates | None,
+        removed: dict | None = None,
+        added: dict | None = None,
+    ):
+        """Apply an expense change to the user's spending aggregates."""
+        if aggregates is None:
+            return
+        if removed is not None:
+            aggregates.remove(removed)
+        if added is not None:
+            aggregates.add(added)
+        await self.aggregates.save(user_id, aggregates)
@@ -0,0 +1,130 @@
+import datetime
+from typing import Iterable
+
+import numpy as np
+
+from app.services.category_table import category_name
+
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+
+class ExpenseColumns:
+    """
+    Columnar copy of a user's expenses for vectorized aggregation: day numbers
+    (days since 1970-01-01), float amounts and integer category codes that
+    index into `categories`. Rows without a parseable date are left out.
+    """
+
+    def __init__(self, days: np.ndarray, amounts: np.ndarray, category_codes: np.ndarray, categories: list):
+        self.days = days
+        self.amounts = amounts
+        self.category_codes = category_codes
+        self.categories = categories
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    @classmethod
+    def build(cls, expenses: Iterable[dict], names: dict | None = None) -> "ExpenseColumns":
+        """`names` resolves category ids; expenses are grouped under the resolved name."""
+        names = names or {}
+        codes: dict = {}
+        days, amounts, category_codes = [], [], []
+        for expense in expenses:
+            if expense is None:
+                continue
+            day = expense.get("date")
+            try:
+                ordinal = (day if isinstance(day, datetime.date) else datetime.date.fromisoformat(day)).toordinal()
+            except (TypeError, ValueError):
+                continue
+            days.append(ordinal - _EPOCH_ORDINAL)
+            amounts.append(float(expense.get("amount") or 0))
+            category_codes.append(codes.setdefault(category_name(expense, names), len(codes)))
+
+        return cls(
+            np.fromiter(days, dtype=np.int64, count=len(days)),
+            np.fromiter(amounts, dtype=np.float64, count=len(amounts)),
+            np.fromiter(category_codes, dtype=np.int32, count=len(category_codes)),
+            list(codes),
+        )
+
+    def between(self, start_date: datetime.date | None, end_date: datetime.date | None) -> "ExpenseColumns":
+        if start_date is None and end_date is None:
+            return self
+        mask = np.ones(len(self), dtype=bool)
+        if start_date is not None:
+            mask &= self.days >= start_date.toordinal() - _EPOCH_ORDINAL
+        if end_date is not None:
+            mask &= self.days <= end_date.toordinal() - _EPOCH_ORDINAL
+        return ExpenseColumns(self.days[mask], self.amounts[mask], self.category_codes[mask], self.categories)
+
+
+def _stats(total: float, count: int, minimum: float, maximum: float) -> dict:
+    return {
+        "total": round(float(total), 2),
+        "count": int(count),
+        "min": float(minimum),
+        "max": float(maximum),
+        "average": round(float(total) / count, 2) if count else 0.0,
+    }
+
+
+def _group(keys: np.ndarray, amounts: np.ndarray) -> tuple[np.ndarray, list[dict]]:
+    """Sum, count, min, max and average of `amounts` for each distinct key, in key order."""
+    if not len(keys):
+        return keys, []
+    # Keys are small dense integers (codes, day or month numbers), so bucket
+    # directly by offset instead of sorting: every pass below is O(n)
+    base = keys.min()
+    offsets = keys - base
+    size = int(offsets.max()) + 1
+    counts = np.bincount(offsets, minlength=size)
+    totals = np.bincount(offsets, weights=amounts, minlength=size)
+    minimums = np.full(size, np.inf)
+    maximums = np.full(size, -np.inf)
+    np.minimum.at(minimums, offsets, amounts)
+    np.maximum.at(maximums, offsets, amounts)
+
+    present = np.flatnonzero(counts)
+    return present + base, [
+        _stats(total, count, minimum, maximum)
+        for total, count, minimum, maximum in zip(
+            totals[present], counts[present], minimums[present], maximums[present]
+        )
+    ]
+
+
+def summarize(columns: ExpenseColumns) -> dict:
+    """Grouped spending statistics by category, day, ISO week and month."""
+    days, amounts = columns.days, columns.amounts
+    if not len(amounts):
+        return {
+            "overall": _stats(0.0, 0, 0.0, 0.0),
+            "by_category": [], "by_day": [], "by_week": [], "by_month": [],
+        }
+
+    dates = days.astype("datetime64[D]")
+    # 1970-01-01 was a Thursday: shifting by 3 puts every Monday on a multiple of 7
+    mondays = days - (days + 3) % 7
+    months = dates.astype("datetime64[M]")
+
+    codes, by_category = _group(columns.category_codes, amounts)
+    day_keys, by_day = _group(days, amounts)
+    week_keys, by_week = _group(mondays, amounts)
+    month_keys, by_month = _group(months.astype(np.int64), amounts)
+
+    def labelled(labels, stats):
+        return [{"key": label, **row} for label, row in zip(labels, stats)]
+
+    def week_label(monday: int) -> str:
+        year, week, _ = datetime.date.fromordinal(int(monday) + _EPOCH_ORDINAL).isocalendar()
+        return f"{year}-W{week:02d}"
+
+    return {
+        "overall": _stats(amounts.sum(), len(amounts), amounts.min(), amounts.max()),
+        "by_category": labelled([columns.categories[code] for code in codes], by_category),
+        "by_day": labelled([str(day) for day in day_keys.astype("datetime64[D]")], by_day),
+        "by_week": labelled([week_label(monday) for monday in week_keys], by_week),
+        "by_month": labelled([str(month) for month in month_keys.astype("datetime64[M]")], by_month),
+    }
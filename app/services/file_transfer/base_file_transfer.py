@@ -1,6 +1,10 @@
 from abc import ABC, abstractmethod
+from datetime import date
 
 from fastapi import UploadFile
+from app.services.category_service import CategoryService
+from app.services.spending_aggregates import SpendingAggregatesStore
+from app.services.storage.expense_log import ExpenseLog
 from app.services.storage.storage_factory import storage_factory
 from  fastapi.responses import StreamingResponse
 
@@ -8,17 +12,22 @@ from  fastapi.responses import StreamingResponse
 class BaseFileTransfer(ABC):
     def __init__(self):
         self.storage = storage_factory()
+        self.expense_log = ExpenseLog(self.storage)
+        self.aggregates = SpendingAggregatesStore(self.storage)
+        self.categories = CategoryService()
 
     @abstractmethod
-    def export_file(self, user_id: int) -> StreamingResponse:
+    async def export_file(
+        self, user_id: int, start_date: date | None = None, end_date: date | None = None
+    ) -> StreamingResponse:
         """
-        Export a file for the given user.
+        Export a file for the given user, optionally limited to a date range.
         Returns the path or storage key of the exported file.
         """
         pass
 
     @abstractmethod
-    def import_file(self, user_id: int, file: UploadFile) -> None:
+    async def import_file(self, user_id: int, file: UploadFile) -> None:
         """
         Import a file for the given user.
         'file' can be raw file bytes, text, or structured data.
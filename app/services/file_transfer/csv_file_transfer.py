@@ -1,19 +1,34 @@
 import csv
-from datetime import datetime
+from datetime import date, datetime
 import io
 from typing import List, Dict, Any
 
 from fastapi import UploadFile, HTTPException
 from fastapi.responses import StreamingResponse
 
+from app.dto.expense_dto import ExpenseQueryDTO
+from app.services.category_table import category_name, with_category_id
+from app.services.expense_service import ExpenseService
+from app.services.expense_query import matches
 from app.services.file_transfer.base_file_transfer import BaseFileTransfer
+from app.services.storage.storage_base import ExpenseQueryStorage
+from app.services.storage.user_locks import user_locks
 
 class CsvFileTransfer(BaseFileTransfer):
     
-    def export_file(self, user_id: int) -> StreamingResponse:
+    async def export_file(
+        self, user_id: int, start_date: date | None = None, end_date: date | None = None
+    ) -> StreamingResponse:
     
-        # Load json data from configured file storage
-        expenses_data: list[dict] = self.storage.load_file(user_id, 'expenses.json')
+        # Load json data from configured file storage: a date range reads only the
+        # overlapping month partitions, a full export streams them one at a time
+        names = (await self.categories.table(user_id)).names
+        if start_date is not None or end_date is not None:
+            query = ExpenseQueryDTO(start_date=start_date, end_date=end_date)
+            rows = await self.expense_log.load_range(user_id, start_date, end_date)
+            expenses_data: list[dict] = [expense for expense in rows if matches(expense, query, names)]
+        else:
+            expenses_data = [expense async for expense in self.expense_log.stream(user_id)]
         if not expenses_data:
             raise ValueError('No data found for export')
         
@@ -40,6 +55,8 @@ class CsvFileTransfer(BaseFileTransfer):
                             row[field] = date_value  # Keep as-is if format is unknown
                     except ValueError:
                         row[field] = date_value  # Keep original if parsing fails
+                elif field == 'category':
+                    row[field] = category_name(expense, names)
                 else:
                     row[field] = expense.get(field, '')
             filtered_data.append(row)
@@ -76,7 +93,7 @@ class CsvFileTransfer(BaseFileTransfer):
         )
             
 
-    def import_file(self, user_id: int, file: UploadFile) -> None:
+    async def import_file(self, user_id: int, file: UploadFile) -> None:
         """
         Import CSV file and save expenses data to storage.
         
@@ -88,162 +105,170 @@ class CsvFileTransfer(BaseFileTransfer):
             HTTPException: If file processing fails
             ValueError: If data validation fails
         """
-        try:
-            # Validate file type
-            if not file.filename or not file.filename.lower().endswith('.csv'):
-                raise HTTPException(status_code=400, detail="File must be a CSV file")
+        async with user_locks.lock(user_id):
+            try:
+                # Validate file type
+                if not file.filename or not file.filename.lower().endswith('.csv'):
+                    raise HTTPException(status_code=400, detail="File must be a CSV file")
             
-            # Read file content
-            contents = file.file.read()
+                # Read file content
+                contents = await file.read()
             
-            # Decode bytes to string
-            try:
-                csv_content = contents.decode('utf-8')
-            except UnicodeDecodeError:
-                # Try with different encoding if UTF-8 fails
+                # Decode bytes to string
                 try:
-                    csv_content = contents.decode('latin-1')
+                    csv_content = contents.decode('utf-8')
                 except UnicodeDecodeError:
-                    raise HTTPException(status_code=400, detail="Unable to decode file. Please ensure it's a valid CSV file.")
+                    # Try with different encoding if UTF-8 fails
+                    try:
+                        csv_content = contents.decode('latin-1')
+                    except UnicodeDecodeError:
+                        raise HTTPException(status_code=400, detail="Unable to decode file. Please ensure it's a valid CSV file.")
             
-            # Create StringIO object from content
-            csv_file = io.StringIO(csv_content)
+                # Create StringIO object from content
+                csv_file = io.StringIO(csv_content)
             
-            # Read CSV data
-            csv_reader = csv.DictReader(csv_file)
+                # Read CSV data
+                csv_reader = csv.DictReader(csv_file)
             
-            # Validate that required columns exist
-            required_fields = ['description', 'category', 'amount', 'date']
-            if not csv_reader.fieldnames:
-                raise HTTPException(status_code=400, detail="CSV file appears to be empty or invalid")
+                # Validate that required columns exist
+                required_fields = ['description', 'category', 'amount', 'date']
+                if not csv_reader.fieldnames:
+                    raise HTTPException(status_code=400, detail="CSV file appears to be empty or invalid")
             
-            # Check if all required fields are present (case-insensitive)
-            fieldnames_lower = [field.lower().strip() for field in csv_reader.fieldnames]
+                # Check if all required fields are present (case-insensitive)
+                fieldnames_lower = [field.lower().strip() for field in csv_reader.fieldnames]
 
-            missing_fields = []
+                missing_fields = []
             
-            for required_field in required_fields:
-                if required_field.lower() not in fieldnames_lower:
-                    missing_fields.append(required_field)
+                for required_field in required_fields:
+                    if required_field.lower() not in fieldnames_lower:
+                        missing_fields.append(required_field)
             
-            if missing_fields:
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Missing required columns: {', '.join(missing_fields)}. Required columns are: {', '.join(required_fields)}"
-                )
+                if missing_fields:
+                    raise HTTPException(
+                        status_code=400, 
+                        detail=f"Missing required columns: {', '.join(missing_fields)}. Required columns are: {', '.join(required_fields)}"
+                    )
             
-            # Create field mapping for case-insensitive matching
-            field_mapping = {}
-            for required_field in required_fields:
-                for original_field in csv_reader.fieldnames:
-                    if original_field.lower().strip() == required_field.lower():
-                        field_mapping[required_field] = original_field
-                        break
+                # Create field mapping for case-insensitive matching
+                field_mapping = {}
+                for required_field in required_fields:
+                    for original_field in csv_reader.fieldnames:
+                        if original_field.lower().strip() == required_field.lower():
+                            field_mapping[required_field] = original_field
+                            break
             
-            # existing data length for id reference
-            existing_data_length = len(self.storage.load_file(user_id, 'expenses.json'))
+                # Parse CSV rows into list of dictionaries
+                expenses_data: List[Dict[str, Any]] = []
+                row_number = 1  # Start from 1 since header is row 0
 
-            # Parse CSV rows into list of dictionaries
-            expenses_data: List[Dict[str, Any]] = []
-            row_number = 1  # Start from 1 since header is row 0
-            next_id = existing_data_length + 1  # Start ID from next available number
-
-            for row in csv_reader:
-                row_number += 1
+                for row in csv_reader:
+                    row_number += 1
                 
-                try:
-                    # Create expense dictionary with normalized field names
-                    expense = {}
+                    try:
+                        # Create expense dictionary with normalized field names
+                        expense = {}
                     
-                    # Assign ID first, outside the field loop
-                    expense['id'] = next_id
-                    next_id += 1  # Increment for next record
+                        # Keep ID as the first key; the block is reserved once every row parsed
+                        expense['id'] = None
                     
 
-                    for required_field in required_fields:
-                        original_field = field_mapping[required_field]
-                        value = row.get(original_field, '').strip()
+                        for required_field in required_fields:
+                            original_field = field_mapping[required_field]
+                            value = row.get(original_field, '').strip()
                         
-                        # Validate and process each field
-                        if required_field == 'amount':
-                            if not value:
-                                raise ValueError(f"Amount is required in row {row_number}")
-                            try:
-                                # Remove any currency symbols and convert to float
-                                cleaned_amount = value.replace('₱', '').replace(',', '').strip()
-                                expense[required_field] = float(cleaned_amount)
-                            except ValueError:
-                                raise ValueError(f"Invalid amount format '{value}' in row {row_number}")
+                            # Validate and process each field
+                            if required_field == 'amount':
+                                if not value:
+                                    raise ValueError(f"Amount is required in row {row_number}")
+                                try:
+                                    # Remove any currency symbols and convert to float
+                                    cleaned_amount = value.replace('₱', '').replace(',', '').strip()
+                                    expense[required_field] = float(cleaned_amount)
+                                except ValueError:
+                                    raise ValueError(f"Invalid amount format '{value}' in row {row_number}")
                         
-                        elif required_field == 'date':
-                            if not value:
-                                raise ValueError(f"Date is required in row {row_number}")
-                            try:
-                                # Validate date format but keep original yyyy-mm-dd format
-                                datetime.strptime(value, "%Y-%m-%d")
-                                expense[required_field] = value  # Keep original format
-                            except ValueError:
-                                # If it's not in yyyy-mm-dd format, try other common formats and convert
+                            elif required_field == 'date':
+                                if not value:
+                                    raise ValueError(f"Date is required in row {row_number}")
                                 try:
-                                    # Try dd/mm/yyyy format
-                                    parsed_date = datetime.strptime(value, "%d/%m/%Y")
-                                    expense[required_field] = parsed_date.strftime("%Y-%m-%d")
+                                    # Validate date format but keep original yyyy-mm-dd format
+                                    datetime.strptime(value, "%Y-%m-%d")
+                                    expense[required_field] = value  # Keep original format
                                 except ValueError:
+                                    # If it's not in yyyy-mm-dd format, try other common formats and convert
                                     try:
-                                        # Try mm/dd/yyyy format
-                                        parsed_date = datetime.strptime(value, "%m/%d/%Y")
+                                        # Try dd/mm/yyyy format
+                                        parsed_date = datetime.strptime(value, "%d/%m/%Y")
                                         expense[required_field] = parsed_date.strftime("%Y-%m-%d")
                                     except ValueError:
-                                        raise ValueError(f"Invalid date format in row {row_number}: {value}. Expected format: YYYY-MM-DD")
+                                        try:
+                                            # Try mm/dd/yyyy format
+                                            parsed_date = datetime.strptime(value, "%m/%d/%Y")
+                                            expense[required_field] = parsed_date.strftime("%Y-%m-%d")
+                                        except ValueError:
+                                            raise ValueError(f"Invalid date format in row {row_number}: {value}. Expected format: YYYY-MM-DD")
                             
                         
-                        elif required_field in ['description', 'category']:
-                            if not value:
-                                raise ValueError(f"{required_field.capitalize()} is required in row {row_number}")
-                            expense[required_field] = value
+                            elif required_field in ['description', 'category']:
+                                if not value:
+                                    raise ValueError(f"{required_field.capitalize()} is required in row {row_number}")
+                                expense[required_field] = value
                         
-                        else:
-                            expense[required_field] = value
+                            else:
+                                expense[required_field] = value
                     
-                    # Add any additional fields that might be in the CSV
-                    for field_name, field_value in row.items():
-                        normalized_field = field_name.lower().strip()
-                        if normalized_field not in [f.lower() for f in required_fields]:
-                            # Add extra fields with original case
-                            expense[field_name] = field_value.strip() if field_value else ''
+                        # Add any additional fields that might be in the CSV
+                        for field_name, field_value in row.items():
+                            normalized_field = field_name.lower().strip()
+                            if normalized_field not in [f.lower() for f in required_fields]:
+                                # Add extra fields with original case
+                                expense[field_name] = field_value.strip() if field_value else ''
                     
-                    expenses_data.append(expense)
+                        expenses_data.append(expense)
                     
-                except ValueError as ve:
-                    raise HTTPException(status_code=400, detail=str(ve))
-                except Exception as e:
-                    raise HTTPException(status_code=400, detail=f"Error processing row {row_number}: {str(e)}")
+                    except ValueError as ve:
+                        raise HTTPException(status_code=400, detail=str(ve))
+                    except Exception as e:
+                        raise HTTPException(status_code=400, detail=f"Error processing row {row_number}: {str(e)}")
                     
 
-            # Check if we have any data
-            if not expenses_data:
-                raise HTTPException(status_code=400, detail="No valid data found in CSV file")
+                # Check if we have any data
+                if not expenses_data:
+                    raise HTTPException(status_code=400, detail="No valid data found in CSV file")
             
-            # Load existing expenses data if any
-            try:
-                existing_data: List[Dict[str, Any]] = self.storage.load_file(user_id, 'expenses.json') or []
-            except:
-                existing_data = []
-            
-            # Combine existing data with new data
-            # You might want to add logic here to prevent duplicates or handle ID assignment
-            combined_data = existing_data + expenses_data
-            
-            # Save combined data to storage
-            self.storage.save_file(user_id, 'expenses.json', combined_data)
+                # Reserve one block of ids for the whole import
+                next_id = await self.expense_log.reserve_ids(user_id, len(expenses_data))
+                for expense in expenses_data:
+                    expense['id'] = next_id
+                    next_id += 1
+
+                # Store category ids; new names get hidden entries in one table write
+                table = await self.categories.ensure_categories(user_id, [e['category'] for e in expenses_data])
+                expenses_data = [with_category_id(expense, table) for expense in expenses_data]
+
+                # Load aggregates before the write so a first-time build does not count the import twice
+                aggregates = None
+                if not isinstance(self.storage, ExpenseQueryStorage):
+                    aggregates = await self.aggregates.load(user_id, self.expense_log.load)
+
+                # Append the imported rows to the expense log in a single write
+                await self.expense_log.add_many(user_id, expenses_data)
+
+                if aggregates is not None:
+                    for expense in expenses_data:
+                        aggregates.add(expense)
+                    await self.aggregates.save(user_id, aggregates)
             
-        except HTTPException:
-            # Re-raise HTTP exceptions as-is
-            raise
-        except Exception as e:
-            # Catch any other unexpected errors
-            raise HTTPException(status_code=500, detail=f"An error occurred while processing the file: {str(e)}")
-        finally:
-            # Ensure file is closed
-            if hasattr(file.file, 'close'):
-                file.file.close()
\ No newline at end of file
+            except HTTPException:
+                # Re-raise HTTP exceptions as-is
+                raise
+            except Exception as e:
+                # Catch any other unexpected errors
+                raise HTTPException(status_code=500, detail=f"An error occurred while processing the file: {str(e)}")
+            finally:
+                # Ensure file is closed
+                await file.close()
+
+        # Imports do not report breaches in their response; they arrive as notifications
+        await ExpenseService().queue_limit_check(user_id)
\ No newline at end of file
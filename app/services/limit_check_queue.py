@@ -0,0 +1,117 @@
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from app.core.config import settings
+from app.core.logger import logger
+
+
+class LimitCheckQueue:
+    """
+    In-process queue of "expenses changed" events for budget-limit checks.
+
+    Writes submit the user id and return; worker tasks evaluate the limits and
+    write notifications afterwards. A user already waiting in the queue is not
+    queued again, so a burst of writes costs one check. The queue is bounded:
+    once full, `submit` waits for room, which slows writers down instead of
+    letting the backlog grow. On shutdown the queued checks are drained.
+    """
+
+    def __init__(self, max_size: int, workers: int):
+        self.max_size = max_size
+        self.workers = workers
+        self._queue: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._pending: set[int] = set()
+        self._handler: Callable[[int], Awaitable] | None = None
+        self.submitted = 0
+        self.coalesced = 0
+        self.waited = 0
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self, handler: Callable[[int], Awaitable]):
+        """Start the worker tasks; `handler(user_id)` runs one user's check."""
+        if self.running or self.workers <= 0:
+            return
+        self._handler = handler
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._tasks = [asyncio.create_task(self._work(), name=f"limit-check-{n}") for n in range(self.workers)]
+        logger.info(f"Limit check queue started with {self.workers} workers (max size {self.max_size})")
+
+    async def submit(self, user_id: int) -> bool:
+        """
+        Queue a limit check for the user. Returns False if the queue is not
+        running (e.g. outside the app lifespan), in which case the caller
+        checks inline.
+        """
+        if not self.running:
+            return False
+        self.submitted += 1
+        if user_id in self._pending:
+            self.coalesced += 1
+            return True
+        self._pending.add(user_id)
+        if self._queue.full():
+            self.waited += 1
+        await self._queue.put(user_id)
+        return True
+
+    async def _work(self):
+        while True:
+            user_id = await self._queue.get()
+            # Later writes queue a new check, which then sees their totals too
+            self._pending.discard(user_id)
+            started = time.perf_counter()
+            try:
+                await self._handler(user_id)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Limit check failed for user {user_id}: {e}")
+            finally:
+                self.busy_seconds += time.perf_counter() - started
+                self._queue.task_done()
+
+    async def join(self):
+        """Wait until every check queued so far has run."""
+        if self.running:
+            await self._queue.join()
+
+    async def stop(self, timeout: float):
+        """Let queued checks finish (up to `timeout` seconds), then stop the workers."""
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropping {self._queue.qsize()} queued limit checks after {timeout}s drain timeout")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._pending.clear()
+
+    def stats(self) -> dict:
+        return {
+            "depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_size": self.max_size,
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "waited_for_room": self.waited,
+            "processed": self.processed,
+            "failed": self.failed,
+            "busy_seconds": round(self.busy_seconds, 3),
+        }
+
+
+limit_check_queue = LimitCheckQueue(settings.LIMIT_CHECK_QUEUE_MAX_SIZE, settings.LIMIT_CHECK_WORKERS)
+
+
+def log_limit_queue_stats():
+    logger.info(f"Limit check queue stats: {limit_check_queue.stats()}")
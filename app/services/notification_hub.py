@@ -0,0 +1,76 @@
+import asyncio
+from contextlib import contextmanager
+
+from app.core.config import settings
+from app.core.logger import logger
+
+
+class Subscription:
+    """
+    One stream's view of a user's new notifications. The buffer is bounded: a
+    subscriber that falls `buffer_size` notifications behind stops receiving
+    them and is flagged `overflowed`, so it catches up from storage instead.
+    """
+
+    def __init__(self, buffer_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(buffer_size, 1))
+        self.overflowed = False
+
+
+class NotificationHub:
+    """
+    In-process publish/subscribe of new notifications, per user. Only
+    notifications created in this process are published; streams pick up the
+    rest (other workers, the limit sweep) from storage.
+    """
+
+    def __init__(self, buffer_size: int):
+        self.buffer_size = buffer_size
+        self._subscribers: dict[int, set[Subscription]] = {}
+        self.published = 0
+        self.delivered = 0
+        self.overflows = 0
+
+    @contextmanager
+    def subscribe(self, user_id: int):
+        """Receive the user's new notifications while the block runs."""
+        subscription = Subscription(self.buffer_size)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def publish(self, user_id: int, notifications: list[dict]):
+        """Hand new notifications to the user's open streams without waiting on any of them."""
+        self.published += len(notifications)
+        for subscription in self._subscribers.get(user_id, ()):
+            for notification in notifications:
+                if subscription.overflowed:
+                    break
+                try:
+                    subscription.queue.put_nowait(notification)
+                    self.delivered += 1
+                except asyncio.QueueFull:
+                    subscription.overflowed = True
+                    self.overflows += 1
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._subscribers),
+            "connections": sum(len(subscribers) for subscribers in self._subscribers.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "overflows": self.overflows,
+        }
+
+
+notification_hub = NotificationHub(settings.NOTIFICATION_STREAM_BUFFER_SIZE)
+
+
+def log_notification_hub_stats():
+    logger.info(f"Notification hub stats: {notification_hub.stats()}")
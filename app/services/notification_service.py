@@ -1,34 +1,361 @@
+import asyncio
 import json
-from typing import List, Optional
-from app.utils.file_manager import initialize_user_notifcations_file
-from datetime import datetime
+import time
+from typing import AsyncIterator, List, Optional
+from datetime import datetime, timedelta, timezone
+from app.core.config import settings
+from app.core.logger import logger
+from app.services.notification_hub import notification_hub
+from app.services.storage.storage_base import NotificationQueryStorage
 from app.services.storage.storage_factory import storage_factory
+from app.services.storage.user_locks import user_locks
+from app.utils.etag import make_etag
+
+NOTIFICATIONS_FILE = 'notifications.json'
+# Counters and read state, stored as [{"unread": N, "next_seq": M, "read_seq": W, "read": [...]}].
+# Every notification with seq <= read_seq is read, plus the few listed in "read".
+STATE_FILE = 'notification_state.json'
+
+# Notifications read per page when a stream catches up from storage
+REPLAY_PAGE_SIZE = 50
+# Reconnect delay suggested to EventSource clients, in milliseconds
+STREAM_RETRY_MS = 5000
+
+
+def _with_seq(notifications: list) -> list:
+    """Notifications stored before sequence numbers count from their (1-based) position."""
+    if all('seq' in n for n in notifications):
+        return notifications
+    return [n if 'seq' in n else {**n, 'seq': position} for position, n in enumerate(notifications, start=1)]
+
+
+def is_read(notification: dict, state: dict) -> bool:
+    return notification['seq'] <= state['read_seq'] or notification['seq'] in state['read']
+
+
+def read_state(notifications: list) -> dict:
+    """
+    Counters and read watermark for notifications that still carry per-row
+    is_read flags: the watermark is the end of the leading run of read ones,
+    and read notifications after it are kept as exceptions.
+    """
+    watermark = 0
+    for n in notifications:
+        if not n.get('is_read', False):
+            break
+        watermark = n['seq']
+    return {
+        'unread': sum(1 for n in notifications if not n.get('is_read', False)),
+        'next_seq': max((n['seq'] for n in notifications), default=0) + 1,
+        'read_seq': watermark,
+        'read': [n['seq'] for n in notifications if n.get('is_read', False) and n['seq'] > watermark],
+    }
+
+
+def _created_at(notification: dict) -> datetime | None:
+    """Notification ids start with their UTC creation time."""
+    try:
+        return datetime.strptime(str(notification.get('id', ''))[:20], '%Y%m%d%H%M%S%f')
+    except ValueError:
+        return None
+
+
+def _document_size(notifications: list) -> int:
+    """Bytes the document takes in storage, serialized the way the backends write it."""
+    return len(json.dumps(notifications, indent=2).encode('utf-8'))
+
+
+def retained(notifications: list, state: dict, now: datetime) -> list:
+    """
+    The notifications (oldest first) kept by the retention policy: those older
+    than NOTIFICATION_MAX_AGE_DAYS or beyond the newest NOTIFICATION_MAX_COUNT
+    go, except unread ones while NOTIFICATION_KEEP_UNREAD is set and the latest
+    one of each title, which the alert dedupe may be derived from.
+    """
+    max_age, max_count = settings.NOTIFICATION_MAX_AGE_DAYS, settings.NOTIFICATION_MAX_COUNT
+    if max_age <= 0 and max_count <= 0:
+        return notifications
+
+    cutoff = now - timedelta(days=max_age) if max_age > 0 else None
+    latest = {n.get('title'): n['seq'] for n in notifications}
+    kept = []
+    for position, n in enumerate(notifications):
+        newer = len(notifications) - position - 1
+        created = _created_at(n)
+        expired = (max_count > 0 and newer >= max_count) or (
+            cutoff is not None and created is not None and created < cutoff
+        )
+        if not expired or latest[n.get('title')] == n['seq'] or (
+            settings.NOTIFICATION_KEEP_UNREAD and not is_read(n, state)
+        ):
+            kept.append(n)
+    return kept
+
+
+def _trim(notifications: list, state: dict, now: datetime) -> tuple[list, dict]:
+    """Apply the retention policy, returning the kept notifications and the adjusted state."""
+    kept = retained(notifications, state, now)
+    if len(kept) == len(notifications):
+        return notifications, state
+    kept_seqs = {n['seq'] for n in kept}
+    removed_unread = sum(1 for n in notifications if n['seq'] not in kept_seqs and not is_read(n, state))
+    return kept, {
+        **state,
+        'unread': max(state['unread'] - removed_unread, 0),
+        'read': [seq for seq in state['read'] if seq in kept_seqs],
+    }
+
 
 class NotificationService:
     def __init__(self):
         self.storage = storage_factory()
 
-    def _read_notifications(self, user_id: int) -> list:
-        """Read notifications for a user from the configured storage."""
-        notifications = storage_factory().load_file(user_id, 'notifications.json')
-        return notifications if isinstance(notifications, list) else [notifications]
-    
-    def _write_notifications(self, user_id: int, data: list):
+    async def _read_notifications(self, user_id: int) -> list:
+        """Read notifications for a user from the configured storage, oldest first."""
+        notifications = await self.storage.load_file(user_id, NOTIFICATIONS_FILE)
+        return _with_seq(notifications if isinstance(notifications, list) else [notifications])
+
+    async def _write_notifications(self, user_id: int, data: list):
         """Save notification into notifications file"""
-        return self.storage.save_file(user_id, 'notifications.json', data)
+        return await self.storage.save_file(user_id, NOTIFICATIONS_FILE, data)
 
-    def get_notifications(self, user_id: int) -> list:
-        notifications = self._read_notifications(user_id)
+    async def _load_state(self, user_id: int) -> dict:
+        """The user's notification counters and read watermark, migrating older files the first time."""
+        documents = await self.storage.load_file(user_id, STATE_FILE)
+        if documents and 'read_seq' in documents[0]:
+            return documents[0]
+        if not documents and not await self._read_notifications(user_id):
+            # Nothing to migrate: the first notification stores the state, reads never write it
+            return read_state([])
+
+        async with user_locks.lock(user_id):
+            documents = await self.storage.load_file(user_id, STATE_FILE)
+            if documents and 'read_seq' in documents[0]:
+                return documents[0]
+            # Move per-row read flags into the watermark, then drop them from the rows
+            notifications = await self._read_notifications(user_id)
+            state = read_state(notifications)
+            if notifications:
+                await self._write_notifications(user_id, [
+                    {key: value for key, value in n.items() if key not in ('is_read', 'read_at')}
+                    for n in notifications
+                ])
+            await self._save_state(user_id, state)
+            return state
+
+    async def _save_state(self, user_id: int, state: dict):
+        return await self.storage.save_file(user_id, STATE_FILE, [state])
+
+    def etag(self, user_id: int, *query) -> str | None:
+        return make_etag(
+            self.storage.document_version(user_id, NOTIFICATIONS_FILE),
+            self.storage.document_version(user_id, STATE_FILE),
+            *query,
+        )
+
+    def unread_etag(self, user_id: int) -> str | None:
+        return make_etag(self.storage.document_version(user_id, STATE_FILE))
+
+    async def get_notifications(self, user_id: int) -> list:
+        notifications, _ = await self.list_notifications(user_id)
         return notifications
-    
-    def mark_all_as_read(self, user_id: int) -> int:
-        notifications = self._read_notifications(user_id)
-        count = 0
-        for n in notifications:
-            if not n.get('is_read', False):
-                n['is_read'] = True
-                n['read_at'] = datetime.utcnow().isoformat() + 'Z'
-                count += 1
-
-        self.storage.save_file(user_id, 'notifications', notifications)
-        return count
+
+    async def list_notifications(
+        self, user_id: int, limit: Optional[int] = None, cursor: Optional[int] = None
+    ) -> tuple[List[dict], Optional[int]]:
+        """
+        Notifications newest first, `limit` at a time. `cursor` is the seq to
+        continue below; returns (page, next cursor).
+        """
+        fetch = limit + 1 if limit is not None else None
+        if isinstance(self.storage, NotificationQueryStorage):
+            page = await self.storage.query_notifications(user_id, before=cursor, limit=fetch)
+        else:
+            state = await self._load_state(user_id)
+            page = []
+            for notification in reversed(await self._read_notifications(user_id)):
+                if cursor is not None and notification['seq'] >= cursor:
+                    continue
+                # Read state is derived for the returned page only
+                page.append({**notification, 'is_read': is_read(notification, state)})
+                if fetch is not None and len(page) == fetch:
+                    break
+
+        if limit is None or len(page) <= limit:
+            return page, None
+        page = page[:limit]
+        return page, page[-1]['seq']
+
+    async def unread_count(self, user_id: int) -> int:
+        """Unread notifications, from the maintained counter rather than the history."""
+        if isinstance(self.storage, NotificationQueryStorage):
+            return await self.storage.count_unread(user_id)
+        return (await self._load_state(user_id))['unread']
+
+    async def notifications_after(self, user_id: int, seq: int) -> list[dict]:
+        """Notifications with a seq above `seq`, oldest first, read newest first a page at a time."""
+        missed, cursor = [], None
+        while True:
+            page, cursor = await self.list_notifications(user_id, REPLAY_PAGE_SIZE, cursor)
+            missed.extend(n for n in page if n['seq'] > seq)
+            if cursor is None or cursor <= seq + 1:
+                return missed[::-1]
+
+    async def stream_events(self, user_id: int, last_event_id: Optional[int] = None) -> AsyncIterator[str]:
+        """
+        Server-Sent Events of the user's new notifications, with the seq as the
+        event id. Resuming from `last_event_id` replays what was missed first.
+        Notifications published in this process arrive through the hub. Storage
+        is re-read after the connection's buffer overflowed, and on a heartbeat
+        when the document version changed; backends without versions are only
+        re-read every NOTIFICATION_STREAM_CATCHUP_SECONDS, so idle streams do
+        not each hit storage per heartbeat.
+        """
+        with notification_hub.subscribe(user_id) as subscription:
+            # Subscribed before reading storage, so nothing falls between the two
+            yield f"retry: {STREAM_RETRY_MS}\n\n"
+            version = self.storage.document_version(user_id, NOTIFICATIONS_FILE)
+            read_at = time.monotonic()
+            if last_event_id is None:
+                newest, _ = await self.list_notifications(user_id, 1)
+                # Published since subscribing: new to this client even if the read above saw them
+                missed = []
+                while not subscription.queue.empty():
+                    missed.append(subscription.queue.get_nowait())
+                last_seq = min([newest[0]['seq'] if newest else 0, *(n['seq'] - 1 for n in missed)])
+            else:
+                last_seq = last_event_id
+                missed = await self.notifications_after(user_id, last_seq)
+
+            while True:
+                for notification in missed:
+                    if notification['seq'] > last_seq:
+                        last_seq = notification['seq']
+                        yield f"id: {last_seq}\nevent: notification\ndata: {json.dumps(notification)}\n\n"
+
+                try:
+                    missed = [await asyncio.wait_for(
+                        subscription.queue.get(), settings.NOTIFICATION_STREAM_HEARTBEAT_SECONDS
+                    )]
+                    if not subscription.overflowed:
+                        continue
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    current = self.storage.document_version(user_id, NOTIFICATIONS_FILE)
+                    if current is not None:
+                        stale = current != version
+                    else:
+                        interval = settings.NOTIFICATION_STREAM_CATCHUP_SECONDS
+                        stale = interval > 0 and time.monotonic() - read_at >= interval
+                    if not stale:
+                        missed = []
+                        continue
+                    version = current
+
+                # Dropped or foreign notifications are in storage; buffered ones are re-read there too
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                subscription.overflowed = False
+                read_at = time.monotonic()
+                missed = await self.notifications_after(user_id, last_seq)
+
+    async def add_notifications(self, user_id: int, items: list[dict]) -> list[dict]:
+        """
+        Append unread notifications (title, detail, date) in one write, bump the
+        counters and publish them to the user's open streams.
+        """
+        async with user_locks.lock(user_id):
+            stamp = datetime.utcnow().strftime('%Y%m%d%H%M%S%f')
+            if isinstance(self.storage, NotificationQueryStorage):
+                await self.storage.append_records(user_id, NOTIFICATIONS_FILE, [
+                    {'id': f"{stamp}_{offset}", **item, 'is_read': False}
+                    for offset, item in enumerate(items, start=1)
+                ])
+                # Read the rows back for the seqs the database assigned; the lock keeps them ours
+                added = (await self.storage.query_notifications(user_id, limit=len(items)))[::-1]
+                await self.compact(user_id)
+            else:
+                state = await self._load_state(user_id)
+                notifications = await self._read_notifications(user_id)
+                added = [
+                    {'id': f"{stamp}_{seq}", 'seq': seq, **item}
+                    for seq, item in enumerate(items, start=state['next_seq'])
+                ]
+                state = {**state, 'unread': state['unread'] + len(added), 'next_seq': state['next_seq'] + len(added)}
+                # The whole list is rewritten anyway, so retention is applied on the way
+                notifications, state = _trim(notifications + added, state, datetime.utcnow())
+                await self._write_notifications(user_id, notifications)
+                await self._save_state(user_id, state)
+                added = [{**n, 'is_read': False} for n in added]
+
+            notification_hub.publish(user_id, added)
+            return added
+
+    async def compact(self, user_id: int) -> dict:
+        """
+        Drop notifications outside the retention policy. Returns the number
+        removed and the bytes reclaimed (approximate on the database).
+        """
+        async with user_locks.lock(user_id):
+            if isinstance(self.storage, NotificationQueryStorage):
+                max_age = settings.NOTIFICATION_MAX_AGE_DAYS
+                removed, reclaimed = await self.storage.delete_notifications(
+                    user_id,
+                    older_than=datetime.now(timezone.utc) - timedelta(days=max_age) if max_age > 0 else None,
+                    keep_newest=settings.NOTIFICATION_MAX_COUNT or None,
+                    keep_unread=settings.NOTIFICATION_KEEP_UNREAD,
+                )
+            else:
+                state = await self._load_state(user_id)
+                notifications = await self._read_notifications(user_id)
+                kept, state = _trim(notifications, state, datetime.utcnow())
+                removed, reclaimed = len(notifications) - len(kept), 0
+                if removed:
+                    reclaimed = _document_size(notifications) - _document_size(kept)
+                    await self._write_notifications(user_id, kept)
+                    await self._save_state(user_id, state)
+
+        if removed:
+            logger.debug(f"Compacted notifications of user {user_id}: {removed} removed, {reclaimed} bytes reclaimed")
+        return {'removed': removed, 'bytes_reclaimed': reclaimed}
+
+    async def mark_all_as_read(self, user_id: int) -> int:
+        """Mark everything read by moving the watermark; the notifications themselves are not rewritten."""
+        async with user_locks.lock(user_id):
+            if isinstance(self.storage, NotificationQueryStorage):
+                return await self.storage.mark_read(user_id)
+
+            state = await self._load_state(user_id)
+            await self._save_state(user_id, {
+                **state,
+                'unread': 0,
+                'read_seq': state['next_seq'] - 1,
+                'read': [],
+                'read_at': datetime.utcnow().isoformat() + 'Z',
+            })
+            return state['unread']
+
+    async def mark_as_read(self, user_id: int, notification_id: str) -> bool:
+        """Mark one notification read. Returns False if the user has no such notification."""
+        async with user_locks.lock(user_id):
+            if isinstance(self.storage, NotificationQueryStorage):
+                return await self.storage.mark_read(user_id, notification_id) > 0
+
+            state = await self._load_state(user_id)
+            notification = next(
+                (n for n in await self._read_notifications(user_id) if n.get('id') == notification_id), None
+            )
+            if notification is None:
+                return False
+            if not is_read(notification, state):
+                # Exceptions that now continue the watermark are folded into it
+                watermark, read = state['read_seq'], sorted([*state['read'], notification['seq']])
+                while read and read[0] == watermark + 1:
+                    watermark = read.pop(0)
+                await self._save_state(user_id, {
+                    **state,
+                    'unread': max(state['unread'] - 1, 0),
+                    'read_seq': watermark,
+                    'read': read,
+                })
+            return True
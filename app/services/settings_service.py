@@ -1,26 +1,37 @@
 import json
 from app.utils.file_manager import initialize_user_settings_file
 from app.services.storage.storage_factory import storage_factory
+from app.utils.etag import make_etag
+
+# What a user has before saving any limits (0 disables a limit)
+DEFAULT_BUDGET_LIMITS = {'daily': 0, 'weekly': 0, 'monthly': 0}
+
 
 class SettingsService:
 
     def __init__(self):
         self.storage = storage_factory()
 
-    def _read_settings(self, user_id: int) -> list:
+    async def _read_settings(self, user_id: int) -> list:
         """Read settings for a user from the configured storage."""
-        settings = storage_factory().load_file(user_id, 'settings.json')
+        settings = await self.storage.load_file(user_id, 'settings.json')
         return settings if isinstance(settings, list) else [settings]
     
-    def _write_settings(self, user_id: int, data: list):
+    async def _write_settings(self, user_id: int, data: list):
         """Save setting into settings file"""
-        return self.storage.save_file(user_id, 'settings.json', data)
+        return await self.storage.save_file(user_id, 'settings.json', data)
+
 
+    def etag(self, user_id: int) -> str | None:
+        return make_etag(self.storage.document_version(user_id, 'settings.json'))
 
-    def get_user_settings(self, user_id: int) -> list:
-        settings = self._read_settings(user_id)
+    async def get_user_settings(self, user_id: int) -> dict:
+        """The stored settings, or the default limits until the user saves some."""
+        settings = await self._read_settings(user_id)
+        if not settings or not settings[0]:
+            return {'budgetLimits': dict(DEFAULT_BUDGET_LIMITS)}
         return settings[0]
     
-    def update_user_settings(self, user_id: int, updated_settings: dict) -> dict:
-        self.storage.save_file(user_id, 'settings.json', [updated_settings])
+    async def update_user_settings(self, user_id: int, updated_settings: dict) -> dict:
+        await self.storage.save_file(user_id, 'settings.json', [updated_settings])
         return updated_settings
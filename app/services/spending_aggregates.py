@@ -0,0 +1,136 @@
+import datetime
+from typing import Awaitable, Callable, List
+
+from app.services.storage.storage_base import FileStorage
+from app.core.logger import logger
+
+AGGREGATES_FILE = "aggregates.json"
+
+
+def _parse_date(value) -> datetime.date | None:
+    if isinstance(value, datetime.date):
+        return value
+    try:
+        return datetime.date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def week_key(day: datetime.date) -> str:
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def month_key(day: datetime.date) -> str:
+    return f"{day.year}-{day.month:02d}"
+
+
+class SpendingAggregates:
+    """
+    Per-user spending totals: daily buckets keyed by date ordinal, rolled up by
+    ISO week and by month. Buckets are adjusted as expenses are added, updated
+    or deleted, so period totals never require scanning the expense history.
+    """
+
+    def __init__(self, days: dict | None = None, weeks: dict | None = None, months: dict | None = None):
+        self.days: dict[int, float] = days or {}
+        self.weeks: dict[str, float] = weeks or {}
+        self.months: dict[str, float] = months or {}
+
+    @classmethod
+    def from_document(cls, document: dict) -> "SpendingAggregates":
+        return cls(
+            days={int(k): v for k, v in document.get("days", {}).items()},
+            weeks=dict(document.get("weeks", {})),
+            months=dict(document.get("months", {})),
+        )
+
+    def to_document(self) -> dict:
+        return {
+            "days": {str(k): v for k, v in self.days.items()},
+            "weeks": self.weeks,
+            "months": self.months,
+        }
+
+    @classmethod
+    def build(cls, expenses: List[dict]) -> "SpendingAggregates":
+        aggregates = cls()
+        for expense in expenses:
+            aggregates.add(expense)
+        return aggregates
+
+    def add(self, expense: dict, sign: int = 1):
+        day = _parse_date(expense.get("date"))
+        if day is None:
+            return
+        amount = sign * float(expense.get("amount", 0) or 0)
+        self._bump(self.days, day.toordinal(), amount)
+        self._bump(self.weeks, week_key(day), amount)
+        self._bump(self.months, month_key(day), amount)
+
+    def remove(self, expense: dict):
+        self.add(expense, sign=-1)
+
+    @staticmethod
+    def _bump(buckets: dict, key, amount: float):
+        # Round to keep float drift from accumulating over many add/remove cycles
+        total = round(buckets.get(key, 0.0) + amount, 6)
+        if abs(total) < 1e-9:
+            buckets.pop(key, None)
+        else:
+            buckets[key] = total
+
+    def day_total(self, day: datetime.date) -> float:
+        return self.days.get(day.toordinal(), 0.0)
+
+    def period_totals(self, today: datetime.date) -> tuple[float, float, float]:
+        """
+        Totals for today, the current week (Monday to today) and the current
+        month (1st to today). Future-dated expenses later in the week or month
+        are taken back out of the rollups, which costs at most a month of day lookups.
+        """
+        total_today = self.day_total(today)
+
+        week_end = today + datetime.timedelta(days=6 - today.weekday())
+        total_week = self.weeks.get(week_key(today), 0.0) - self._days_between(today, week_end)
+
+        next_month = (today.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+        month_end = next_month - datetime.timedelta(days=1)
+        total_month = self.months.get(month_key(today), 0.0) - self._days_between(today, month_end)
+
+        return total_today, total_week, total_month
+
+    def _days_between(self, after: datetime.date, until: datetime.date) -> float:
+        """Sum of day buckets in (after, until]."""
+        start = after.toordinal() + 1
+        return sum(self.days.get(ordinal, 0.0) for ordinal in range(start, until.toordinal() + 1))
+
+
+class SpendingAggregatesStore:
+    """Loads and saves a user's SpendingAggregates document through FileStorage."""
+
+    def __init__(self, storage: FileStorage):
+        self.storage = storage
+
+    async def load(
+        self,
+        user_id: int,
+        expenses_loader: Callable[[int], Awaitable[List[dict]]],
+    ) -> SpendingAggregates:
+        """Load the user's aggregates, building them from the expense history the first time."""
+        documents = await self.storage.load_file(user_id, AGGREGATES_FILE)
+        if documents:
+            return SpendingAggregates.from_document(documents[0])
+
+        aggregates = SpendingAggregates.build(await expenses_loader(user_id))
+        await self.save(user_id, aggregates)
+        logger.info(f"Built spending aggregates for user {user_id}")
+        return aggregates
+
+    async def save(self, user_id: int, aggregates: SpendingAggregates) -> bool:
+        return await self.storage.save_file(user_id, AGGREGATES_FILE, [aggregates.to_document()])
+
+    async def rebuild(self, user_id: int, expenses: List[dict]) -> SpendingAggregates:
+        aggregates = SpendingAggregates.build(expenses)
+        await self.save(user_id, aggregates)
+        return aggregates
@@ -0,0 +1,258 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import orjson
+
+from app.services.storage.storage_base import FileStorage
+from app.services.storage.user_locks import user_locks
+from app.core.config import settings
+from app.core.logger import logger
+
+
+@dataclass
+class _CacheEntry:
+    data: list
+    stamp: tuple[int, int, int] | None
+    size: int
+    loaded_at: float
+    # Content hash, computed on first request and valid for the entry's lifetime
+    version: str | None = None
+
+
+def _estimate_size(data: list) -> int:
+    """Approximate the serialized size of a document from a small sample of rows."""
+    if not data:
+        return 64
+    sample = data[:16]
+    sample_bytes = sum(len(json.dumps(row, default=str)) for row in sample)
+    return sample_bytes * len(data) // len(sample)
+
+
+class StorageCache:
+    """
+    Process-wide LRU of parsed documents keyed by (user_id, filename).
+
+    Entries are bounded by an approximate byte budget rather than a count, since
+    a single heavy user's expenses.json can outweigh hundreds of settings files.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[tuple[int, str], _CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.writes = 0
+
+    def get(self, key: tuple[int, str], stamp, check_stamp: bool) -> list | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if check_stamp:
+                    fresh = entry.stamp == stamp
+                else:
+                    fresh = self.ttl_seconds <= 0 or time.monotonic() - entry.loaded_at < self.ttl_seconds
+                if fresh:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return list(entry.data)
+            self.misses += 1
+            return None
+
+    def version(self, key: tuple[int, str]) -> str | None:
+        """Content hash of a cached document that is still within its TTL, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (self.ttl_seconds > 0 and time.monotonic() - entry.loaded_at >= self.ttl_seconds):
+                return None
+            if entry.version is None:
+                digest = hashlib.blake2b(orjson.dumps(entry.data, default=str), digest_size=12)
+                entry.version = digest.hexdigest()
+            return entry.version
+
+    def get_entry(self, key: tuple[int, str]) -> _CacheEntry | None:
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key: tuple[int, str], data: list, stamp, size: int | None = None):
+        if size is None:
+            size = stamp[1] if stamp else _estimate_size(data)
+
+        with self._lock:
+            self._discard(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = _CacheEntry(list(data), stamp, size, time.monotonic())
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.size
+                self.evictions += 1
+
+    def record_write(self):
+        with self._lock:
+            self.writes += 1
+
+    def invalidate(self, key: tuple[int, str]):
+        with self._lock:
+            self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def _discard(self, key: tuple[int, str]):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry.size
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "writes": self.writes,
+            }
+
+
+storage_cache = StorageCache(
+    max_bytes=settings.STORAGE_CACHE_MAX_BYTES,
+    ttl_seconds=settings.STORAGE_CACHE_TTL_SECONDS,
+)
+
+
+class CachedStorage(FileStorage):
+    """
+    Read-through / write-through wrapper around any FileStorage.
+
+    Backends that can stat cheaply (the file system) are revalidated on every
+    read by comparing (mtime_ns, size, inode), so writes from other workers are
+    picked up. Backends that cannot (Supabase) are trusted for `ttl_seconds` on plain
+    reads only: a read by a task holding the user's lock is the start of a
+    read-modify-write, so it always goes to the backend and refreshes the
+    entry. Otherwise another worker's write within the TTL would be lost.
+
+    Returned lists are fresh copies, but the row dicts inside them are shared
+    with the cache and must not be mutated in place.
+    """
+
+    def __init__(self, backend: FileStorage, cache: StorageCache = storage_cache):
+        self.backend = backend
+        self.cache = cache
+
+    @property
+    def supports_stat(self) -> bool:
+        return self.backend.supports_stat
+
+    def get_file_stat(self, user_id: int, filename: str) -> tuple[int, int, int] | None:
+        return self.backend.get_file_stat(user_id, filename)
+
+    def document_version(self, user_id: int, filename: str) -> str | None:
+        if self.backend.supports_stat:
+            return self.backend.document_version(user_id, filename)
+        # Without a stat, the cached copy is what a read would return anyway
+        return self.cache.version((user_id, filename))
+
+    async def list_user_ids(self) -> list[int]:
+        return await self.backend.list_user_ids()
+
+    async def close(self):
+        await self.backend.close()
+
+    def _cache_usable(self, user_id: int) -> bool:
+        """Whether a cached copy may answer a read: always when stamps can be checked, else outside writes."""
+        return self.backend.supports_stat or not user_locks.held(user_id)
+
+    async def load_file(self, user_id: int, filename: str) -> list:
+        key = (user_id, filename)
+        check_stamp = self.backend.supports_stat
+        stamp = self.backend.get_file_stat(user_id, filename) if check_stamp else None
+
+        if self._cache_usable(user_id):
+            cached = self.cache.get(key, stamp, check_stamp)
+            if cached is not None:
+                return cached
+
+        data = await self.backend.load_file(user_id, filename)
+        self.cache.put(key, data, stamp)
+        return data
+
+    async def iter_records(self, user_id: int, filename: str):
+        key = (user_id, filename)
+        check_stamp = self.backend.supports_stat
+        stamp = self.backend.get_file_stat(user_id, filename) if check_stamp else None
+
+        cached = self.cache.get(key, stamp, check_stamp) if self._cache_usable(user_id) else None
+        if cached is not None:
+            for record in cached:
+                yield record
+            return
+        # Streaming exists to avoid holding the document, so a miss is not cached
+        async for record in self.backend.iter_records(user_id, filename):
+            yield record
+
+    async def save_file(self, user_id: int, filename: str, data) -> bool:
+        key = (user_id, filename)
+        saved = await self.backend.save_file(user_id, filename, data)
+        if not saved:
+            self.cache.invalidate(key)
+            return saved
+
+        self.cache.record_write()
+        if isinstance(data, list):
+            document = data
+        else:
+            # Appended a single row: extend the cached copy if we have one and
+            # can tell nobody else wrote since (the backend appended to its own copy)
+            entry = self.cache.get_entry(key)
+            if entry is None or not self.backend.supports_stat:
+                self.cache.invalidate(key)
+                return saved
+            document = entry.data + [data]
+
+        stamp = self.backend.get_file_stat(user_id, filename) if self.backend.supports_stat else None
+        self.cache.put(key, document, stamp)
+        return saved
+
+    async def delete_file(self, user_id: int, filename: str) -> bool:
+        deleted = await self.backend.delete_file(user_id, filename)
+        self.cache.invalidate((user_id, filename))
+        if deleted:
+            self.cache.record_write()
+        return deleted
+
+    async def append_records(self, user_id: int, filename: str, records: list[dict]) -> bool:
+        key = (user_id, filename)
+        entry = self.cache.get_entry(key)
+        # Only extend the cached copy if nobody else can have appended since we loaded it
+        if entry is not None and (
+            not self.backend.supports_stat or entry.stamp != self.backend.get_file_stat(user_id, filename)
+        ):
+            entry = None
+        appended = await self.backend.append_records(user_id, filename, records)
+        if not appended or entry is None:
+            self.cache.invalidate(key)
+            return appended
+
+        self.cache.record_write()
+        stamp = self.backend.get_file_stat(user_id, filename) if self.backend.supports_stat else None
+        self.cache.put(key, entry.data + list(records), stamp)
+        return appended
+
+
+def log_cache_stats():
+    logger.info(f"Storage cache stats: {storage_cache.stats()}")
@@ -0,0 +1,592 @@
+import asyncio
+import datetime
+import time
+from collections import OrderedDict
+from typing import AsyncIterator
+
+from app.services.expense_search import ExpenseSearchIndex
+from app.services.storage.expense_partitions import (
+    MANIFEST_FILE,
+    archive_cutoff,
+    is_archive,
+    month_of,
+    overlapping,
+    partition_file,
+    partition_key,
+)
+from app.services.storage.storage_base import FileStorage, ExpenseQueryStorage
+from app.services.storage.user_locks import user_locks
+from app.core.config import settings
+from app.core.logger import logger
+
+# Single-file snapshot. Document backends split it into month partitions (see
+# expense_partitions) at the next compaction; until then an existing
+# data/user_<id>/expenses.json is read as the snapshot, and the database backend
+# keeps mapping this name onto its expenses table.
+SNAPSHOT_FILE = "expenses.json"
+LOG_FILE = "expenses.log.jsonl"
+# Next id to hand out, stored as [{"next_id": N}]. Ids are never reused after a delete.
+SEQUENCE_FILE = "expense_sequence.json"
+
+_pending_compactions: dict[int, asyncio.Task] = {}
+
+
+class ExpenseState:
+    """
+    Replayed view of one user's expenses with an id -> position index.
+
+    Rows keep their insertion order. Deletes leave a tombstone (None) so the
+    other positions stay valid; tombstones are swept once they make up half
+    the list. Applying a record is O(1).
+
+    Applying is idempotent: an `add` for an id that already exists replaces it,
+    so re-applying a log that was already folded into the snapshot is harmless.
+    """
+
+    def __init__(self, snapshot: list[dict]):
+        self.rows: list[dict | None] = list(snapshot)
+        self.positions: dict[int, list[int]] = {}
+        self.tombstones = 0
+        self.max_id = 0
+        self.next_id: int | None = None
+        self.log_length = 0
+        self.stamps: tuple | None = None
+        self.loaded_at = time.monotonic()
+        # Views computed from the rows (e.g. columnar arrays), dropped on every change
+        self.derived: dict = {}
+        # Built on the first search, then updated by every apply()
+        self.search_index: ExpenseSearchIndex | None = None
+        # Partition keys the snapshot was read from, and whether it still sits in SNAPSHOT_FILE
+        self.partitions: list[str] = []
+        self.unpartitioned = False
+        self._reindex()
+
+    def _reindex(self):
+        self.positions = {}
+        for idx, row in enumerate(self.rows):
+            self._track(row.get("id"), idx)
+
+    def _track(self, expense_id, idx: int):
+        # Older imports could produce duplicate ids, so one id may own several rows
+        self.positions.setdefault(expense_id, []).append(idx)
+        if isinstance(expense_id, int) and expense_id > self.max_id:
+            self.max_id = expense_id
+
+    def apply(self, record: dict):
+        self.derived.clear()
+        op = record.get("op")
+        if op in ("add", "update"):
+            expense = record["expense"]
+            existing = self.positions.get(expense.get("id"))
+            if existing:
+                self.rows[existing[0]] = expense
+            elif op == "add":
+                self.rows.append(expense)
+                self._track(expense.get("id"), len(self.rows) - 1)
+            else:
+                return
+            if self.search_index is not None:
+                self.search_index.add(expense)
+        elif op == "delete":
+            for idx in self.positions.pop(record.get("id"), []):
+                self.rows[idx] = None
+                self.tombstones += 1
+            if self.search_index is not None:
+                self.search_index.remove(record.get("id"))
+            if self.tombstones > 64 and self.tombstones * 2 > len(self.rows):
+                self.rows = [row for row in self.rows if row is not None]
+                self.tombstones = 0
+                self._reindex()
+        else:
+            logger.warning(f"Ignoring unknown expense log op: {op!r}")
+
+    def search(self, query: str, limit: int, names: dict) -> list[tuple[dict, float]]:
+        """
+        Best matching expenses for a free-text query, as (expense, score) pairs.
+        `names` is the category table; the index is rebuilt once it changes.
+        """
+        if self.search_index is None or self.search_index.names != names:
+            self.search_index = ExpenseSearchIndex.build(self.rows, names)
+        return [(self.get(expense_id), score) for expense_id, score in self.search_index.search(query, limit)]
+
+    def get(self, expense_id: int) -> dict | None:
+        positions = self.positions.get(expense_id)
+        return self.rows[positions[0]] if positions else None
+
+    def live_rows(self) -> list[dict]:
+        if not self.tombstones:
+            return list(self.rows)
+        return [row for row in self.rows if row is not None]
+
+
+def replay(snapshot: list[dict], records: list[dict]) -> list[dict]:
+    """Apply add/update/delete log records over a snapshot, preserving row order."""
+    state = ExpenseState(snapshot)
+    for record in records:
+        state.apply(record)
+    return state.live_rows()
+
+
+_SNAPSHOT_ROW = object()
+
+
+class _IdChange:
+    """
+    What the log does to one id, worked out both for the case where the id is
+    in the snapshot and the case where it is not, since a streamed snapshot
+    only reveals which applies when (or if) the row arrives. A `seq` of None
+    means the row keeps its snapshot position; otherwise it was appended.
+    """
+
+    def __init__(self, expense_id, origin=None):
+        self.id = expense_id
+        # Month the row was stored under before the log touched it (the first record's "from")
+        self.origin = origin
+        self.present_row, self.present_seq = _SNAPSHOT_ROW, None
+        self.absent_row, self.absent_seq = None, None
+        self.deleted = False
+
+
+class _LogOverlay:
+    """Per-id outcome of a list of log records, mirroring ExpenseState.apply."""
+
+    def __init__(self, records: list[dict]):
+        self.changes: dict = {}
+        for seq, record in enumerate(records):
+            op = record.get("op")
+            if op == "delete":
+                change = self._change(record.get("id"), record)
+                change.present_row = change.present_seq = None
+                change.absent_row = change.absent_seq = None
+                change.deleted = True
+            elif op in ("add", "update"):
+                expense = record["expense"]
+                change = self._change(expense.get("id"), record)
+                if change.present_row is not None:
+                    change.present_row = expense
+                elif op == "add":
+                    change.present_row, change.present_seq = expense, seq
+                if change.absent_row is not None:
+                    change.absent_row = expense
+                elif op == "add":
+                    change.absent_row, change.absent_seq = expense, seq
+
+    def _change(self, expense_id, record: dict) -> _IdChange:
+        change = self.changes.get(expense_id)
+        if change is None:
+            change = self.changes[expense_id] = _IdChange(expense_id, record.get("from"))
+        return change
+
+
+class _StateCache:
+    """Process-wide LRU of ExpenseState objects, bounded by number of users."""
+
+    def __init__(self, max_users: int):
+        self.max_users = max_users
+        self._states: OrderedDict[int, ExpenseState] = OrderedDict()
+
+    def get(self, user_id: int) -> ExpenseState | None:
+        state = self._states.get(user_id)
+        if state is not None:
+            self._states.move_to_end(user_id)
+        return state
+
+    def put(self, user_id: int, state: ExpenseState):
+        if self.max_users <= 0:
+            return
+        self._states[user_id] = state
+        self._states.move_to_end(user_id)
+        while len(self._states) > self.max_users:
+            self._states.popitem(last=False)
+
+    def discard(self, user_id: int):
+        self._states.pop(user_id, None)
+
+
+_states = _StateCache(settings.EXPENSE_INDEX_MAX_USERS)
+
+
+def _record_id(record: dict):
+    return record.get("id") if record.get("op") == "delete" else (record.get("expense") or {}).get("id")
+
+
+class ExpenseLog:
+    """
+    Append-only expense store: a JSON snapshot plus a JSON Lines log of
+    add/update/delete records. Writes append one line; reads replay the log over
+    the snapshot; the log is folded into a new snapshot in the background once
+    it grows past EXPENSE_LOG_COMPACT_THRESHOLD records.
+
+    On document backends the snapshot is partitioned by month, and months older
+    than EXPENSE_ARCHIVE_AFTER_MONTHS are rolled into gzipped yearly archives.
+    Log records note the month their row was stored under ("from"), so a
+    compaction rewrites only the partitions the log touched and a date-range
+    read loads only the partitions that overlap it.
+
+    The replayed result is kept per user as an indexed ExpenseState and updated
+    on every append, so lookups and id allocation never rescan the history.
+    States are revalidated against file stamps on backends that can stat. On
+    those that cannot they are trusted for STORAGE_CACHE_TTL_SECONDS by reads,
+    and replayed afresh for writes made under the user's lock. Databases keep
+    the expenses in a table, so their writes and keyed lookups go straight to
+    it and never replay the history.
+    """
+
+    def __init__(self, storage: FileStorage, compact_threshold: int | None = None):
+        self.storage = storage
+        self.compact_threshold = (
+            settings.EXPENSE_LOG_COMPACT_THRESHOLD if compact_threshold is None else compact_threshold
+        )
+        # Databases index expenses by date already; only document backends are partitioned
+        self.partitioned = not isinstance(storage, ExpenseQueryStorage)
+
+    def _stamps(self, user_id: int) -> tuple | None:
+        if not self.storage.supports_stat:
+            return None
+        return tuple(
+            self.storage.get_file_stat(user_id, filename)
+            for filename in (SNAPSHOT_FILE, LOG_FILE, SEQUENCE_FILE, MANIFEST_FILE)
+        )
+
+    def _is_fresh(self, state: ExpenseState, user_id: int) -> bool:
+        if self.storage.supports_stat:
+            return state.stamps == self._stamps(user_id)
+        if user_locks.held(user_id):
+            # A write must start from what other workers stored, not from a state trusted by age
+            return False
+        ttl = settings.STORAGE_CACHE_TTL_SECONDS
+        return ttl <= 0 or time.monotonic() - state.loaded_at < ttl
+
+    def is_cached(self, user_id: int) -> bool:
+        """Whether a fresh indexed state is in memory, so reads need not touch storage."""
+        state = _states.get(user_id)
+        return state is not None and self._is_fresh(state, user_id)
+
+    async def state(self, user_id: int) -> ExpenseState:
+        """Return the user's indexed expenses, replaying storage only when they changed."""
+        state = _states.get(user_id)
+        if state is not None and self._is_fresh(state, user_id):
+            return state
+
+        stamps = self._stamps(user_id)
+        # Read the log before the snapshot: a compaction landing in between
+        # then yields the new snapshot plus already-folded records, which replay
+        # idempotently, instead of the old snapshot plus a truncated log.
+        records = await self.storage.load_file(user_id, LOG_FILE)
+        partitions = await self._partitions(user_id)
+        if partitions is None:
+            snapshot = await self.storage.load_file(user_id, SNAPSHOT_FILE)
+        else:
+            snapshot = await self._load_partitions(user_id, partitions)
+
+        state = ExpenseState(snapshot)
+        state.partitions = partitions or []
+        state.unpartitioned = self.partitioned and partitions is None and bool(snapshot)
+        for record in records:
+            state.apply(record)
+        state.log_length = len(records)
+        state.stamps = stamps
+        _states.put(user_id, state)
+        return state
+
+    async def _partitions(self, user_id: int) -> list[str] | None:
+        """Partition keys in chronological order, or None while the user has no manifest yet."""
+        if not self.partitioned:
+            return None
+        manifest = await self.storage.load_file(user_id, MANIFEST_FILE)
+        return sorted(manifest[0].get("partitions", [])) if manifest else None
+
+    async def _load_partitions(self, user_id: int, keys: list[str]) -> list[dict]:
+        documents = await asyncio.gather(*(self.storage.load_file(user_id, partition_file(key)) for key in keys))
+        return [row for document in documents for row in document]
+
+    async def _iter_snapshot(self, user_id: int) -> AsyncIterator[dict]:
+        partitions = await self._partitions(user_id)
+        if partitions is None:
+            async for row in self.storage.iter_records(user_id, SNAPSHOT_FILE):
+                yield row
+            return
+        for key in partitions:
+            async for row in self.storage.iter_records(user_id, partition_file(key)):
+                yield row
+
+    def _needs_compaction(self, state: ExpenseState) -> bool:
+        if state.log_length >= self.compact_threshold:
+            return True
+        if not self.partitioned:
+            return False
+        if state.unpartitioned:
+            return True
+        # A month partition has aged past the archive cutoff
+        cutoff = archive_cutoff(datetime.date.today(), settings.EXPENSE_ARCHIVE_AFTER_MONTHS)
+        return any(partition_key(key, cutoff) != key for key in state.partitions if not is_archive(key))
+
+    async def load(self, user_id: int) -> list[dict]:
+        state = await self.state(user_id)
+        if self._needs_compaction(state):
+            self.schedule_compaction(user_id)
+        return state.live_rows()
+
+    async def load_range(
+        self, user_id: int, start_date: datetime.date | None, end_date: datetime.date | None
+    ) -> list[dict]:
+        """
+        Expenses that may be dated within [start_date, end_date]. A fresh state in
+        memory is returned whole; otherwise only the overlapping partitions are
+        read and the log is applied to them. Rows outside the range can be
+        included, so callers still filter.
+        """
+        if self.is_cached(user_id):
+            return await self.load(user_id)
+
+        records = await self.storage.load_file(user_id, LOG_FILE)
+        partitions = await self._partitions(user_id)
+        # Records from before partitioning do not say where the row they change is stored
+        if partitions is None or any(record.get("op") != "add" and "from" not in record for record in records):
+            return await self.load(user_id)
+
+        overlay = _LogOverlay(records)
+        rows, seen = [], set()
+        for row in await self._load_partitions(user_id, overlapping(partitions, start_date, end_date)):
+            change = overlay.changes.get(row.get("id"))
+            if change is None:
+                rows.append(row)
+                continue
+            if change.id in seen:
+                if not change.deleted:
+                    rows.append(row)
+                continue
+            seen.add(change.id)
+            if change.present_row is not None:
+                rows.append(row if change.present_row is _SNAPSHOT_ROW else change.present_row)
+
+        for change in overlay.changes.values():
+            if change.id in seen:
+                continue
+            # Stored in a partition that was not read, or never stored: only its log outcome can be in range
+            row = change.present_row if change.origin is not None else change.absent_row
+            if row is not None and row is not _SNAPSHOT_ROW:
+                rows.append(row)
+        return rows
+
+    async def stream(self, user_id: int) -> AsyncIterator[dict]:
+        """
+        Yield the user's expenses in stored order without materializing them:
+        the (compacted, hence short) log is read into an overlay and the
+        snapshot is streamed through it. An indexed state that is already in
+        memory and fresh is iterated instead.
+        """
+        state = _states.get(user_id)
+        if state is not None and self._is_fresh(state, user_id):
+            for row in state.live_rows():
+                yield row
+            return
+
+        # Log before snapshot, for the same reason as in state()
+        overlay = _LogOverlay(await self.storage.load_file(user_id, LOG_FILE))
+        seen: set = set()
+        async for row in self._iter_snapshot(user_id):
+            change = overlay.changes.get(row.get("id"))
+            if change is None:
+                yield row
+                continue
+            if change.id in seen:
+                # A legacy duplicate id: replay only touches the first row, unless deleted
+                if not change.deleted:
+                    yield row
+                continue
+            seen.add(change.id)
+            if change.present_row is not None and change.present_seq is None:
+                yield row if change.present_row is _SNAPSHOT_ROW else change.present_row
+
+        yield_order = []
+        for change in overlay.changes.values():
+            row, seq = (change.present_row, change.present_seq) if change.id in seen else (change.absent_row, change.absent_seq)
+            if row is not None and seq is not None:
+                yield_order.append((seq, row))
+        yield_order.sort(key=lambda item: item[0])
+        for _, row in yield_order:
+            yield row
+
+    async def get(self, user_id: int, expense_id: int) -> dict | None:
+        if isinstance(self.storage, ExpenseQueryStorage):
+            return await self.storage.get_expense(user_id, expense_id)
+        return (await self.state(user_id)).get(expense_id)
+
+    async def get_many(self, user_id: int, expense_ids: list[int]) -> dict[int, dict]:
+        """The stored expenses among `expense_ids`, by id; missing ids are left out."""
+        if isinstance(self.storage, ExpenseQueryStorage):
+            return await self.storage.get_expenses(user_id, expense_ids)
+        state = await self.state(user_id)
+        return {expense_id: row for expense_id in expense_ids if (row := state.get(expense_id)) is not None}
+
+    async def reserve_ids(self, user_id: int, count: int = 1) -> int:
+        """
+        Reserve `count` consecutive expense ids and return the first one.
+        Databases allocate from MAX(id); other backends use the persisted sequence.
+        """
+        async with user_locks.lock(user_id):
+            if isinstance(self.storage, ExpenseQueryStorage):
+                return await self.storage.max_expense_id(user_id) + 1
+
+            state = await self.state(user_id)
+            if state.next_id is None:
+                documents = await self.storage.load_file(user_id, SEQUENCE_FILE)
+                state.next_id = documents[0].get("next_id", 1) if documents else 1
+
+            # Never hand out an id at or below one already stored, e.g. from a pre-sequence history
+            first_id = max(state.next_id, state.max_id + 1)
+            if not await self.storage.save_file(user_id, SEQUENCE_FILE, [{"next_id": first_id + count}]):
+                raise IOError("could not write expense id sequence")
+            state.next_id = first_id + count
+            state.stamps = self._stamps(user_id)
+            return first_id
+
+    async def add(self, user_id: int, expense: dict) -> bool:
+        return await self.append(user_id, [{"op": "add", "expense": expense}])
+
+    async def add_many(self, user_id: int, expenses: list[dict]) -> bool:
+        return await self.append(user_id, [{"op": "add", "expense": expense} for expense in expenses])
+
+    async def update(self, user_id: int, expense: dict) -> bool:
+        return await self.append(user_id, [{"op": "update", "expense": expense}])
+
+    async def delete(self, user_id: int, expense_id: int) -> bool:
+        return await self.append(user_id, [{"op": "delete", "id": expense_id}])
+
+    async def append(self, user_id: int, records: list[dict]) -> bool:
+        if isinstance(self.storage, ExpenseQueryStorage):
+            return await self._append_to_table(user_id, records)
+
+        async with user_locks.lock(user_id):
+            state = await self.state(user_id)
+            for record in records:
+                if self.partitioned:
+                    current = state.get(_record_id(record))
+                    if current is not None:
+                        record["from"] = month_of(current)
+                    elif record.get("op") != "add":
+                        record["from"] = None
+                state.apply(record)
+
+            if not await self.storage.append_records(user_id, LOG_FILE, records):
+                _states.discard(user_id)
+                return False
+
+            state.log_length += len(records)
+            state.stamps = self._stamps(user_id)
+            state.loaded_at = time.monotonic()
+            if self._needs_compaction(state):
+                self.schedule_compaction(user_id)
+            return True
+
+    async def _append_to_table(self, user_id: int, records: list[dict]) -> bool:
+        """
+        Databases apply the records to the expenses table as they are written, so
+        a write never needs the replayed state; an already cached one is kept
+        current for searches and otherwise left to expire with its TTL.
+        """
+        async with user_locks.lock(user_id):
+            if not await self.storage.append_records(user_id, LOG_FILE, records):
+                _states.discard(user_id)
+                return False
+            if (state := _states.get(user_id)) is not None:
+                for record in records:
+                    state.apply(record)
+            return True
+
+    def schedule_compaction(self, user_id: int):
+        """Start a background compaction for the user unless one is already running."""
+        if user_id in _pending_compactions:
+            return
+        # Keep a reference so the task is not garbage collected mid-flight
+        _pending_compactions[user_id] = asyncio.create_task(self._compact_pending(user_id))
+
+    async def _compact_pending(self, user_id: int):
+        try:
+            await self.compact(user_id)
+        except Exception as e:
+            logger.error(f"Expense log compaction failed for user {user_id}: {e}")
+        finally:
+            _pending_compactions.pop(user_id, None)
+
+    async def compact(self, user_id: int) -> int:
+        """Fold the log into a fresh snapshot and truncate it. Returns records folded."""
+        async with user_locks.lock(user_id):
+            state = await self.state(user_id)
+            if not self._needs_compaction(state) and not state.log_length:
+                return 0
+
+            folded = state.log_length
+            if self.partitioned:
+                await self._write_partitions(user_id, state)
+            elif not await self.storage.save_file(user_id, SNAPSHOT_FILE, state.live_rows()):
+                raise IOError("could not write expense snapshot")
+            # If we crash before truncating, replaying the same records again is idempotent
+            await self.storage.save_file(user_id, LOG_FILE, [])
+
+            state.log_length = 0
+            state.stamps = self._stamps(user_id)
+
+        logger.info(f"Compacted {folded} expense log records for user {user_id}")
+        return folded
+
+    async def _write_partitions(self, user_id: int, state: ExpenseState):
+        """
+        Rewrite the partitions the log changed, roll aged months into their
+        yearly archive, then publish the new manifest. Partitions that were
+        emptied are deleted only once the manifest no longer lists them.
+        """
+        cutoff = archive_cutoff(datetime.date.today(), settings.EXPENSE_ARCHIVE_AFTER_MONTHS)
+        manifest = await self.storage.load_file(user_id, MANIFEST_FILE)
+        existing = set(state.partitions)
+        changed = await self._changed_partitions(user_id, state, manifest, cutoff)
+
+        groups: dict[str, list[dict]] = {}
+        for row in state.rows:
+            if row is None:
+                continue
+            key = partition_key(month_of(row), cutoff)
+            if changed is None or key in changed:
+                groups.setdefault(key, []).append(row)
+        targets = existing | set(groups) if changed is None else changed
+
+        for key in sorted(groups):
+            if not await self.storage.save_file(user_id, partition_file(key), groups[key]):
+                raise IOError(f"could not write expense partition {key}")
+        partitions = sorted((existing - targets) | set(groups))
+        if not await self.storage.save_file(
+            user_id, MANIFEST_FILE, [{"partitions": partitions, "archive_before": cutoff}]
+        ):
+            raise IOError("could not write expense partition manifest")
+
+        for key in sorted((targets & existing) - set(groups)):
+            await self.storage.delete_file(user_id, partition_file(key))
+        if state.unpartitioned:
+            await self.storage.delete_file(user_id, SNAPSHOT_FILE)
+            state.unpartitioned = False
+        state.partitions = partitions
+
+    async def _changed_partitions(
+        self, user_id: int, state: ExpenseState, manifest: list, cutoff: str | None
+    ) -> set[str] | None:
+        """Partitions touched by the log or due for archiving; None means rewrite all of them."""
+        if state.unpartitioned or not manifest:
+            return None
+        # A later cutoff only archives more months; an earlier one would pull rows back out
+        previous = manifest[0].get("archive_before")
+        if previous is not None and (cutoff is None or cutoff < previous):
+            return None
+
+        changed = set()
+        for record in await self.storage.load_file(user_id, LOG_FILE):
+            if record.get("op") != "add" and "from" not in record:
+                return None
+            if record.get("from"):
+                changed.add(partition_key(record["from"], cutoff))
+            if record.get("expense") is not None:
+                changed.add(partition_key(month_of(record["expense"]), cutoff))
+        for key in state.partitions:
+            if partition_key(key, cutoff) != key:
+                changed.update((key, partition_key(key, cutoff)))
+        return changed
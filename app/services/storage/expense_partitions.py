@@ -0,0 +1,64 @@
+import datetime
+import re
+
+# Partitioned layout of a user's compacted expenses:
+#   expenses/manifest.json          [{"partitions": [...keys]}]
+#   expenses/2026-10.json           one month
+#   expenses/archive/2021.json.gz   months older than the archive cutoff, per year
+#   expenses/undated.json           rows without an ISO date
+MANIFEST_FILE = "expenses/manifest.json"
+UNDATED = "undated"
+
+_MONTH = re.compile(r"\d{4}-\d{2}-")
+
+
+def month_of(expense: dict | None) -> str:
+    """'YYYY-MM' of an expense's ISO date, or UNDATED."""
+    day = expense.get("date") if expense else None
+    if isinstance(day, str) and _MONTH.match(day):
+        return day[:7]
+    return UNDATED
+
+
+def archive_cutoff(today: datetime.date, months: int) -> str | None:
+    """First month kept as its own partition; earlier months are archived. None disables archiving."""
+    if months <= 0:
+        return None
+    index = today.year * 12 + today.month - 1 - months
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def partition_key(month: str, cutoff: str | None) -> str:
+    """Partition holding a month: the month itself, or its year's archive once older than `cutoff`."""
+    if month != UNDATED and cutoff is not None and month < cutoff:
+        return month[:4]
+    return month
+
+
+def is_archive(key: str) -> bool:
+    return len(key) == 4
+
+
+def partition_file(key: str) -> str:
+    if is_archive(key):
+        return f"expenses/archive/{key}.json.gz"
+    return f"expenses/{key}.json"
+
+
+def overlapping(keys, start_date: datetime.date | None, end_date: datetime.date | None) -> list[str]:
+    """
+    Partitions that can hold expenses dated within [start_date, end_date].
+    Undated rows are always included, since date filters compare raw strings.
+    """
+    start_month = start_date.isoformat()[:7] if start_date else None
+    end_month = end_date.isoformat()[:7] if end_date else None
+    selected = []
+    for key in keys:
+        if key != UNDATED:
+            first, last = (f"{key}-01", f"{key}-12") if is_archive(key) else (key, key)
+            if start_month is not None and last < start_month:
+                continue
+            if end_month is not None and first > end_month:
+                continue
+        selected.append(key)
+    return selected
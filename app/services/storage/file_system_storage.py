@@ -1,24 +1,162 @@
+import asyncio
+import gzip
 import json
+import os
+import re
+import tempfile
 from app.services.storage.storage_base import FileStorage
-from app.utils.file_manager import get_user_dir
+from app.utils.file_manager import DATA_DIR, get_user_dir
 from app.core.logger import logger
 
 
+def _is_jsonl(filename: str) -> bool:
+    return filename.endswith(".jsonl")
+
+
+def _is_gzip(filename: str) -> bool:
+    return filename.endswith(".gz")
+
+
+def _dump_line(record) -> str:
+    return json.dumps(record, separators=(",", ":")) + "\n"
+
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class _JsonArrayReader:
+    """
+    Incrementally parses the elements of a top-level JSON array fed to it in
+    chunks, so a large document can be consumed without holding all of it.
+    """
+
+    _SEPARATORS = re.compile(r"[\s,]*")
+
+    def __init__(self):
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.started = False
+        self.done = False
+
+    def feed(self, chunk: str, final: bool = False) -> list:
+        buffer = self.buffer + chunk
+        pos = self._SEPARATORS.match(buffer).end()
+        if not self.started and pos < len(buffer):
+            if buffer[pos] != "[":
+                raise ValueError("document is not a JSON array")
+            self.started = True
+            pos += 1
+
+        records = []
+        while not self.done:
+            pos = self._SEPARATORS.match(buffer, pos).end()
+            if pos == len(buffer):
+                break
+            if buffer[pos] == "]":
+                self.done = True
+                break
+            try:
+                record, end = self.decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if final:
+                    raise
+                break  # element continues in the next chunk
+            records.append(record)
+            pos = end
+
+        self.buffer = buffer[pos:]
+        return records
+
+
+def _atomic_write(file_path, write, binary: bool = False):
+    """
+    Write through a temp file in the same directory and rename it over the
+    target, so readers see either the old or the new file, never a torn one.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=file_path.parent, prefix=f".{file_path.name}.", suffix=".tmp")
+    try:
+        with (os.fdopen(fd, "wb") if binary else os.fdopen(fd, "w", encoding="utf-8")) as file:
+            write(file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
 class FileSystemStorage(FileStorage):
-    def save_file(self, user_id: int, filename: str, data) -> bool:
+    supports_stat = True
+
+    async def save_file(self, user_id: int, filename: str, data) -> bool:
         """
         If `data` is dict -> append to existing list.
         If `data` is list -> replace file content.
         """
+        return await asyncio.to_thread(self._save_file, user_id, filename, data)
+
+    async def append_records(self, user_id: int, filename: str, records: list[dict]) -> bool:
+        """Append records to a JSON Lines file without reading it."""
+        return await asyncio.to_thread(self._append_records, user_id, filename, records)
+
+    async def load_file(self, user_id: int, filename: str) -> list:
+        return await asyncio.to_thread(self._load_file, user_id, filename)
+
+    async def iter_records(self, user_id: int, filename: str):
+        """Stream a JSON array document in STREAM_CHUNK_SIZE reads, parsing as it goes."""
+        if _is_jsonl(filename) or _is_gzip(filename):
+            for record in await self.load_file(user_id, filename):
+                yield record
+            return
+
+        file_path = get_user_dir(user_id) / filename
+        try:
+            # The open handle pins the current file, so an atomic replace mid-stream is harmless
+            file = await asyncio.to_thread(file_path.open, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return
+
+        reader = _JsonArrayReader()
         try:
-            user_directory = get_user_dir(user_id)
-            user_directory.mkdir(parents=True, exist_ok=True)
-            file_path = user_directory / filename
+            while not reader.done:
+                chunk = await asyncio.to_thread(file.read, STREAM_CHUNK_SIZE)
+                for record in reader.feed(chunk, final=not chunk):
+                    yield record
+                if not chunk:
+                    break
+        finally:
+            await asyncio.to_thread(file.close)
+
+    async def delete_file(self, user_id: int, filename: str) -> bool:
+        return await asyncio.to_thread(self._delete_file, user_id, filename)
+
+    async def list_user_ids(self) -> list[int]:
+        return await asyncio.to_thread(self._list_user_ids)
+
+    def _save_file(self, user_id: int, filename: str, data) -> bool:
+        try:
+            file_path = get_user_dir(user_id) / filename
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+
+            if _is_jsonl(filename):
+                if not isinstance(data, list):
+                    return self._append_records(user_id, filename, [data])
+                _atomic_write(file_path, lambda file: file.writelines(_dump_line(record) for record in data))
+                return True
+
+            if _is_gzip(filename):
+                if not isinstance(data, list):
+                    data = self._load_file(user_id, filename) + [data]
+                content = gzip.compress(json.dumps(data, separators=(",", ":")).encode("utf-8"))
+                _atomic_write(file_path, lambda file: file.write(content), binary=True)
+                return True
 
             if isinstance(data, list):
                 # replace file
-                with file_path.open("w", encoding="utf-8") as file:
-                    json.dump(data, file, indent=2)
+                _atomic_write(file_path, lambda file: json.dump(data, file, indent=2))
                 return True
 
             # append
@@ -33,22 +171,72 @@ class FileSystemStorage(FileStorage):
 
             existing_data.append(data)
 
-            with file_path.open("w", encoding="utf-8") as file:
-                json.dump(existing_data, file, indent=2)
+            _atomic_write(file_path, lambda file: json.dump(existing_data, file, indent=2))
 
             return True
         except Exception as e:
             logger.error(f"Error saving file {filename} for user {user_id}: {e}")
             return False
 
-    def load_file(self, user_id: int, filename: str) -> list:
+    def _append_records(self, user_id: int, filename: str, records: list[dict]) -> bool:
+        try:
+            file_path = get_user_dir(user_id) / filename
+            # A single write() on an O_APPEND file keeps concurrent appends from interleaving
+            with file_path.open("a", encoding="utf-8") as file:
+                file.write("".join(_dump_line(record) for record in records))
+            return True
+        except Exception as e:
+            logger.error(f"Error appending to {filename} for user {user_id}: {e}")
+            return False
+
+    def _load_file(self, user_id: int, filename: str) -> list:
         try:
             file_path = get_user_dir(user_id) / filename
             if not file_path.exists():
                 return []
-            with file_path.open("r", encoding="utf-8") as file:
+            if _is_jsonl(filename):
+                return self._load_lines(file_path)
+            opener = gzip.open if _is_gzip(filename) else open
+            with opener(file_path, "rt", encoding="utf-8") as file:
                 data = json.load(file)
             return data if isinstance(data, list) else [data]
         except Exception as e:
             logger.error(f"Error loading file {filename} for user {user_id}: {e}")
             return []
+
+    def _list_user_ids(self) -> list[int]:
+        user_ids = []
+        for user_dir in DATA_DIR.glob("user_*"):
+            suffix = user_dir.name.removeprefix("user_")
+            if user_dir.is_dir() and suffix.isdigit():
+                user_ids.append(int(suffix))
+        return sorted(user_ids)
+
+    def _delete_file(self, user_id: int, filename: str) -> bool:
+        try:
+            (get_user_dir(user_id) / filename).unlink(missing_ok=True)
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting file {filename} for user {user_id}: {e}")
+            return False
+
+    def _load_lines(self, file_path) -> list:
+        records = []
+        with file_path.open("r", encoding="utf-8") as file:
+            for line_number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A crash mid-append can leave a torn final line; skip it
+                    logger.warning(f"Skipping unreadable line {line_number} in {file_path}")
+        return records
+
+    def get_file_stat(self, user_id: int, filename: str) -> tuple[int, int, int] | None:
+        try:
+            stat = (get_user_dir(user_id) / filename).stat()
+        except FileNotFoundError:
+            return None
+        # Rewrites replace the file, so the inode tells apart two same-size writes within one mtime tick
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
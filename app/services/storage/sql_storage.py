@@ -0,0 +1,308 @@
+from datetime import date, datetime
+
+from sqlalchemy import select, delete, update, func, and_, or_
+
+from app.core.database import AsyncSessionLocal
+from app.core.logger import logger
+from app.dto.expense_dto import ExpenseSort
+from app.models import Expense, Category, Notification, User, UserSettings
+from app.services.storage.expense_log import SNAPSHOT_FILE, LOG_FILE
+from app.services.storage.storage_base import FileStorage, ExpenseQueryStorage, NotificationQueryStorage
+
+# Rows fetched per round trip when streaming expenses
+STREAM_BATCH_SIZE = 500
+
+
+class SqlStorage(FileStorage, ExpenseQueryStorage, NotificationQueryStorage):
+    """
+    Stores per-user documents as rows in the application database.
+
+    The document API (`load_file`/`save_file`) is kept so existing services work
+    unchanged: each known filename maps onto a table. Expense log records are
+    applied to the expenses table as they arrive, so the log document itself is
+    always empty and never needs compacting.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal):
+        self.session_factory = session_factory
+
+    # Document API
+
+    async def load_file(self, user_id: int, filename: str) -> list:
+        try:
+            if filename == SNAPSHOT_FILE:
+                return await self._load_expenses(user_id)
+            if filename == LOG_FILE:
+                return []
+            if filename == "categories.json":
+                return await self._load_categories(user_id)
+            if filename == "settings.json":
+                return await self._load_settings(user_id)
+            if filename == "notifications.json":
+                return await self._load_notifications(user_id)
+            logger.warning(f"SqlStorage has no table for {filename}")
+            return []
+        except Exception as e:
+            logger.error(f"Error loading {filename} for user {user_id}: {e}")
+            return []
+
+    async def iter_records(self, user_id: int, filename: str):
+        if filename != SNAPSHOT_FILE:
+            async for record in super().iter_records(user_id, filename):
+                yield record
+            return
+
+        stmt = (
+            select(Expense)
+            .where(Expense.user_id == user_id)
+            .order_by(Expense.id)
+            .execution_options(yield_per=STREAM_BATCH_SIZE)
+        )
+        async with self.session_factory() as session:
+            async for expense in await session.stream_scalars(stmt):
+                yield expense.to_dict()
+
+    async def save_file(self, user_id: int, filename: str, data) -> bool:
+        """
+        If `data` is dict -> append a row.
+        If `data` is list -> replace all of the user's rows.
+        """
+        replace = isinstance(data, list)
+        return await self._save(user_id, filename, data if replace else [data], replace)
+
+    async def append_records(self, user_id: int, filename: str, records: list[dict]) -> bool:
+        return await self._save(user_id, filename, list(records), replace=False)
+
+    async def _save(self, user_id: int, filename: str, rows: list, replace: bool) -> bool:
+        try:
+            if filename == SNAPSHOT_FILE:
+                await self._save_rows(user_id, Expense, rows, replace)
+            elif filename == LOG_FILE:
+                await self._apply_expense_log(user_id, rows)
+            elif filename == "categories.json":
+                await self._save_rows(user_id, Category, rows, replace)
+            elif filename == "settings.json":
+                await self._save_settings(user_id, rows)
+            elif filename == "notifications.json":
+                await self._save_rows(user_id, Notification, rows, replace)
+            else:
+                logger.warning(f"SqlStorage has no table for {filename}")
+                return False
+            return True
+        except Exception as e:
+            logger.error(f"Error saving {filename} for user {user_id}: {e}")
+            return False
+
+    async def list_user_ids(self) -> list[int]:
+        stmt = select(User.id).order_by(User.id)
+        async with self.session_factory() as session:
+            return list((await session.execute(stmt)).scalars())
+
+    # Expense queries
+
+    async def query_expenses(
+        self,
+        user_id: int,
+        start_date: date | None = None,
+        end_date: date | None = None,
+        category: str | None = None,
+        min_amount: float | None = None,
+        max_amount: float | None = None,
+        sort: ExpenseSort = ExpenseSort.ID,
+        after: tuple | None = None,
+        limit: int | None = None,
+    ) -> list[dict]:
+        stmt = select(Expense).where(Expense.user_id == user_id)
+        if start_date is not None:
+            stmt = stmt.where(Expense.date >= start_date)
+        if end_date is not None:
+            stmt = stmt.where(Expense.date <= end_date)
+        if category is not None:
+            # Every id of that name, hidden ones included, like the in-memory filter
+            stmt = stmt.where(Expense.category_id.in_(
+                select(Category.id).where(Category.user_id == user_id, Category.name == category)
+            ))
+        if min_amount is not None:
+            stmt = stmt.where(Expense.amount >= min_amount)
+        if max_amount is not None:
+            stmt = stmt.where(Expense.amount <= max_amount)
+
+        column = getattr(Expense, sort.field)
+        if after is not None:
+            value, last_id = after
+            if sort.field == "date" and isinstance(value, str):
+                value = date.fromisoformat(value)
+            # Keyset seek on (column, id), which the (user_id, date) index can serve
+            if sort.descending:
+                stmt = stmt.where(or_(column < value, and_(column == value, Expense.id < last_id)))
+            else:
+                stmt = stmt.where(or_(column > value, and_(column == value, Expense.id > last_id)))
+
+        if sort.descending:
+            stmt = stmt.order_by(column.desc(), Expense.id.desc())
+        else:
+            stmt = stmt.order_by(column, Expense.id)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+
+        async with self.session_factory() as session:
+            result = await session.execute(stmt)
+            return [expense.to_dict() for expense in result.scalars()]
+
+    async def get_expense(self, user_id: int, expense_id: int) -> dict | None:
+        return (await self.get_expenses(user_id, [expense_id])).get(expense_id)
+
+    async def get_expenses(self, user_id: int, expense_ids: list[int]) -> dict[int, dict]:
+        if not expense_ids:
+            return {}
+        stmt = select(Expense).where(Expense.user_id == user_id, Expense.id.in_(set(expense_ids)))
+        async with self.session_factory() as session:
+            return {expense.id: expense.to_dict() for expense in (await session.execute(stmt)).scalars()}
+
+    async def sum_expenses(self, user_id: int, start_date: date, end_date: date) -> float:
+        stmt = select(func.coalesce(func.sum(Expense.amount), 0)).where(
+            Expense.user_id == user_id,
+            Expense.date >= start_date,
+            Expense.date <= end_date,
+        )
+        async with self.session_factory() as session:
+            return float((await session.execute(stmt)).scalar_one())
+
+    async def max_expense_id(self, user_id: int) -> int:
+        stmt = select(func.coalesce(func.max(Expense.id), 0)).where(Expense.user_id == user_id)
+        async with self.session_factory() as session:
+            return int((await session.execute(stmt)).scalar_one())
+
+    # Notification queries
+
+    async def query_notifications(
+        self, user_id: int, before: int | None = None, limit: int | None = None
+    ) -> list[dict]:
+        # The primary key only grows, so it doubles as the notification sequence number
+        stmt = select(Notification).where(Notification.user_id == user_id)
+        if before is not None:
+            stmt = stmt.where(Notification.pk < before)
+        stmt = stmt.order_by(Notification.pk.desc())
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        async with self.session_factory() as session:
+            return [notification.to_dict() for notification in (await session.execute(stmt)).scalars()]
+
+    async def count_unread(self, user_id: int) -> int:
+        stmt = select(func.count()).select_from(Notification).where(
+            Notification.user_id == user_id,
+            Notification.is_read.is_(False),
+        )
+        async with self.session_factory() as session:
+            return int((await session.execute(stmt)).scalar_one())
+
+    async def latest_dates(self, user_id: int, titles: list[str]) -> dict[str, str]:
+        stmt = (
+            select(Notification.title, func.max(Notification.date))
+            .where(Notification.user_id == user_id, Notification.title.in_(titles), Notification.date.is_not(None))
+            .group_by(Notification.title)
+        )
+        async with self.session_factory() as session:
+            return {title: date for title, date in (await session.execute(stmt)).all()}
+
+    async def mark_read(self, user_id: int, notification_id: str | None = None) -> int:
+        stmt = update(Notification).where(Notification.user_id == user_id).values(
+            is_read=True,
+            read_at=func.coalesce(Notification.read_at, datetime.utcnow().isoformat() + 'Z'),
+        )
+        if notification_id is None:
+            stmt = stmt.where(Notification.is_read.is_(False))
+        else:
+            stmt = stmt.where(Notification.id == notification_id)
+        async with self.session_factory() as session:
+            result = await session.execute(stmt)
+            await session.commit()
+            return result.rowcount
+
+    async def delete_notifications(
+        self,
+        user_id: int,
+        older_than: datetime | None = None,
+        keep_newest: int | None = None,
+        keep_unread: bool = True,
+    ) -> tuple[int, int]:
+        async with self.session_factory() as session:
+            expired = []
+            if older_than is not None:
+                expired.append(Notification.created_at < older_than)
+            if keep_newest:
+                boundary = (await session.execute(
+                    select(Notification.pk)
+                    .where(Notification.user_id == user_id)
+                    .order_by(Notification.pk.desc())
+                    .offset(keep_newest)
+                    .limit(1)
+                )).scalar()
+                if boundary is not None:
+                    expired.append(Notification.pk <= boundary)
+            if not expired:
+                return 0, 0
+
+            # Alert dedupe derives the last period each limit fired for from the latest row per title
+            latest = select(func.max(Notification.pk)).where(Notification.user_id == user_id).group_by(Notification.title)
+            conditions = [Notification.user_id == user_id, or_(*expired), Notification.pk.not_in(latest)]
+            if keep_unread:
+                conditions.append(Notification.is_read.is_(True))
+
+            # Only the matching rows go, so the pk-based seqs of the others stay put
+            count, size = (await session.execute(
+                select(
+                    func.count(),
+                    func.coalesce(func.sum(func.length(Notification.title) + func.length(Notification.detail)), 0),
+                ).where(*conditions)
+            )).one()
+            if count:
+                await session.execute(delete(Notification).where(*conditions))
+                await session.commit()
+            return int(count), int(size)
+
+    # Table helpers
+
+    async def _load_expenses(self, user_id: int) -> list[dict]:
+        return await self.query_expenses(user_id)
+
+    async def _apply_expense_log(self, user_id: int, records: list[dict]):
+        async with self.session_factory() as session:
+            for record in records:
+                op = record.get("op")
+                if op in ("add", "update"):
+                    await session.merge(Expense.from_dict(user_id, record["expense"]))
+                elif op == "delete":
+                    await session.execute(
+                        delete(Expense).where(Expense.user_id == user_id, Expense.id == record["id"])
+                    )
+            await session.commit()
+
+    async def _save_rows(self, user_id: int, model, rows: list[dict], replace: bool):
+        async with self.session_factory() as session:
+            if replace:
+                await session.execute(delete(model).where(model.user_id == user_id))
+            session.add_all(model.from_dict(user_id, row) for row in rows)
+            await session.commit()
+
+    async def _load_categories(self, user_id: int) -> list[dict]:
+        stmt = select(Category).where(Category.user_id == user_id).order_by(Category.id)
+        async with self.session_factory() as session:
+            return [category.to_dict() for category in (await session.execute(stmt)).scalars()]
+
+    async def _load_settings(self, user_id: int) -> list[dict]:
+        async with self.session_factory() as session:
+            user_settings = await session.get(UserSettings, user_id)
+            return [user_settings.to_dict()] if user_settings else []
+
+    async def _save_settings(self, user_id: int, rows: list[dict]):
+        if not rows:
+            return
+        async with self.session_factory() as session:
+            await session.merge(UserSettings.from_dict(user_id, rows[-1]))
+            await session.commit()
+
+    async def _load_notifications(self, user_id: int) -> list[dict]:
+        stmt = select(Notification).where(Notification.user_id == user_id).order_by(Notification.pk)
+        async with self.session_factory() as session:
+            return [notification.to_dict() for notification in (await session.execute(stmt)).scalars()]
@@ -1,11 +1,155 @@
 from abc import ABC, abstractmethod
+from datetime import date, datetime
+from typing import AsyncIterator
+
+from app.dto.expense_dto import ExpenseSort
 
 class FileStorage(ABC):
 
     @abstractmethod
-    def save_file(self, user_id: int, filename: str, data: list[dict]) -> bool:
+    async def save_file(self, user_id: int, filename: str, data: list[dict]) -> bool:
         pass
 
     @abstractmethod
-    def load_file(self, user_id: int, filename: str) -> list:
-        pass
\ No newline at end of file
+    async def load_file(self, user_id: int, filename: str) -> list:
+        pass
+
+    async def append_records(self, user_id: int, filename: str, records: list[dict]) -> bool:
+        """
+        Append records to a log document. Backends without a native append
+        fall back to a read-modify-write of the whole document.
+        """
+        existing = await self.load_file(user_id, filename)
+        return await self.save_file(user_id, filename, existing + list(records))
+
+    async def iter_records(self, user_id: int, filename: str) -> AsyncIterator:
+        """
+        Yield a document's records one at a time. Backends that cannot parse
+        incrementally fall back to loading the whole document.
+        """
+        for record in await self.load_file(user_id, filename):
+            yield record
+
+    async def delete_file(self, user_id: int, filename: str) -> bool:
+        """Remove a document. Backends that cannot delete leave it empty instead."""
+        return await self.save_file(user_id, filename, [])
+
+    def get_file_stat(self, user_id: int, filename: str) -> tuple[int, int, int] | None:
+        """
+        Return a cheap (mtime_ns, size, inode) stamp for a stored file, or None
+        if the file does not exist. Backends that cannot stat cheaply keep this
+        default and set `supports_stat = False`.
+        """
+        return None
+
+    def document_version(self, user_id: int, filename: str) -> str | None:
+        """
+        Cheap version tag that changes whenever the document changes, or None if
+        the backend can only tell by loading it. Derived from the stat stamp here.
+        """
+        if not self.supports_stat:
+            return None
+        stat = self.get_file_stat(user_id, filename)
+        return "-".join(f"{part:x}" for part in stat) if stat else "0"
+
+    async def list_user_ids(self) -> list[int]:
+        """Ids of the users that have documents stored, for maintenance sweeps."""
+        return []
+
+    async def close(self):
+        """Release any connections held by the backend."""
+        pass
+
+    supports_stat: bool = False
+
+
+class ExpenseQueryStorage(ABC):
+    """
+    Backends that can filter and aggregate expenses natively. Services check for
+    this interface and push work down instead of loading the whole document.
+    """
+
+    @abstractmethod
+    async def query_expenses(
+        self,
+        user_id: int,
+        start_date: date | None = None,
+        end_date: date | None = None,
+        category: str | None = None,
+        min_amount: float | None = None,
+        max_amount: float | None = None,
+        sort: ExpenseSort = ExpenseSort.ID,
+        after: tuple | None = None,
+        limit: int | None = None,
+    ) -> list[dict]:
+        """
+        Filtered expenses in `sort` order. `after` is a (value, id) keyset
+        position from a previous page; `limit` caps the number of rows.
+        `category` is a name, matched through the user's category table since
+        rows carry only a `category_id`.
+        """
+        pass
+
+    @abstractmethod
+    async def get_expense(self, user_id: int, expense_id: int) -> dict | None:
+        """One expense by id, or None if the user has no such expense."""
+        pass
+
+    @abstractmethod
+    async def get_expenses(self, user_id: int, expense_ids: list[int]) -> dict[int, dict]:
+        """The user's expenses among `expense_ids`, by id; missing ids are left out."""
+        pass
+
+    @abstractmethod
+    async def sum_expenses(self, user_id: int, start_date: date, end_date: date) -> float:
+        pass
+
+    @abstractmethod
+    async def max_expense_id(self, user_id: int) -> int:
+        pass
+
+
+class NotificationQueryStorage(ABC):
+    """
+    Backends that can page and count notifications natively. Each
+    notification carries a `seq` that increases with insertion order.
+    """
+
+    @abstractmethod
+    async def query_notifications(
+        self, user_id: int, before: int | None = None, limit: int | None = None
+    ) -> list[dict]:
+        """Notifications newest first, only those with seq below `before` if given."""
+        pass
+
+    @abstractmethod
+    async def count_unread(self, user_id: int) -> int:
+        pass
+
+    @abstractmethod
+    async def latest_dates(self, user_id: int, titles: list[str]) -> dict[str, str]:
+        """Latest `date` (period key) among the user's notifications of each title, for alert dedupe."""
+        pass
+
+    @abstractmethod
+    async def mark_read(self, user_id: int, notification_id: str | None = None) -> int:
+        """
+        Mark one notification, or all unread ones, read in a single statement.
+        Returns the unread notifications marked for all, the matches for one.
+        """
+        pass
+
+    @abstractmethod
+    async def delete_notifications(
+        self,
+        user_id: int,
+        older_than: datetime | None = None,
+        keep_newest: int | None = None,
+        keep_unread: bool = True,
+    ) -> tuple[int, int]:
+        """
+        Delete notifications created before `older_than` or beyond the newest
+        `keep_newest`, always keeping the latest one of each title (and unread
+        ones with `keep_unread`). Returns (rows deleted, approximate bytes).
+        """
+        pass
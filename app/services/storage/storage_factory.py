@@ -1,19 +1,61 @@
+from app.services.storage.cached_storage import CachedStorage
 from app.services.storage.file_system_storage import FileSystemStorage
 from app.services.storage.storage_base import FileStorage
 from app.services.storage.supabase_storage import SupabaseStorage
 from app.core.config import settings
+from app.core.logger import logger
 
+# Process-wide storage instance, created in the app lifespan (or lazily on first use)
+_storage: FileStorage | None = None
 
-def storage_factory() -> FileStorage:
+
+def _create_storage(cached: bool = True) -> FileStorage:
     """
-    Factory function to create the appropriate storage instance based on configuration.
+    Build the configured backend. Document backends are wrapped in the
+    process-wide cache unless it is disabled; the SQL backend is returned
+    as-is so services can push queries down to it.
     """
-    if settings.APP_ENV == "production":
-        return SupabaseStorage()
+    if settings.STORAGE_BACKEND == "sql":
+        from app.services.storage.sql_storage import SqlStorage
+        return SqlStorage()
+
+    if settings.STORAGE_BACKEND == "supabase":
+        backend = SupabaseStorage()
     else:
-        return FileSystemStorage()  # Default to file system storage
+        backend = FileSystemStorage()  # Default to file system storage
+
+    if not cached or settings.STORAGE_CACHE_MAX_BYTES <= 0:
+        return backend
+    return CachedStorage(backend)
+
 
+def storage_factory() -> FileStorage:
+    """
+    Return the shared storage instance for the configured backend.
+    Every caller gets the same object, so HTTP connections are reused.
+    """
+    global _storage
+    if _storage is None:
+        _storage = _create_storage()
+    return _storage
 
 
+async def init_storage(cached: bool = True):
+    """
+    Create the shared storage instance at startup. Batch jobs that read each
+    user once pass cached=False: a cache would only hold copies that other
+    processes can change underneath them.
+    """
+    global _storage
+    if _storage is None:
+        _storage = _create_storage(cached)
+    storage = _storage
+    logger.info(f"Storage backend initialized: {type(storage).__name__} ({settings.STORAGE_BACKEND})")
 
 
+async def close_storage():
+    """Close the shared storage instance and its connection pool"""
+    global _storage
+    if _storage is not None:
+        await _storage.close()
+        _storage = None
@@ -1,11 +1,21 @@
+import gzip
 import json
-from supabase import create_client
+import httpx
 from app.services.storage.storage_base import FileStorage
 from app.core import config
 from app.core.logger import logger
 
 
+# Objects per page when listing the bucket
+LIST_PAGE_SIZE = 1000
+
+
 class SupabaseStorage(FileStorage):
+    """
+    Stores per-user documents in a Supabase Storage bucket, talking to the
+    Storage REST API through an async HTTP client.
+    """
+
     def __init__(self):
         self.url = config.settings.SUPABASE_URL
         self.key = config.settings.SUPABASE_KEY
@@ -14,76 +24,67 @@ class SupabaseStorage(FileStorage):
         if not self.url or not self.key:
             logger.warning("Supabase URL/KEY not set. SupabaseStorage will fail until they are configured.")
 
-        self.client = create_client(self.url, self.key)
-
-    def _load_file_data(self, path: str):
-        try:
-            data = self.client.storage.from_(self.bucket).download(path)
-
-            # Return empty list if no data
-            if data is None:
-                return []
-            
-            # Normalize the downloaded file into a bytes object.
-            if isinstance(data, memoryview):
-                raw_bytes = data.tobytes()
-            elif isinstance(data, (bytes, bytearray)):
-                raw_bytes = bytes(data)
-            else:
-                try:
-                    raw_bytes = data.read()
-                except:
-                    raw_bytes = bytes(data)
-
-            if not raw_bytes:
-                return []
-        
-            # Convert bytes into dict/list
-            return json.loads(raw_bytes.decode('utf-8'))
-        
-        except Exception as e:
-            logger.debug(f"Supabase download error for '{path}': {e}")
-            return []
-
-    def _download_json(self, path: str):
+        # One keep-alive pool per process: this instance is shared through storage_factory()
+        self.client = httpx.AsyncClient(
+            base_url=f"{self.url.rstrip('/')}/storage/v1",
+            headers={"apikey": self.key, "Authorization": f"Bearer {self.key}"},
+            limits=httpx.Limits(
+                max_connections=config.settings.SUPABASE_MAX_CONNECTIONS,
+                max_keepalive_connections=config.settings.SUPABASE_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=config.settings.SUPABASE_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(
+                config.settings.SUPABASE_TIMEOUT,
+                connect=config.settings.SUPABASE_CONNECT_TIMEOUT,
+            ),
+        )
+
+    async def close(self):
+        await self.client.aclose()
+        logger.info("Supabase storage connections closed")
+
+    def _object_path(self, path: str) -> str:
+        return f"/object/{self.bucket}/{path}"
+
+    async def _download_json(self, path: str):
         try:
-            result = self.client.storage.from_(self.bucket).download(path)
-            if result is None:
+            response = await self.client.get(self._object_path(path))
+            if response.status_code in (400, 404):
+                # Supabase reports a missing object as 400/404
                 return []
+            response.raise_for_status()
 
-            if isinstance(result, memoryview):
-                raw_bytes = result.tobytes()
-            elif isinstance(result, (bytes, bytearray)):
-                raw_bytes = bytes(result)
-            else:
-                try:
-                    raw_bytes = result.read()
-                except AttributeError:
-                    raw_bytes = bytes(result)
-
+            raw_bytes = response.content
             if not raw_bytes:
                 return []
 
+            if path.endswith(".gz"):
+                raw_bytes = gzip.decompress(raw_bytes)
             return json.loads(raw_bytes.decode("utf-8"))
         except Exception as e:
             logger.debug(f"Supabase download error for '{path}': {e}")
             return []
 
-    def _upload_json(self, path: str, data) -> bool:
+    async def _upload_json(self, path: str, data) -> bool:
         try:
-            content = json.dumps(data, indent=2).encode("utf-8")
-            try:
-                self.client.storage.from_(self.bucket).upload(
-                    path, content, file_options={"content-type": "application/json", "upsert": "true"}
-                )
-            except TypeError:
-                self.client.storage.from_(self.bucket).upload(path, content)
+            if path.endswith(".gz"):
+                content = gzip.compress(json.dumps(data, separators=(",", ":")).encode("utf-8"))
+                content_type = "application/gzip"
+            else:
+                content = json.dumps(data, indent=2).encode("utf-8")
+                content_type = "application/json"
+            response = await self.client.post(
+                self._object_path(path),
+                content=content,
+                headers={"content-type": content_type, "x-upsert": "true"},
+            )
+            response.raise_for_status()
             return True
         except Exception as e:
             logger.error(f"Supabase upload error for '{path}': {e}")
             return False
 
-    def save_file(self, user_id: int, filename: str, data) -> bool:
+    async def save_file(self, user_id: int, filename: str, data) -> bool:
         """
         If `data` is dict -> append to existing list.
         If `data` is list -> replace file content.
@@ -93,23 +94,23 @@ class SupabaseStorage(FileStorage):
 
             if isinstance(data, list):
                 # replace entire file
-                return self._upload_json(file_path, data)
+                return await self._upload_json(file_path, data)
 
             # otherwise append
-            existing = self._download_json(file_path)
+            existing = await self._download_json(file_path)
             if not isinstance(existing, list):
                 existing = [] if not existing else [existing]
             existing.append(data)
-            return self._upload_json(file_path, existing)
+            return await self._upload_json(file_path, existing)
 
         except Exception as e:
             logger.error(f"Error saving file {filename} for user {user_id}: {e}")
             return False
 
-    def load_file(self, user_id: int, filename: str) -> list[dict]:
+    async def load_file(self, user_id: int, filename: str) -> list[dict]:
         try:
             file_path = f"user_{user_id}/{filename}"
-            result = self._download_json(file_path)
+            result = await self._download_json(file_path)
             if isinstance(result, list):
                 return result
             if result == [] or result is None:
@@ -118,3 +119,32 @@ class SupabaseStorage(FileStorage):
         except Exception as e:
             logger.error(f"Error loading file {filename} for user {user_id}: {e}")
             return []
+
+    async def delete_file(self, user_id: int, filename: str) -> bool:
+        try:
+            response = await self.client.delete(self._object_path(f"user_{user_id}/{filename}"))
+            if response.status_code in (400, 404):
+                return True
+            response.raise_for_status()
+            return True
+        except Exception as e:
+            logger.error(f"Supabase delete error for '{filename}' of user {user_id}: {e}")
+            return False
+
+    async def list_user_ids(self) -> list[int]:
+        """Users with a `user_<id>/` folder in the bucket, read a page at a time."""
+        user_ids, offset = [], 0
+        while True:
+            response = await self.client.post(
+                f"/object/list/{self.bucket}",
+                json={"prefix": "", "limit": LIST_PAGE_SIZE, "offset": offset, "sortBy": {"column": "name", "order": "asc"}},
+            )
+            response.raise_for_status()
+            entries = response.json()
+            for entry in entries:
+                suffix = entry.get("name", "").removeprefix("user_")
+                if entry.get("name", "").startswith("user_") and suffix.isdigit():
+                    user_ids.append(int(suffix))
+            if len(entries) < LIST_PAGE_SIZE:
+                return sorted(user_ids)
+            offset += LIST_PAGE_SIZE
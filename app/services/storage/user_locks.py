@@ -0,0 +1,121 @@
+import asyncio
+import os
+import weakref
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from app.core.config import settings
+from app.core.logger import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+
+class _UserLock:
+    """In-process state for one user's lock. Reentrant for the owning task."""
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.owner: asyncio.Task | None = None
+        self.depth = 0
+        self.fd: int | None = None
+
+
+class UserLockManager:
+    """
+    Serializes read-modify-write cycles per user without a global lock.
+
+    Within a process an asyncio.Lock per user orders coroutines; across worker
+    processes an fcntl lock on data/.locks/user_<id>.lock does the same. The
+    file lock is polled without blocking so waiting never ties up a thread.
+    Locks are reentrant for the task that holds them, so a service holding the
+    user's lock can call helpers that take it again.
+    """
+
+    def __init__(self, lock_dir: Path, timeout: float):
+        self.lock_dir = lock_dir
+        self.timeout = timeout
+        self._locks: weakref.WeakValueDictionary[int, _UserLock] = weakref.WeakValueDictionary()
+
+    def _get(self, user_id: int) -> _UserLock:
+        user_lock = self._locks.get(user_id)
+        if user_lock is None:
+            user_lock = _UserLock()
+            self._locks[user_id] = user_lock
+        return user_lock
+
+    def held(self, user_id: int) -> bool:
+        """Whether the current task holds the user's lock, i.e. is inside a read-modify-write."""
+        user_lock = self._locks.get(user_id)
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            return False
+        return user_lock is not None and task is not None and user_lock.owner is task
+
+    @asynccontextmanager
+    async def lock(self, user_id: int):
+        user_lock = self._get(user_id)
+        task = asyncio.current_task()
+
+        if user_lock.owner is task and task is not None:
+            user_lock.depth += 1
+            try:
+                yield
+            finally:
+                user_lock.depth -= 1
+            return
+
+        try:
+            await asyncio.wait_for(user_lock.lock.acquire(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Timed out waiting for the lock of user {user_id}")
+            raise TimeoutError(f"User {user_id} is locked by another request")
+
+        try:
+            user_lock.fd = await self._acquire_file_lock(user_id)
+            user_lock.owner = task
+            user_lock.depth = 1
+            yield
+        finally:
+            user_lock.owner = None
+            user_lock.depth = 0
+            if user_lock.fd is not None:
+                self._release_file_lock(user_lock.fd)
+                user_lock.fd = None
+            user_lock.lock.release()
+
+    async def _acquire_file_lock(self, user_id: int) -> int | None:
+        if fcntl is None:
+            return None
+
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.lock_dir / f"user_{user_id}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        delay = 0.002
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                if loop.time() >= deadline:
+                    os.close(fd)
+                    logger.error(f"Timed out waiting for the file lock of user {user_id}")
+                    raise TimeoutError(f"User {user_id} is locked by another worker")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.05)
+
+    def _release_file_lock(self, fd: int):
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+
+user_locks = UserLockManager(
+    lock_dir=Path(settings.USER_LOCK_DIR),
+    timeout=settings.USER_LOCK_TIMEOUT_SECONDS,
+)
@@ -0,0 +1,59 @@
+import hashlib
+
+import orjson
+from fastapi import Request, Response
+
+# Let browsers keep per-user responses but revalidate them on every use
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str | None:
+    """
+    Weak ETag from document versions plus any request-specific parts (e.g. the
+    query string). Returns None if any part is unknown, i.e. a document whose
+    version can only be learned by loading it.
+    """
+    if any(part is None for part in parts):
+        return None
+    digest = hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def body_etag(body: bytes) -> str:
+    return f'W/"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str | None) -> bool:
+    if etag is None:
+        return False
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison: ignore W/ prefixes
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def json_response(request: Request, content=None, etag: str | None = None,
+                  body: bytes | None = None, headers: dict | None = None) -> Response:
+    """
+    JSON response carrying an ETag. When no version-based tag is available the
+    tag is a hash of the body, so an unchanged document still answers 304,
+    just after loading it.
+    """
+    if body is None:
+        body = orjson.dumps(content)
+    etag = etag or body_etag(body)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={**(headers or {}), "ETag": etag, "Cache-Control": CACHE_CONTROL},
+    )
@@ -1,84 +1,137 @@
-import json
+from collections import OrderedDict
 from datetime import datetime
-from app.utils.file_manager import initialize_user_settings_file, initialize_user_notifcations_file
+from app.services.notification_service import NotificationService
+from app.services.storage.storage_base import NotificationQueryStorage
 from app.services.storage.storage_factory import storage_factory
+from app.services.storage.user_locks import user_locks
+
+# Last period each limit fired for, stored as [{"Daily Limit": "2026-10-18", ...}]
+ALERTS_FILE = 'limit_alerts.json'
+
+# (settings key, notification title, period label) for every limit, checked in one pass
+LIMITS = (
+    ('daily', 'Daily Limit', 'daily'),
+    ('weekly', 'Weekly Limit', 'weekly'),
+    ('monthly', 'Monthly Limit', 'monthly'),
+)
+
+_SETTINGS_CACHE_SIZE = 1024
+# user id -> (settings.json version, budget limits)
+_limits_cache: OrderedDict[int, tuple[str, dict]] = OrderedDict()
+
+
+def _period_keys(now: datetime) -> dict:
+    return {
+        'daily': now.strftime('%Y-%m-%d'),
+        'weekly': now.strftime('%Y-W%U'),
+        'monthly': now.strftime('%Y-%m'),
+    }
+
+
+def fired_index(notifications: list) -> dict:
+    """Latest period each limit fired for, from the user's notifications."""
+    index = {}
+    titles = {title for _, title, _ in LIMITS}
+    for notification in notifications:
+        title, date = notification.get('title'), notification.get('date')
+        if title in titles and date and date > index.get(title, ''):
+            index[title] = date
+    return index
+
 
 class ExpenseLimitChecker:
+    """
+    Compares period totals against the user's budget limits and notifies once
+    per limit and period. A check reads the (cached) limits and the small
+    fired-alerts index only (one grouped query on the database);
+    notifications are loaded and saved once, and only when a limit is newly
+    exceeded. `new_breaches` answers the same question without writing, for
+    responses that report breaches while the check itself is queued.
+    """
+
     def __init__(self, user_id: int):
         self.storage = storage_factory()
         self.user_id = user_id
-        self.settings_file = initialize_user_settings_file(user_id)
-        self.notifications_file = initialize_user_notifcations_file(user_id)
-        self.settings = self._load_settings()
-
-    def _load_settings(self):
-        return self.storage.load_file(self.user_id, 'settings')
-       
-
-    def _add_notification(self, detail: str, title: str, date_str: str):
-        # Load or create notifications file
-        try:
-
-            notifications = self.storage.load_file(self.user_id, 'notifications')
-
-        except (FileNotFoundError, json.JSONDecodeError):
-            notifications = []
-
-        notif_id = f"{datetime.utcnow().strftime('%Y%m%d%H%M%S%f')}_{len(notifications)+1}"
-        notification = {
-            'id': notif_id,
-            'title': title,
-            'detail': detail,
-            'is_read': False,
-            'date': date_str
-        }
-        notifications.append(notification)
-
-        self.storage.save_file(self.user_id, 'notifications', notifications)
-
-    def check_and_notify(self, total_today: float, total_week: float, total_month: float):
-        limits: dict = self.settings[0]
-        exceeded_details = []
-        # Load notifications for duplicate check
-        try:
-            with self.notifications_file.open('r', encoding='utf-8') as f:
-                notifications = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            notifications = []
-        today_str = datetime.utcnow().strftime('%Y-%m-%d')
-        week_str = datetime.utcnow().strftime('%Y-W%U')
-        month_str = datetime.utcnow().strftime('%Y-%m')
-        # Check daily limit
-        daily_limit = limits.get('daily', 0)
-        if daily_limit and daily_limit > 0 and total_today > daily_limit:
-            if not any(n['title'] == 'Daily Limit' and n.get('date') == today_str for n in notifications):
-                detail = f"You have exceeded your daily expense limit of {daily_limit}."
-                self._add_notification(detail, "Daily Limit", today_str)
-                exceeded_details.append({
-                    "title": "Daily Limit",
-                    "detail": detail,
-                    "date": today_str
-                })
-        # Check weekly limit
-        weekly_limit = limits.get('weekly', 0)
-        if weekly_limit and weekly_limit > 0 and total_week > weekly_limit:
-            if not any(n['title'] == 'Weekly Limit' and n.get('date') == week_str for n in notifications):
-                detail = f"You have exceeded your weekly expense limit of {weekly_limit}."
-                self._add_notification(detail, "Weekly Limit", week_str)
-                exceeded_details.append({
-                    "title": "Weekly Limit",
-                    "detail": detail,
-                    "date": week_str
-                })
-        # Check monthly limit
-        monthly_limit = limits.get('monthly', 0)
-        if monthly_limit and monthly_limit > 0 and total_month > monthly_limit:
-            if not any(n['title'] == 'Monthly Limit' and n.get('date') == month_str for n in notifications):
-                detail = f"You have exceeded your monthly expense limit of {monthly_limit}."
-                self._add_notification(detail, "Monthly Limit", month_str)
-                exceeded_details.append({
-                    "title": "Monthly Limit",
-                    "detail": detail,
-                    "date": month_str
-                })
-        return exceeded_details
+
+    async def _load_limits(self) -> dict:
+        version = self.storage.document_version(self.user_id, 'settings.json')
+        cached = _limits_cache.get(self.user_id)
+        if version is not None and cached is not None and cached[0] == version:
+            _limits_cache.move_to_end(self.user_id)
+            return cached[1]
+
+        settings = await self.storage.load_file(self.user_id, 'settings.json')
+        limits: dict = settings[0] if settings else {}
+        limits = limits.get('budgetLimits', limits)
+        if version is not None:
+            _limits_cache[self.user_id] = (version, limits)
+            _limits_cache.move_to_end(self.user_id)
+            while len(_limits_cache) > _SETTINGS_CACHE_SIZE:
+                _limits_cache.popitem(last=False)
+        return limits
+
+    async def _load_fired(self, save: bool = True) -> dict:
+        # The database has no document for the index; it answers the same question with one grouped query
+        if isinstance(self.storage, NotificationQueryStorage):
+            return await self.storage.latest_dates(self.user_id, [title for _, title, _ in LIMITS])
+        documents = await self.storage.load_file(self.user_id, ALERTS_FILE)
+        if documents:
+            return documents[0]
+        index = fired_index(await self.storage.load_file(self.user_id, 'notifications.json'))
+        if save:
+            await self._save_fired(index)
+        return index
+
+    async def _save_fired(self, index: dict):
+        if not isinstance(self.storage, NotificationQueryStorage):
+            await self.storage.save_file(self.user_id, ALERTS_FILE, [index])
+
+    async def _exceeded(self, total_today: float, total_week: float, total_month: float) -> list[tuple]:
+        limits = await self._load_limits()
+        totals = {'daily': total_today, 'weekly': total_week, 'monthly': total_month}
+        return [
+            (key, title, period, limit)
+            for key, title, period in LIMITS
+            if (limit := limits.get(key, 0)) and limit > 0 and totals[period] > limit
+        ]
+
+    @staticmethod
+    def _new_alerts(exceeded: list[tuple], fired: dict) -> list[dict]:
+        periods = _period_keys(datetime.utcnow())
+        return [
+            {
+                "title": title,
+                "detail": f"You have exceeded your {period} expense limit of {limit}.",
+                "date": periods[period]
+            }
+            for key, title, period, limit in exceeded
+            if fired.get(title) != periods[period]
+        ]
+
+    async def new_breaches(self, total_today: float, total_week: float, total_month: float) -> list[dict]:
+        """
+        The alerts check_and_notify would send for these totals, read without
+        the user's lock and without writing anything.
+        """
+        exceeded = await self._exceeded(total_today, total_week, total_month)
+        if not exceeded:
+            return []
+        return self._new_alerts(exceeded, await self._load_fired(save=False))
+
+    async def check_and_notify(self, total_today: float, total_week: float, total_month: float):
+        exceeded = await self._exceeded(total_today, total_week, total_month)
+        if not exceeded:
+            return []
+
+        async with user_locks.lock(self.user_id):
+            fired = await self._load_fired()
+            exceeded_details = self._new_alerts(exceeded, fired)
+            if not exceeded_details:
+                return []
+
+            # One write of the notifications for everything that fired
+            await NotificationService().add_notifications(self.user_id, exceeded_details)
+
+            fired = {**fired, **{alert['title']: alert['date'] for alert in exceeded_details}}
+            await self._save_fired(fired)
+            return exceeded_details
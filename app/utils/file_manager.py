@@ -1,8 +1,10 @@
 from pathlib import Path
 import json
 
+DATA_DIR = Path("data")
+
 def get_user_dir(user_id: int):
-    user_dir = Path("data") / f"user_{user_id}"
+    user_dir = DATA_DIR / f"user_{user_id}"
     user_dir.mkdir(parents=True, exist_ok=True)
     return user_dir
 
@@ -0,0 +1,57 @@
+"""
+Benchmark encoding an expense listing: DTO validation vs the raw-row fast path.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_expense_listing                 # 10k, 100k and 1M expenses
+    python -m benchmarks.bench_expense_listing 50000           # custom sizes
+
+The DTO path mirrors what GET /api/expenses did before: build one ExpenseDTO
+per row, then let the response model validate and serialize the list again.
+The fast path projects the stored rows and encodes them with orjson.
+"""
+import sys
+import time
+from typing import List
+
+from pydantic import TypeAdapter
+
+from app.dto.expense_dto import ExpenseDTO
+from app.services.expense_query import dump_expenses
+from benchmarks.bench_expense_summary import generate_expenses
+
+_response_adapter = TypeAdapter(List[ExpenseDTO])
+
+
+def encode_with_dtos(expenses: list[dict]) -> bytes:
+    dtos = [ExpenseDTO(**e) for e in expenses]
+    # FastAPI validates the return value against response_model, then serializes it
+    return _response_adapter.dump_json(_response_adapter.validate_python(dtos))
+
+
+def _timed(func, *args) -> float:
+    return min(_once(func, *args) for _ in range(3))
+
+
+def _once(func, *args) -> float:
+    started = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - started
+
+
+def main(sizes: list[int]):
+    sample = generate_expenses(1_000, seed=7)
+    assert _response_adapter.validate_json(dump_expenses(sample, {})) == _response_adapter.validate_json(
+        encode_with_dtos(sample)
+    ), "fast path and DTO path disagree"
+
+    print(f"{'expenses':>10} {'dto path':>9} {'fast path':>10} {'speedup':>8} {'body':>9}")
+    for size in sizes:
+        expenses = generate_expenses(size)
+        dto = _timed(encode_with_dtos, expenses)
+        fast = _timed(dump_expenses, expenses, {})
+        body_mb = len(dump_expenses(expenses, {})) / 1e6
+        print(f"{size:>10,} {dto:>8.3f}s {fast:>9.3f}s {dto / fast:>7.1f}x {body_mb:>7.1f}MB")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
@@ -0,0 +1,96 @@
+"""
+Benchmark peak memory and time to first byte of buffered vs streamed expense listings.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_expense_streaming                # 10k, 100k and 1M expenses
+    python -m benchmarks.bench_expense_streaming 250000         # custom sizes
+
+Each size is written as a file-system snapshot in a temporary directory, then
+each mode runs in a fresh child process so its peak RSS (ru_maxrss) is not
+polluted by the parent or by the other mode. "idle" is the child's footprint
+after imports, before reading anything.
+"""
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.bench_expense_summary import generate_expenses
+
+MODES = ("idle", "buffered", "stream")
+
+
+async def _run_child(mode: str) -> dict:
+    from app.dto.expense_dto import ExpenseQueryDTO
+    from app.services.expense_service import ExpenseService
+
+    service = ExpenseService()
+    started = time.perf_counter()
+    first_byte = None
+    size = 0
+    if mode == "buffered":
+        body, _ = await service.list_expenses_json(1)
+        first_byte = time.perf_counter() - started
+        size = len(body)
+    elif mode == "stream":
+        async for chunk in service.stream_expenses_json(1, ExpenseQueryDTO(stream=True)):
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+            size += len(chunk)
+    return {
+        "ttfb": first_byte or 0.0,
+        "total": time.perf_counter() - started,
+        "bytes": size,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def _child(mode: str, workdir: str):
+    os.chdir(workdir)
+    print(json.dumps(asyncio.run(_run_child(mode))))
+
+
+def _measure(mode: str, workdir: str) -> dict:
+    env = {
+        **os.environ,
+        "STORAGE_BACKEND": "filesystem",
+        # Measure the listing itself, not the caches that would keep it warm
+        "STORAGE_CACHE_MAX_BYTES": "0",
+        "EXPENSE_INDEX_MAX_USERS": "0",
+        "LOG_LEVEL": "WARNING",
+        "PYTHONPATH": str(Path(__file__).resolve().parent.parent),
+    }
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_expense_streaming", "--child", mode, workdir],
+        env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(sizes: list[int]):
+    print(f"{'expenses':>10} {'mode':>9} {'ttfb':>8} {'total':>8} {'peak RSS over idle':>19}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as workdir:
+            user_dir = Path(workdir) / "data" / "user_1"
+            user_dir.mkdir(parents=True)
+            with (user_dir / "expenses.json").open("w", encoding="utf-8") as file:
+                json.dump(generate_expenses(size), file, indent=2)
+
+            results = {mode: _measure(mode, workdir) for mode in MODES}
+            idle_kb = results["idle"]["peak_rss_kb"]
+            for mode in MODES[1:]:
+                result = results[mode]
+                over_idle_mb = (result["peak_rss_kb"] - idle_kb) / 1024
+                print(f"{size:>10,} {mode:>9} {result['ttfb']:>7.3f}s {result['total']:>7.3f}s {over_idle_mb:>16.1f}MB")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        _child(sys.argv[2], sys.argv[3])
+    else:
+        main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
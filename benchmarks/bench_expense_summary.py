@@ -0,0 +1,98 @@
+"""
+Benchmark the NumPy spending summary against a pure-Python loop.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_expense_summary                 # 10k, 100k and 1M expenses
+    python -m benchmarks.bench_expense_summary 50000 200000    # custom sizes
+
+For each size it reports the time to build the columnar arrays, the time to
+summarize the cached columns (what a repeated dashboard load costs) and the
+time of the pure-Python baseline over the same rows.
+"""
+import datetime
+import random
+import sys
+import time
+from collections import defaultdict
+
+from app.services.expense_summary import ExpenseColumns, summarize
+
+CATEGORIES = [
+    "Food & Dining", "Transportation", "Shopping", "Entertainment", "Bills & Utilities",
+    "Healthcare", "Travel", "Education", "Personal Care",
+]
+
+
+def generate_expenses(count: int, seed: int = 42) -> list[dict]:
+    rng = random.Random(seed)
+    start = datetime.date(2020, 1, 1).toordinal()
+    return [
+        {
+            "id": i + 1,
+            "amount": round(rng.uniform(1, 500), 2),
+            "description": f"expense {i}",
+            "date": datetime.date.fromordinal(start + rng.randrange(5 * 365)).isoformat(),
+            "category": rng.choice(CATEGORIES),
+        }
+        for i in range(count)
+    ]
+
+
+def summarize_python(expenses: list[dict]) -> dict:
+    """Baseline: the same grouping done with dicts in a single Python loop."""
+    groups = {name: defaultdict(lambda: [0.0, 0, float("inf"), float("-inf")]) for name in
+              ("by_category", "by_day", "by_week", "by_month")}
+    for expense in expenses:
+        day = datetime.date.fromisoformat(expense["date"])
+        amount = float(expense["amount"])
+        year, week, _ = day.isocalendar()
+        keys = {
+            "by_category": expense.get("category"),
+            "by_day": day.isoformat(),
+            "by_week": f"{year}-W{week:02d}",
+            "by_month": f"{day.year}-{day.month:02d}",
+        }
+        for name, key in keys.items():
+            bucket = groups[name][key]
+            bucket[0] += amount
+            bucket[1] += 1
+            bucket[2] = min(bucket[2], amount)
+            bucket[3] = max(bucket[3], amount)
+    return {
+        name: {key: (round(total, 2), count, low, high) for key, (total, count, low, high) in buckets.items()}
+        for name, buckets in groups.items()
+    }
+
+
+def _check(expenses: list[dict]):
+    """Make sure both implementations agree before timing them."""
+    vectorized = summarize(ExpenseColumns.build(expenses))
+    baseline = summarize_python(expenses)
+    for name, rows in baseline.items():
+        got = {row["key"]: (row["total"], row["count"], row["min"], row["max"]) for row in vectorized[name]}
+        assert got.keys() == rows.keys(), name
+        for key, (total, count, low, high) in rows.items():
+            assert got[key][1:] == (count, low, high), (name, key)
+            assert abs(got[key][0] - total) < 0.01, (name, key)
+
+
+def _timed(func, *args) -> float:
+    started = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - started
+
+
+def main(sizes: list[int]):
+    _check(generate_expenses(2_000, seed=7))
+    print(f"{'expenses':>10} {'build cols':>11} {'numpy':>9} {'python':>9} {'speedup':>8}")
+    for size in sizes:
+        expenses = generate_expenses(size)
+        build = _timed(ExpenseColumns.build, expenses)
+        columns = ExpenseColumns.build(expenses)
+        vectorized = min(_timed(summarize, columns) for _ in range(3))
+        baseline = _timed(summarize_python, expenses)
+        print(f"{size:>10,} {build:>10.3f}s {vectorized:>8.3f}s {baseline:>8.3f}s {baseline / vectorized:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
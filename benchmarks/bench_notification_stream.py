@@ -0,0 +1,176 @@
+"""
+Load-test the notification stream with thousands of idle SSE connections on one worker.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_notification_stream              # 1k and 5k connections
+    python -m benchmarks.bench_notification_stream 10000        # custom counts
+
+For each count a single uvicorn worker is started on a temporary data
+directory and SQLite database. One user opens that many streams; the
+benchmark records the server's memory per connection and its CPU use while
+the streams only exchange heartbeats, then triggers a budget alert and
+measures how long the fan-out takes to reach every stream. The client side
+runs in this one process, so at high counts the fan-out time includes its own
+parsing. Linux only (reads /proc); the open-file limit is raised to its hard
+maximum.
+"""
+import asyncio
+import datetime
+import os
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+# Heartbeat used during the idle window, so it is not dominated by a single keep-alive round
+HEARTBEAT_SECONDS = 5
+IDLE_SECONDS = 15
+CONNECT_CONCURRENCY = 200
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _rss_kb(pid: int) -> int:
+    for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+        if line.startswith("VmRSS:"):
+            return int(line.split()[1])
+    return 0
+
+
+def _cpu_seconds(pid: int) -> float:
+    fields = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+    # utime and stime, fields 14 and 15 of /proc/<pid>/stat
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _start_server(workdir: str, port: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "STORAGE_BACKEND": "filesystem",
+        "DATABASE_URL": f"sqlite+aiosqlite:///{workdir}/bench.sqlite",
+        "USER_LOCK_DIR": f"{workdir}/locks",
+        "NOTIFICATION_STREAM_HEARTBEAT_SECONDS": str(HEARTBEAT_SECONDS),
+        "LOG_LEVEL": "WARNING",
+    }
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--port", str(port), "--workers", "1", "--no-access-log", "--log-level", "warning",
+            "--app-dir", str(Path(__file__).resolve().parent.parent),
+        ],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+async def _wait_ready(client: httpx.AsyncClient):
+    for _ in range(100):
+        try:
+            await client.get("/api/health")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+async def _stream(port: int, cookie: str, semaphore: asyncio.Semaphore, ready: list, received: list):
+    """
+    One stream over a plain socket (a pooled HTTP client would dominate at these
+    counts): note when it is established and when the first notification arrives.
+    """
+    async with semaphore:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(
+            f"GET /api/notifications/stream HTTP/1.1\r\nHost: 127.0.0.1\r\nCookie: {cookie}\r\n"
+            f"Accept: text/event-stream\r\n\r\n".encode()
+        )
+        await writer.drain()
+    try:
+        while line := await reader.readline():
+            if line.startswith(b"retry:"):
+                ready.append(time.perf_counter())
+            elif line.startswith(b"id:"):
+                received.append(time.perf_counter())
+                return
+    finally:
+        writer.close()
+
+
+async def _run(connections: int) -> dict:
+    with tempfile.TemporaryDirectory() as workdir:
+        port = _free_port()
+        server = _start_server(workdir, port)
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None) as client:
+                await _wait_ready(client)
+                await client.post("/api/signup", json={
+                    "email": "bench@example.com", "password": "benchmark1", "firstname": "B", "lastname": "B",
+                })
+                await client.put("/api/settings", json={"daily": 1, "weekly": 1, "monthly": 1})
+                cookie = "; ".join(f"{name}={value}" for name, value in client.cookies.items())
+                baseline_kb = _rss_kb(server.pid)
+
+                ready, received = [], []
+                semaphore = asyncio.Semaphore(CONNECT_CONCURRENCY)
+                started = time.perf_counter()
+                streams = [
+                    asyncio.create_task(_stream(port, cookie, semaphore, ready, received))
+                    for _ in range(connections)
+                ]
+                while len(ready) < connections:
+                    await asyncio.sleep(0.05)
+                connect_seconds = max(ready) - started
+                connected_kb = _rss_kb(server.pid)
+
+                cpu_before = _cpu_seconds(server.pid)
+                await asyncio.sleep(IDLE_SECONDS)
+                idle_cpu = (_cpu_seconds(server.pid) - cpu_before) / IDLE_SECONDS
+
+                triggered = time.perf_counter()
+                await client.post("/api/expenses/", json={
+                    "amount": 5, "description": "bench", "date": datetime.date.today().isoformat(), "category": "Bench",
+                })
+                await asyncio.wait_for(asyncio.gather(*streams), timeout=60)
+        finally:
+            server.terminate()
+            server.wait()
+
+    latencies = sorted(at - triggered for at in received)
+    return {
+        "connect_seconds": connect_seconds,
+        "kb_per_connection": (connected_kb - baseline_kb) / connections,
+        "idle_cpu_percent": idle_cpu * 100,
+        "delivered": len(received),
+        "p50": statistics.median(latencies),
+        "p99": latencies[int(len(latencies) * 0.99) - 1],
+        "max": latencies[-1],
+    }
+
+
+def main(counts: list[int]):
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    print(
+        f"{'streams':>8} {'connect':>8} {'RSS/stream':>11} {'idle CPU':>9} "
+        f"{'delivered':>10} {'fan-out p50':>12} {'p99':>8} {'max':>8}"
+    )
+    for count in counts:
+        result = asyncio.run(_run(count))
+        print(
+            f"{count:>8,} {result['connect_seconds']:>7.2f}s {result['kb_per_connection']:>8.1f}KB "
+            f"{result['idle_cpu_percent']:>8.1f}% {result['delivered']:>10,} "
+            f"{result['p50'] * 1000:>10.1f}ms {result['p99'] * 1000:>6.1f}ms {result['max'] * 1000:>6.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1_000, 5_000])
@@ -1,3 +1,4 @@
+import asyncio
 import os
 
 from fastapi import FastAPI, HTTPException, Request
@@ -26,10 +27,52 @@ async def lifespan(app: FastAPI):
     # Initialize database
     from app.core.database import init_db
     await init_db()
+
+    # Initialize the shared storage backend and its connection pool
+    from app.services.storage.storage_factory import init_storage
+    await init_storage()
+
+    # Budget-limit checks run in background workers, off the write path
+    from app.services.expense_service import ExpenseService
+    from app.services.limit_check_queue import limit_check_queue, log_limit_queue_stats
+    limit_check_queue.start(ExpenseService().check_limits)
+
+    # Periodic sweep for breaches no write triggered (e.g. CSV imports)
+    sweep_task = None
+    if settings.LIMIT_SWEEP_INTERVAL_SECONDS > 0:
+        from app.commands.limit_sweep import run_scheduled_sweeps
+        sweep_task = asyncio.create_task(run_scheduled_sweeps(settings.LIMIT_SWEEP_INTERVAL_SECONDS))
+
+    # Periodic notification retention sweep
+    compaction_task = None
+    if settings.NOTIFICATION_COMPACTION_INTERVAL_SECONDS > 0:
+        from app.commands.notification_compaction import run_scheduled_compactions
+        compaction_task = asyncio.create_task(
+            run_scheduled_compactions(settings.NOTIFICATION_COMPACTION_INTERVAL_SECONDS)
+        )
     
     yield
     
-    # Shutdown
+    # Shutdown: stop sweeping, then drain queued limit checks while storage is still open
+    for task in (sweep_task, compaction_task):
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+    await limit_check_queue.stop(settings.LIMIT_CHECK_DRAIN_TIMEOUT_SECONDS)
+    log_limit_queue_stats()
+
+    from app.services.notification_hub import log_notification_hub_stats
+    log_notification_hub_stats()
+
+    from app.services.category_service import log_category_cache_stats
+    log_category_cache_stats()
+
+    from app.services.storage.cached_storage import log_cache_stats
+    log_cache_stats()
+
+    from app.services.storage.storage_factory import close_storage
+    await close_storage()
+
     from app.core.database import close_db
     await close_db()
     logger.info("Shutting down application")
@@ -48,12 +91,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 # Register exception handlers
 @app.exception_handler(RequestValidationError)
 async def handle_validation_exception(request: Request, exc: RequestValidationError):
-    return validation_exception_handler(request, exc)
+    return await validation_exception_handler(request, exc)
 
 @app.exception_handler(Exception)
 async def handle_global_exception(request: Request, exc: Exception):
@@ -0,0 +1,64 @@
+"""
+End-to-end checks of the HTTP contracts against a throwaway data directory
+and SQLite database. The storage backend defaults to the file system; run
+with STORAGE_BACKEND=sql to exercise the SQL backend instead.
+"""
+import itertools
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+_workdir = tempfile.mkdtemp(prefix="expense-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_workdir}/test.sqlite"
+os.environ["USER_LOCK_DIR"] = f"{_workdir}/locks"
+os.environ.setdefault("STORAGE_BACKEND", "filesystem")
+# Documents live under ./data, so every run starts from an empty directory
+os.chdir(_workdir)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+from app.services.limit_check_queue import limit_check_queue  # noqa: E402
+
+_emails = itertools.count(1)
+
+
+def sign_up(client: TestClient) -> int:
+    """Create a user and keep its session cookie on `client`. Returns the user id."""
+    response = client.post("/api/signup", json={
+        "email": f"user{next(_emails)}@example.com",
+        "password": "password1",
+        "firstname": "Test",
+        "lastname": "User",
+    })
+    assert response.status_code == 200, response.text
+    return client.get("/api/user/me").json()["id"]
+
+
+def settle_limit_checks(client: TestClient):
+    """Wait for the limit checks queued by earlier writes, and the notifications they send."""
+    client.portal.call(limit_check_queue.join)
+
+
+@pytest.fixture
+def client():
+    """A client signed in as a new user, with the app's lifespan running."""
+    with TestClient(main.app) as test_client:
+        test_client.user_id = sign_up(test_client)
+        yield test_client
+
+
+@pytest.fixture
+def sql_only():
+    if os.environ["STORAGE_BACKEND"] != "sql":
+        pytest.skip("needs the SQL storage backend")
+
+
+@pytest.fixture
+def documents_only():
+    if os.environ["STORAGE_BACKEND"] == "sql":
+        pytest.skip("needs a document storage backend")
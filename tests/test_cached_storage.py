@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from app.services.storage.cached_storage import CachedStorage, StorageCache
+from app.services.storage.file_system_storage import FileSystemStorage
+from app.services.storage.storage_base import FileStorage
+from app.services.storage.user_locks import user_locks
+from app.utils.file_manager import get_user_dir
+
+
+class _UnstattableStorage(FileSystemStorage):
+    """The file system posing as a backend that cannot stat, like Supabase."""
+
+    supports_stat = False
+
+
+def _worker(backend: FileStorage | None = None) -> CachedStorage:
+    """A worker process's view of storage: its own cache over the shared backend."""
+    return CachedStorage(backend or FileSystemStorage(), StorageCache(1 << 20, ttl_seconds=60))
+
+
+@pytest.fixture
+def run(client):
+    return client.portal.call
+
+
+def test_stat_backends_see_other_workers_writes_at_once(run, client):
+    first, second = _worker(), _worker()
+    run(first.save_file, client.user_id, "doc.json", [{"v": 1}])
+    assert run(first.load_file, client.user_id, "doc.json") == [{"v": 1}]
+    run(second.save_file, client.user_id, "doc.json", [{"v": 2}])
+    assert run(first.load_file, client.user_id, "doc.json") == [{"v": 2}]
+
+
+async def _locked_load(storage: CachedStorage, user_id: int, filename: str) -> list:
+    async with user_locks.lock(user_id):
+        return await storage.load_file(user_id, filename)
+
+
+async def _locked_append(storage: CachedStorage, user_id: int, filename: str, record: dict) -> list:
+    async with user_locks.lock(user_id):
+        await storage.save_file(user_id, filename, await storage.load_file(user_id, filename) + [record])
+        return await storage.load_file(user_id, filename)
+
+
+def test_read_modify_writes_start_from_the_stored_document_without_stat(run, client):
+    first, second = _worker(_UnstattableStorage()), _worker(_UnstattableStorage())
+    run(first.save_file, client.user_id, "doc.json", [{"v": 1}])
+    assert run(first.load_file, client.user_id, "doc.json") == [{"v": 1}]
+    run(second.save_file, client.user_id, "doc.json", [{"v": 1}, {"v": 2}])
+
+    # Plain reads may be served from the cache within its TTL
+    assert run(first.load_file, client.user_id, "doc.json") == [{"v": 1}]
+    # A write under the user's lock keeps the other worker's change
+    assert run(_locked_append, first, client.user_id, "doc.json", {"v": 3}) == [{"v": 1}, {"v": 2}, {"v": 3}]
+    assert run(_locked_load, second, client.user_id, "doc.json") == [{"v": 1}, {"v": 2}, {"v": 3}]
+
+
+def test_same_size_rewrites_within_one_mtime_tick_are_seen(run, client):
+    first, second = _worker(), _worker()
+    path = get_user_dir(client.user_id) / "doc.json"
+    run(first.save_file, client.user_id, "doc.json", [{"v": 1}])
+    assert run(first.load_file, client.user_id, "doc.json") == [{"v": 1}]
+    version = first.document_version(client.user_id, "doc.json")
+    mtime_ns = path.stat().st_mtime_ns
+
+    run(second.save_file, client.user_id, "doc.json", [{"v": 2}])
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+    assert run(first.load_file, client.user_id, "doc.json") == [{"v": 2}]
+    assert first.document_version(client.user_id, "doc.json") != version
@@ -0,0 +1,117 @@
+import pytest
+
+from app.commands.migrate_categories import migrate_documents
+from app.services.category_service import CATEGORIES_FILE
+from app.services.category_table import DEFAULT_TABLE
+from app.services.storage.expense_log import SNAPSHOT_FILE, ExpenseLog
+from app.services.storage.storage_factory import storage_factory
+from app.utils.file_manager import get_user_dir
+from conftest import sign_up
+
+
+def _add(client, category: str, description: str = "spend") -> dict:
+    return client.post("/api/expenses/", json={
+        "amount": 5, "description": description, "date": "2026-01-05", "category": category,
+    }).json()
+
+
+def _categories(client) -> list[str]:
+    response = client.get("/api/categories")
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _expense_categories(client, **params) -> list[str]:
+    return [expense["category"] for expense in client.get("/api/expenses", params=params).json()]
+
+
+@pytest.fixture
+def travel(client):
+    assert "Travel" in _categories(client)
+    return _add(client, "Travel", "flight")
+
+
+def test_renaming_a_category_renames_its_expenses(client, travel):
+    response = client.put("/api/categories", json={"old_name": "Travel", "new_name": "Trips"})
+    assert response.status_code == 204
+    assert "Trips" in _categories(client) and "Travel" not in _categories(client)
+    assert _expense_categories(client) == ["Trips"]
+    assert _expense_categories(client, category="Trips") == ["Trips"]
+    assert _expense_categories(client, category="Travel") == []
+    assert [hit["category"] for hit in client.get("/api/expenses/search", params={"q": "flight"}).json()] == ["Trips"]
+
+
+def test_renames_to_or_from_unknown_names_are_rejected(client, travel):
+    assert client.put("/api/categories", json={"old_name": "Missing", "new_name": "X"}).status_code == 404
+    assert client.put("/api/categories", json={"old_name": "Travel", "new_name": "Education"}).status_code == 400
+
+
+def test_deleted_categories_are_unlisted_but_keep_their_expenses_named(client, travel):
+    assert client.request("DELETE", "/api/categories", json={"name": "Travel"}).status_code == 204
+    assert "Travel" not in _categories(client)
+    assert _expense_categories(client) == ["Travel"]
+    assert client.request("DELETE", "/api/categories", json={"name": "Travel"}).status_code == 404
+
+    assert "Travel" in client.post("/api/categories", json={"name": "Travel"}).json()
+    assert client.post("/api/categories", json={"name": "Travel"}).status_code == 400
+
+
+def test_names_only_used_on_expenses_stay_unlisted(client):
+    _add(client, "Garden")
+    assert "Garden" not in _categories(client)
+    assert _expense_categories(client, category="Garden") == ["Garden"]
+    # Listing the name later keeps its expenses attached
+    client.post("/api/categories", json={"name": "Garden"})
+    client.put("/api/categories", json={"old_name": "Garden", "new_name": "Yard"})
+    assert _expense_categories(client) == ["Yard"]
+
+
+def test_new_users_see_the_default_categories(client):
+    assert _categories(client) == DEFAULT_TABLE.listed()
+
+
+def _store_legacy_documents(client):
+    """Categories and expenses as stored before category ids: plain names everywhere."""
+    storage = storage_factory()
+    rows = [
+        {"id": 1, "amount": 5.0, "description": "flight", "date": "2026-01-05", "category": "Travel"},
+        {"id": 2, "amount": 7.0, "description": "seeds", "date": "2026-01-06", "category": "Garden"},
+    ]
+    client.portal.call(storage.save_file, client.user_id, CATEGORIES_FILE, ["Travel", "Food"])
+    client.portal.call(storage.save_file, client.user_id, SNAPSHOT_FILE, rows)
+
+
+def test_legacy_documents_resolve_by_name_before_and_after_migrating(client, documents_only):
+    _store_legacy_documents(client)
+    assert _categories(client) == ["Travel", "Food"]
+    assert _expense_categories(client) == ["Travel", "Garden"]
+
+    stats = client.portal.call(migrate_documents, [client.user_id])
+    assert (stats["migrated"], stats["expenses"]) == (1, 2)
+    rows = client.portal.call(ExpenseLog(storage_factory()).load, client.user_id)
+    assert all("category_id" in row for row in rows)
+    assert _categories(client) == ["Travel", "Food"]
+    assert _expense_categories(client) == ["Travel", "Garden"]
+
+    client.put("/api/categories", json={"old_name": "Travel", "new_name": "Trips"})
+    assert _expense_categories(client) == ["Trips", "Garden"]
+    assert client.portal.call(migrate_documents, [client.user_id])["migrated"] == 0
+
+
+def test_reading_categories_never_writes(client, documents_only):
+    categories_file = get_user_dir(client.user_id) / CATEGORIES_FILE
+    first = client.get("/api/categories")
+    # Expenses in a default category need no table of their own
+    _add(client, "Travel")
+    assert not categories_file.exists()
+    assert client.get("/api/categories", headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+
+    client.post("/api/categories", json={"name": "Garden"})
+    assert categories_file.exists()
+
+
+def test_cached_tables_are_per_user(client):
+    client.post("/api/categories", json={"name": "Garden"})
+    assert "Garden" in _categories(client)
+    sign_up(client)
+    assert _categories(client) == DEFAULT_TABLE.listed()
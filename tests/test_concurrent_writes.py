@@ -0,0 +1,30 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _add(client, number: int) -> dict:
+    response = client.post("/api/expenses/", json={
+        "amount": number, "description": f"expense {number}", "date": "2026-01-05", "category": f"Category {number}",
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_concurrent_adds_keep_every_expense_and_category(client):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        added = list(pool.map(lambda number: _add(client, number), range(1, 41)))
+
+    assert sorted(expense["id"] for expense in added) == list(range(1, 41))
+    listed = client.get("/api/expenses").json()
+    assert sorted(expense["description"] for expense in listed) == sorted(f"expense {n}" for n in range(1, 41))
+    assert {expense["category"] for expense in listed} == {f"Category {n}" for n in range(1, 41)}
+    assert client.get("/api/expenses/summary").json()["overall"]["total"] == sum(range(1, 41))
+
+
+def test_concurrent_category_changes_are_all_kept(client):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        responses = list(pool.map(
+            lambda number: client.post("/api/categories", json={"name": f"Custom {number}"}), range(20)
+        ))
+    assert {response.status_code for response in responses} == {201}
+    listed = client.get("/api/categories").json()
+    assert {f"Custom {number}" for number in range(20)} <= set(listed)
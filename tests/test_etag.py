@@ -0,0 +1,64 @@
+import datetime
+
+import pytest
+
+from conftest import settle_limit_checks, sign_up
+
+
+def _expense(amount: float) -> dict:
+    return {"amount": amount, "description": "spend", "date": datetime.date.today().isoformat(), "category": "Food"}
+
+
+def _revalidate(client, path: str, **kwargs):
+    """GET `path`, then again with the returned ETag. Returns (first response, revalidation)."""
+    first = client.get(path, **kwargs)
+    assert first.status_code == 200, first.text
+    etag = first.headers["etag"]
+    headers = {**kwargs.pop("headers", {}), "If-None-Match": etag}
+    return first, client.get(path, headers=headers, **kwargs)
+
+
+CHANGES = {
+    "/api/expenses": lambda client: client.post("/api/expenses/", json=_expense(5)),
+    "/api/categories": lambda client: client.post("/api/categories", json={"name": "Garden"}),
+    "/api/settings": lambda client: client.put("/api/settings", json={"daily": 1, "weekly": 0, "monthly": 0}),
+    "/api/notifications": lambda client: client.post("/api/expenses/", json=_expense(50)),
+    "/api/notifications/unread-count": lambda client: client.post("/api/expenses/", json=_expense(50)),
+}
+
+
+@pytest.mark.parametrize("path", list(CHANGES))
+def test_unchanged_reads_answer_not_modified_until_the_data_changes(client, path):
+    client.put("/api/settings", json={"daily": 10, "weekly": 0, "monthly": 0})
+    first, again = _revalidate(client, path)
+    assert again.status_code == 304
+    assert again.headers["etag"] == first.headers["etag"]
+    assert again.content == b""
+
+    CHANGES[path](client)
+    settle_limit_checks(client)
+    changed = client.get(path, headers={"If-None-Match": first.headers["etag"]})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != first.headers["etag"]
+
+
+def test_listing_etags_depend_on_the_query(client):
+    client.post("/api/expenses/", json=_expense(5))
+    etag = client.get("/api/expenses").headers["etag"]
+    filtered = client.get("/api/expenses", params={"min_amount": 10}, headers={"If-None-Match": etag})
+    assert filtered.status_code == 200
+    assert filtered.json() == []
+
+
+def test_etags_are_not_shared_between_users(client):
+    client.post("/api/expenses/", json=_expense(5))
+    etag = client.get("/api/expenses").headers["etag"]
+    sign_up(client)
+    other = client.get("/api/expenses", headers={"If-None-Match": etag})
+    assert other.status_code == 200
+    assert other.json() == []
+
+
+def test_responses_are_private_and_revalidated(client):
+    response = client.get("/api/categories")
+    assert response.headers["cache-control"] == "private, no-cache"
@@ -0,0 +1,55 @@
+def _expense(amount: float, description: str = "spend") -> dict:
+    return {"amount": amount, "description": description, "date": "2026-01-05", "category": "Food"}
+
+
+def _batch(client, *operations: dict) -> dict:
+    response = client.post("/api/expenses/batch", json={"operations": list(operations)})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_batch_applies_operations_in_order(client):
+    existing = client.post("/api/expenses/", json=_expense(3, "old")).json()
+
+    body = _batch(
+        client,
+        {"op": "create", "expense": _expense(10, "first")},
+        {"op": "create", "expense": _expense(20, "second")},
+        {"op": "update", "id": existing["id"], "expense": _expense(4, "changed")},
+        {"op": "delete", "id": existing["id"]},
+    )
+    assert [(r["op"], r["status"], r["id"]) for r in body["results"]] == [
+        ("create", 201, 2), ("create", 201, 3), ("update", 200, 1), ("delete", 200, 1),
+    ]
+    assert [(e["id"], e["description"]) for e in client.get("/api/expenses").json()] == [(2, "first"), (3, "second")]
+    assert client.get("/api/expenses/summary").json()["overall"]["total"] == 30
+
+
+def test_failed_operations_are_reported_and_the_rest_apply(client):
+    body = _batch(
+        client,
+        {"op": "update", "id": 99, "expense": _expense(5)},
+        {"op": "create"},
+        {"op": "create", "expense": _expense(7)},
+        {"op": "delete", "id": 99},
+    )
+    assert [(r["index"], r["status"]) for r in body["results"]] == [(0, 404), (1, 422), (2, 201), (3, 404)]
+    assert [e["amount"] for e in client.get("/api/expenses").json()] == [7]
+
+
+def test_operations_see_expenses_created_earlier_in_the_batch(client):
+    body = _batch(
+        client,
+        {"op": "create", "expense": _expense(1)},
+        {"op": "update", "id": 1, "expense": _expense(2)},
+        {"op": "delete", "id": 1},
+        {"op": "update", "id": 1, "expense": _expense(3)},
+    )
+    assert [r["status"] for r in body["results"]] == [201, 200, 200, 404]
+    assert client.get("/api/expenses").json() == []
+
+
+def test_invalid_batches_are_rejected(client):
+    assert client.post("/api/expenses/batch", json={"operations": []}).status_code == 422
+    operations = [{"op": "create", "expense": _expense(1)}] * 501
+    assert client.post("/api/expenses/batch", json={"operations": operations}).status_code == 422
@@ -0,0 +1,87 @@
+import pytest
+
+EXPENSES = [
+    (5, "2026-01-03", "Food", "groceries"),
+    (20, "2026-01-01", "Bills", "electricity"),
+    (12, "2026-02-10", "Food", "restaurant"),
+    (7, "2026-03-01", "Transport", "train ticket"),
+]
+
+
+@pytest.fixture
+def expenses(client):
+    """The EXPENSES stored for the client's user, in id order."""
+    return [
+        client.post("/api/expenses/", json={
+            "amount": amount, "date": day, "category": category, "description": description,
+        }).json()
+        for amount, day, category, description in EXPENSES
+    ]
+
+
+def _ids(response) -> list[int]:
+    assert response.status_code == 200, response.text
+    return [expense["id"] for expense in response.json()]
+
+
+def test_listing_without_a_query_returns_every_expense_in_id_order(client, expenses):
+    response = client.get("/api/expenses")
+    assert response.json() == expenses
+    assert "x-next-cursor" not in response.headers
+
+
+@pytest.mark.parametrize("params, expected", [
+    ({"start_date": "2026-01-02", "end_date": "2026-02-28"}, [1, 3]),
+    ({"category": "Food"}, [1, 3]),
+    ({"min_amount": 6, "max_amount": 12}, [3, 4]),
+    ({"category": "Food", "min_amount": 6}, [3]),
+    ({"sort": "date"}, [2, 1, 3, 4]),
+    ({"sort": "-amount"}, [2, 3, 4, 1]),
+])
+def test_listing_filters_and_sorts(client, expenses, params, expected):
+    assert _ids(client.get("/api/expenses", params=params)) == expected
+
+
+@pytest.mark.parametrize("sort", ["id", "-date", "-amount"])
+def test_cursor_pages_cover_the_listing_once(client, expenses, sort):
+    full = _ids(client.get("/api/expenses", params={"sort": sort}))
+    paged, cursor = [], None
+    while True:
+        params = {"sort": sort, "limit": 3, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/expenses", params=params)
+        paged += _ids(response)
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+    assert paged == full
+
+
+def test_a_page_does_not_shift_when_earlier_rows_are_deleted(client, expenses):
+    first = client.get("/api/expenses", params={"limit": 2})
+    client.delete("/api/expenses/1")
+    second = client.get("/api/expenses", params={"limit": 2, "cursor": first.headers["x-next-cursor"]})
+    assert _ids(second) == [3, 4]
+
+
+def test_invalid_cursors_and_page_sizes_are_rejected(client, expenses):
+    assert client.get("/api/expenses", params={"limit": 2, "cursor": "garbage"}).status_code == 400
+    assert client.get("/api/expenses", params={"limit": 0}).status_code == 422
+
+
+def test_streamed_listing_matches_the_buffered_one(client, expenses):
+    response = client.get("/api/expenses", params={"stream": True})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == expenses
+
+    filtered = client.get("/api/expenses", params={"stream": True, "category": "Food", "start_date": "2026-02-01"})
+    assert _ids(filtered) == [3]
+
+
+def test_streaming_an_empty_history_is_an_empty_array(client):
+    assert client.get("/api/expenses", params={"stream": True}).json() == []
+
+
+@pytest.mark.parametrize("params", [{"sort": "-date"}, {"limit": 2}])
+def test_streaming_does_not_sort_or_page(client, expenses, params):
+    assert client.get("/api/expenses", params={"stream": True, **params}).status_code == 400
@@ -0,0 +1,53 @@
+import pytest
+
+
+@pytest.fixture
+def expenses(client):
+    for description, category in [
+        ("Coffee beans", "Food"),
+        ("Coffee with friends", "Entertainment"),
+        ("Train to the office", "Transport"),
+        ("Office chair", "Shopping"),
+    ]:
+        client.post("/api/expenses/", json={
+            "amount": 5, "description": description, "date": "2026-01-05", "category": category,
+        })
+
+
+def _search(client, q: str, **params) -> list[str]:
+    response = client.get("/api/expenses/search", params={"q": q, **params})
+    assert response.status_code == 200, response.text
+    return [hit["description"] for hit in response.json()]
+
+
+def test_every_word_must_match_as_a_word_or_prefix(client, expenses):
+    assert sorted(_search(client, "coffee")) == ["Coffee beans", "Coffee with friends"]
+    assert _search(client, "coff frie") == ["Coffee with friends"]
+    assert sorted(_search(client, "OFFICE")) == ["Office chair", "Train to the office"]
+    assert _search(client, "offices") == []
+
+
+def test_descriptions_rank_above_categories(client, expenses):
+    client.post("/api/expenses/", json={
+        "amount": 5, "description": "Weekly shop", "date": "2026-01-06", "category": "Food",
+    })
+    client.post("/api/expenses/", json={
+        "amount": 5, "description": "Food market", "date": "2026-01-06", "category": "Shopping",
+    })
+    hits = client.get("/api/expenses/search", params={"q": "food"}).json()
+    assert hits[0]["description"] == "Food market"
+    assert [hit["score"] for hit in hits] == sorted((hit["score"] for hit in hits), reverse=True)
+
+
+def test_search_follows_updates_and_deletes(client, expenses):
+    client.put("/api/expenses/1", json={
+        "amount": 5, "description": "Tea leaves", "date": "2026-01-05", "category": "Food",
+    })
+    client.delete("/api/expenses/2")
+    assert _search(client, "coffee") == []
+    assert _search(client, "tea") == ["Tea leaves"]
+
+
+def test_results_are_limited(client, expenses):
+    assert len(_search(client, "o", limit=1)) == 1
+    assert client.get("/api/expenses/search", params={"q": ""}).status_code == 422
@@ -0,0 +1,124 @@
+import datetime
+import gzip
+import json
+
+import pytest
+
+from app.services.storage.expense_log import LOG_FILE, ExpenseLog
+from app.services.storage.sql_storage import SqlStorage
+from app.services.storage.storage_factory import storage_factory
+from app.utils.file_manager import get_user_dir
+
+
+@pytest.fixture
+def user_dir(client, documents_only):
+    return get_user_dir(client.user_id)
+
+
+def _add(client, day: str, description: str = "spend") -> dict:
+    return client.post("/api/expenses/", json={
+        "amount": 5, "description": description, "date": day, "category": "Food",
+    }).json()
+
+
+def _compact(client) -> int:
+    return client.portal.call(ExpenseLog(storage_factory()).compact, client.user_id)
+
+
+def _month(months_ago: int) -> str:
+    """'YYYY-MM' of the month `months_ago` before the current one."""
+    today = datetime.date.today()
+    index = today.year * 12 + today.month - 1 - months_ago
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def _listing(client) -> list[tuple[int, str]]:
+    return [(e["id"], e["description"]) for e in client.get("/api/expenses").json()]
+
+
+def test_writes_append_to_the_log_until_it_is_compacted(client, user_dir):
+    first = _add(client, "2026-01-05", "first")
+    _add(client, "2026-01-06", "second")
+    client.put(f"/api/expenses/{first['id']}", json={**first, "description": "changed"})
+    client.delete("/api/expenses/2")
+    before = _listing(client)
+    assert before == [(1, "changed")]
+
+    assert _compact(client) == 4
+    assert (user_dir / LOG_FILE).read_text() == ""
+    assert _listing(client) == before
+    assert _compact(client) == 0
+
+
+def test_ids_are_never_reused_after_deletes(client, user_dir):
+    _add(client, "2026-01-05")
+    second = _add(client, "2026-01-05")
+    client.delete(f"/api/expenses/{second['id']}")
+    _compact(client)
+    assert _add(client, "2026-01-05")["id"] == 3
+
+
+def test_compaction_partitions_by_month_and_archives_old_years(client, user_dir):
+    old, previous, current = _month(48), _month(1), _month(0)
+    _add(client, f"{old}-05", "old")
+    _add(client, f"{previous}-05", "previous")
+    _add(client, f"{current}-05", "current")
+    _compact(client)
+
+    expenses = user_dir / "expenses"
+    assert {path.name for path in expenses.glob("*.json")} == {f"{previous}.json", f"{current}.json", "manifest.json"}
+    with gzip.open(expenses / "archive" / f"{old[:4]}.json.gz", "rt") as archive:
+        assert [row["description"] for row in json.load(archive)] == ["old"]
+
+    in_range = client.get("/api/expenses", params={"start_date": f"{previous}-01", "end_date": f"{previous}-28"})
+    assert [e["description"] for e in in_range.json()] == ["previous"]
+    assert [description for _, description in _listing(client)] == ["old", "previous", "current"]
+
+
+def test_moving_an_expense_between_months_moves_it_between_partitions(client, user_dir):
+    expense = _add(client, "2026-01-05", "moved")
+    _add(client, "2026-02-05", "stays")
+    _compact(client)
+    client.put(f"/api/expenses/{expense['id']}", json={**expense, "date": "2026-02-10"})
+    _compact(client)
+
+    assert not (user_dir / "expenses" / "2026-01.json").exists()
+    february = client.get("/api/expenses", params={"start_date": "2026-02-01", "end_date": "2026-02-28"})
+    assert [e["description"] for e in february.json()] == ["moved", "stays"]
+
+
+def test_database_writes_never_load_the_whole_table(client, sql_only, monkeypatch):
+    loads = []
+    load_expenses = SqlStorage._load_expenses
+
+    async def counting_load(self, user_id):
+        loads.append(user_id)
+        return await load_expenses(self, user_id)
+
+    monkeypatch.setattr(SqlStorage, "_load_expenses", counting_load)
+    first, second = _add(client, "2026-01-05", "first"), _add(client, "2026-01-06", "second")
+    assert client.put(f"/api/expenses/{first['id']}", json={**first, "description": "edited"}).status_code == 200
+    assert client.delete(f"/api/expenses/{second['id']}").status_code == 200
+    assert client.put(f"/api/expenses/{second['id']}", json=second).status_code == 404
+    batch = client.post("/api/expenses/batch", json={"operations": [
+        {"op": "update", "id": first["id"], "expense": {**first, "description": "edited", "amount": 9}},
+        {"op": "delete", "id": second["id"]},
+    ]})
+    assert [result["status"] for result in batch.json()["results"]] == [200, 404]
+    assert loads == []
+
+    assert [(e["description"], e["amount"]) for e in client.get("/api/expenses").json()] == [("edited", 9)]
+
+
+def test_refused_log_writes_are_reported_as_errors(client, monkeypatch):
+    expense = _add(client, "2026-01-05", "kept")
+
+    async def refuse(self, user_id, records):
+        return False
+
+    monkeypatch.setattr(ExpenseLog, "append", refuse)
+    assert client.post("/api/expenses/", json={**expense, "id": None}).status_code == 500
+    assert client.put(f"/api/expenses/{expense['id']}", json={**expense, "description": "lost"}).status_code == 500
+    assert client.delete(f"/api/expenses/{expense['id']}").status_code == 500
+    monkeypatch.undo()
+    assert _listing(client) == [(expense["id"], "kept")]
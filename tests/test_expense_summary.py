@@ -0,0 +1,39 @@
+def _add(client, amount: float, day: str, category: str) -> dict:
+    return client.post("/api/expenses/", json={
+        "amount": amount, "date": day, "category": category, "description": "spend",
+    }).json()
+
+
+def _groups(groups: list[dict]) -> dict:
+    return {group["key"]: (group["total"], group["count"]) for group in groups}
+
+
+def test_summary_groups_spending_by_category_and_period(client):
+    _add(client, 5, "2026-01-03", "Food")
+    _add(client, 20, "2026-01-01", "Bills")
+    _add(client, 12, "2026-02-10", "Food")
+
+    summary = client.get("/api/expenses/summary").json()
+    assert summary["overall"] == {"total": 37, "count": 3, "min": 5, "max": 20, "average": round(37 / 3, 2)}
+    assert _groups(summary["by_category"]) == {"Food": (17, 2), "Bills": (20, 1)}
+    assert _groups(summary["by_month"]) == {"2026-01": (25, 2), "2026-02": (12, 1)}
+    assert _groups(summary["by_week"]) == {"2026-W01": (25, 2), "2026-W07": (12, 1)}
+    assert list(_groups(summary["by_day"])) == ["2026-01-01", "2026-01-03", "2026-02-10"]
+
+
+def test_summary_follows_updates_deletes_and_date_ranges(client):
+    food = _add(client, 5, "2026-01-03", "Food")
+    bills = _add(client, 20, "2026-01-01", "Bills")
+    client.put(f"/api/expenses/{food['id']}", json={**food, "amount": 8})
+    client.delete(f"/api/expenses/{bills['id']}")
+    _add(client, 4, "2026-03-01", "Food")
+
+    summary = client.get("/api/expenses/summary", params={"start_date": "2026-01-01", "end_date": "2026-01-31"}).json()
+    assert summary["overall"]["total"] == 8
+    assert _groups(summary["by_category"]) == {"Food": (8, 1)}
+
+
+def test_summary_of_no_expenses_is_empty(client):
+    summary = client.get("/api/expenses/summary").json()
+    assert summary["overall"]["count"] == 0
+    assert summary["by_category"] == []
@@ -0,0 +1,99 @@
+import datetime
+import time
+
+from app.commands.limit_sweep import sweep_limits
+from app.utils.expense_limit_checker import ExpenseLimitChecker
+from conftest import settle_limit_checks
+
+
+def _notifications(client, count: int, timeout: float = 5.0) -> list[dict]:
+    """Notifications once at least `count` arrived; limit checks run in the background."""
+    deadline = time.monotonic() + timeout
+    while True:
+        notifications = client.get("/api/notifications").json()
+        if len(notifications) >= count or time.monotonic() > deadline:
+            return notifications
+        time.sleep(0.05)
+
+
+def _expense(amount: float) -> dict:
+    return {"amount": amount, "description": "spend", "date": datetime.date.today().isoformat(), "category": "Shopping"}
+
+
+def test_exceeded_limits_notify_once_per_period(client):
+    client.put("/api/settings", json={"daily": 10, "weekly": 0, "monthly": 0})
+    client.post("/api/expenses/", json=_expense(15))
+    notifications = _notifications(client, 1)
+    assert [n["title"] for n in notifications] == ["Daily Limit"]
+
+    client.post("/api/expenses/", json=_expense(5))
+    time.sleep(0.3)
+    assert [n["title"] for n in _notifications(client, 2, timeout=0.5)] == ["Daily Limit"]
+
+
+def test_spending_under_the_limits_does_not_notify(client):
+    client.put("/api/settings", json={"daily": 100, "weekly": 100, "monthly": 100})
+    client.post("/api/expenses/", json=_expense(15))
+    time.sleep(0.3)
+    assert _notifications(client, 1, timeout=0.5) == []
+
+
+def test_adding_over_a_limit_reports_the_breach(client):
+    client.put("/api/settings", json={"daily": 10, "weekly": 0, "monthly": 0})
+    body = client.post("/api/expenses/", json=_expense(15)).json()
+    assert body["limit_exceeded"] is True
+    assert [detail["title"] for detail in body["details"]] == ["Daily Limit"]
+    assert body["expense"]["amount"] == 15
+
+
+def test_reporting_a_breach_leaves_the_notifying_to_the_check(client):
+    client.put("/api/settings", json={"daily": 10, "weekly": 0, "monthly": 0})
+    checker = ExpenseLimitChecker(client.user_id)
+    for _ in range(2):
+        assert [alert["title"] for alert in client.portal.call(checker.new_breaches, 15, 15, 15)] == ["Daily Limit"]
+    assert client.get("/api/notifications").json() == []
+
+    assert len(client.portal.call(checker.check_and_notify, 15, 15, 15)) == 1
+    assert client.portal.call(checker.new_breaches, 15, 15, 15) == []
+
+
+def test_batch_over_a_limit_reports_the_breach(client):
+    client.put("/api/settings", json={"daily": 10, "weekly": 0, "monthly": 0})
+    body = client.post("/api/expenses/batch", json={"operations": [
+        {"op": "create", "expense": _expense(6)},
+        {"op": "create", "expense": _expense(6)},
+    ]}).json()
+    assert body["limit_exceeded"] is True
+    assert body["details"]
+
+
+def test_updating_over_a_limit_notifies(client):
+    client.put("/api/settings", json={"daily": 10, "weekly": 0, "monthly": 0})
+    expense = client.post("/api/expenses/", json=_expense(5)).json()
+    client.put(f"/api/expenses/{expense['id']}", json=_expense(50))
+    assert [n["title"] for n in _notifications(client, 1)] == ["Daily Limit"]
+
+
+def test_importing_over_a_limit_notifies(client):
+    client.put("/api/settings", json={"daily": 0, "weekly": 0, "monthly": 10})
+    today = datetime.date.today().isoformat()
+    csv = f"description,category,amount,date\nrent,Bills,8,{today}\nfood,Food,8,{today}\n"
+    response = client.post(
+        f"/api/expenses/import/{client.user_id}", files={"import_file": ("expenses.csv", csv, "text/csv")}
+    )
+    assert response.status_code == 200
+    assert [n["title"] for n in _notifications(client, 1)] == ["Monthly Limit"]
+
+
+def test_the_sweep_notifies_about_limits_no_write_checked(client):
+    client.post("/api/expenses/", json=_expense(15))
+    settle_limit_checks(client)
+    client.put("/api/settings", json={"daily": 10, "weekly": 0, "monthly": 0})
+    assert client.get("/api/notifications").json() == []
+
+    stats = client.portal.call(sweep_limits, [client.user_id])
+    assert (stats["users"], stats["notified"], stats["failed"]) == (1, 1, 0)
+    assert [n["title"] for n in client.get("/api/notifications").json()] == ["Daily Limit"]
+
+    # Already notified for this period
+    assert client.portal.call(sweep_limits, [client.user_id])["notified"] == 0
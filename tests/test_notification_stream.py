@@ -0,0 +1,110 @@
+import asyncio
+import json
+
+import pytest
+
+from app.core.config import settings
+from app.services.notification_hub import notification_hub
+from app.services.notification_service import NotificationService
+from test_notifications import _notify
+
+
+class _UnversionedStorage:
+    """A backend that cannot tell document versions, like Supabase once its cache expired."""
+
+    def document_version(self, user_id: int, filename: str):
+        return None
+
+
+def _service(reads: list) -> NotificationService:
+    service = NotificationService.__new__(NotificationService)
+    service.storage = _UnversionedStorage()
+
+    async def list_notifications(user_id, limit, before=None):
+        return [], None
+
+    async def notifications_after(user_id, seq):
+        reads.append(seq)
+        return []
+
+    service.list_notifications = list_notifications
+    service.notifications_after = notifications_after
+    return service
+
+
+async def _heartbeats(service: NotificationService, count: int, publish: list | None = None) -> list[str]:
+    events = []
+    stream = service.stream_events(1, last_event_id=None)
+    try:
+        async for event in stream:
+            events.append(event)
+            if publish and len(events) == 2:
+                notification_hub.publish(1, publish)
+            if sum(e.startswith(": keep-alive") for e in events) >= count:
+                return events
+    finally:
+        await stream.aclose()
+
+
+@pytest.fixture
+def fast_heartbeat(monkeypatch):
+    monkeypatch.setattr(settings, "NOTIFICATION_STREAM_HEARTBEAT_SECONDS", 0.01)
+
+
+def test_idle_stream_does_not_read_storage_per_heartbeat(fast_heartbeat, monkeypatch):
+    monkeypatch.setattr(settings, "NOTIFICATION_STREAM_CATCHUP_SECONDS", 300)
+    reads = []
+    asyncio.run(_heartbeats(_service(reads), 5))
+    assert reads == []
+
+
+def test_idle_stream_catches_up_on_the_configured_interval(fast_heartbeat, monkeypatch):
+    monkeypatch.setattr(settings, "NOTIFICATION_STREAM_CATCHUP_SECONDS", 0.001)
+    reads = []
+    asyncio.run(_heartbeats(_service(reads), 3))
+    assert len(reads) >= 2
+
+
+def test_published_notifications_are_streamed_without_reading_storage(fast_heartbeat):
+    reads = []
+    notification = {"id": "a", "seq": 7, "title": "Daily Limit", "detail": "over", "date": "2026-10-18"}
+    events = asyncio.run(_heartbeats(_service(reads), 2, publish=[notification]))
+    assert any(event.startswith("id: 7\nevent: notification") for event in events)
+    assert reads == []
+
+
+def _parse(event: str) -> dict:
+    fields = dict(line.split(": ", 1) for line in event.strip().splitlines() if not line.startswith(":"))
+    return {**json.loads(fields["data"]), "event_id": int(fields["id"])} if fields.get("event") == "notification" else fields
+
+
+async def _stream(user_id: int, last_event_id: int | None, count: int, publish: list[dict] | None = None) -> list[dict]:
+    """The first `count` notification events of a stream, publishing `publish` once it is open."""
+    service = NotificationService()
+    stream = service.stream_events(user_id, last_event_id)
+    received = []
+    try:
+        assert "retry" in _parse(await anext(stream))
+        if publish:
+            await service.add_notifications(user_id, publish)
+        async with asyncio.timeout(5):
+            while len(received) < count:
+                event = await anext(stream)
+                if event.startswith("id: "):
+                    received.append(_parse(event))
+    finally:
+        await stream.aclose()
+    return received
+
+
+def test_resuming_replays_the_missed_notifications_in_order(client):
+    added = _notify(client, 3)
+    events = client.portal.call(_stream, client.user_id, added[0]["seq"], 2)
+    assert [(e["event_id"], e["detail"]) for e in events] == [(added[1]["seq"], "note 1"), (added[2]["seq"], "note 2")]
+
+
+def test_new_streams_get_only_new_notifications(client, fast_heartbeat):
+    _notify(client, 2)
+    later = [{"title": "Daily Limit", "detail": "over", "date": "2026-10-18"}]
+    events = client.portal.call(_stream, client.user_id, None, 1, later)
+    assert [e["detail"] for e in events] == ["over"]
@@ -0,0 +1,134 @@
+import datetime
+
+from app.core.config import settings
+from app.services.notification_service import NotificationService
+from conftest import settle_limit_checks, sign_up
+from test_limits import _notifications
+
+
+def _exceed(client, limit: str = "daily"):
+    """Spend over one limit, which stores one notification."""
+    client.put("/api/settings", json={"daily": 0, "weekly": 0, "monthly": 0, limit: 1})
+    client.post("/api/expenses/", json={
+        "amount": 5, "description": "spend", "date": datetime.date.today().isoformat(), "category": "Food",
+    })
+    settle_limit_checks(client)
+
+
+def _notify(client, count: int, title: str = "Reminder") -> list[dict]:
+    """Store `count` notifications for the client's user in one write, oldest first."""
+    items = [{"title": title, "detail": f"note {number}", "date": "2026-10-18"} for number in range(count)]
+    return client.portal.call(NotificationService().add_notifications, client.user_id, items)
+
+
+def _details(response) -> list[str]:
+    assert response.status_code == 200, response.text
+    return [notification["detail"] for notification in response.json()]
+
+
+def test_reads_before_the_first_notification_keep_their_etag(client):
+    for path in ("/api/notifications/unread-count", "/api/notifications"):
+        first = client.get(path)
+        assert client.get(path, headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+    assert client.get("/api/notifications/unread-count").json() == {"unread": 0}
+
+    _exceed(client)
+    assert client.get("/api/notifications/unread-count").json() == {"unread": 1}
+    assert len(_notifications(client, 1)) == 1
+
+
+def test_pages_run_newest_first_and_cover_every_notification(client):
+    _notify(client, 7)
+    assert _details(client.get("/api/notifications")) == [f"note {number}" for number in range(6, -1, -1)]
+
+    pages, cursor = [], None
+    while True:
+        response = client.get("/api/notifications", params={"limit": 3, **({"cursor": cursor} if cursor else {})})
+        pages.append(_details(response))
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+    assert pages == [["note 6", "note 5", "note 4"], ["note 3", "note 2", "note 1"], ["note 0"]]
+
+
+def test_new_notifications_do_not_shift_later_pages(client):
+    _notify(client, 4)
+    first = client.get("/api/notifications", params={"limit": 2})
+    _notify(client, 2)
+    second = client.get("/api/notifications", params={"limit": 2, "cursor": first.headers["x-next-cursor"]})
+    assert _details(second) == ["note 1", "note 0"]
+
+
+def test_unread_count_is_maintained_on_write(client):
+    _notify(client, 3)
+    assert client.get("/api/notifications/unread-count").json() == {"unread": 3}
+    assert client.get("/api/notifications", params={"limit": 0}).status_code == 422
+
+
+def _read_flags(client) -> dict[str, bool]:
+    return {n["detail"]: n["is_read"] for n in client.get("/api/notifications").json()}
+
+
+def test_marking_one_notification_read(client):
+    added = _notify(client, 3)
+    assert client.post(f"/api/notifications/{added[1]['id']}/read").json() == {"updated": 1}
+    assert _read_flags(client) == {"note 2": False, "note 1": True, "note 0": False}
+    assert client.get("/api/notifications/unread-count").json() == {"unread": 2}
+
+    # Marking it again changes nothing
+    client.post(f"/api/notifications/{added[1]['id']}/read")
+    assert client.get("/api/notifications/unread-count").json() == {"unread": 2}
+    assert client.post("/api/notifications/missing/read").status_code == 404
+
+
+def test_mark_all_as_read_covers_only_existing_notifications(client):
+    added = _notify(client, 3)
+    client.post(f"/api/notifications/{added[0]['id']}/read")
+    assert client.post("/api/notifications/mark-all-as-read").json() == {"updated": 2}
+    assert set(_read_flags(client).values()) == {True}
+    assert client.get("/api/notifications/unread-count").json() == {"unread": 0}
+
+    _notify(client, 1, title="Later")
+    assert client.get("/api/notifications").json()[0]["is_read"] is False
+    assert client.get("/api/notifications/unread-count").json() == {"unread": 1}
+
+
+def test_read_state_is_per_user(client):
+    added = _notify(client, 1)
+    sign_up(client)
+    assert client.post(f"/api/notifications/{added[0]['id']}/read").status_code == 404
+    assert client.post("/api/notifications/mark-all-as-read").json() == {"updated": 0}
+
+
+def _compact(client) -> dict:
+    return client.portal.call(NotificationService().compact, client.user_id)
+
+
+def test_retention_keeps_the_newest_notifications(client, monkeypatch):
+    monkeypatch.setattr(settings, "NOTIFICATION_MAX_COUNT", 3)
+    _notify(client, 5)
+    # Unread notifications are kept past the limit
+    assert len(client.get("/api/notifications").json()) == 5
+
+    client.post("/api/notifications/mark-all-as-read")
+    assert _compact(client)["removed"] == 2
+    assert _details(client.get("/api/notifications")) == ["note 4", "note 3", "note 2"]
+    assert _compact(client)["removed"] == 0
+
+
+def test_retention_keeps_the_latest_notification_of_each_title(client, monkeypatch):
+    monkeypatch.setattr(settings, "NOTIFICATION_MAX_COUNT", 1)
+    _notify(client, 1, title="Daily Limit")
+    _notify(client, 2)
+    client.post("/api/notifications/mark-all-as-read")
+    _compact(client)
+    assert [n["title"] for n in client.get("/api/notifications").json()] == ["Reminder", "Daily Limit"]
+
+
+def test_unread_notifications_can_be_dropped_too(client, monkeypatch):
+    monkeypatch.setattr(settings, "NOTIFICATION_MAX_COUNT", 2)
+    monkeypatch.setattr(settings, "NOTIFICATION_KEEP_UNREAD", False)
+    _notify(client, 4)
+    _compact(client)
+    assert _details(client.get("/api/notifications")) == ["note 3", "note 2"]
+    assert client.get("/api/notifications/unread-count").json() == {"unread": 2}
@@ -0,0 +1,22 @@
+import datetime
+
+
+def test_settings_before_any_update_are_the_default_limits(client):
+    response = client.get("/api/settings")
+    assert response.status_code == 200
+    assert response.json() == {"budgetLimits": {"daily": 0, "weekly": 0, "monthly": 0}}
+
+
+def test_settings_after_first_expense_and_before_any_update(client):
+    client.post("/api/expenses/", json={
+        "amount": 12.5, "description": "lunch", "date": datetime.date.today().isoformat(), "category": "Food & Dining",
+    })
+    response = client.get("/api/settings")
+    assert response.status_code == 200
+    assert response.json()["budgetLimits"] == {"daily": 0, "weekly": 0, "monthly": 0}
+
+
+def test_updated_settings_are_returned(client):
+    limits = {"daily": 10.0, "weekly": 50.0, "monthly": 200.0}
+    assert client.put("/api/settings", json=limits).status_code == 200
+    assert client.get("/api/settings").json() == limits